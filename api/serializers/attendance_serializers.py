@@ -1,5 +1,10 @@
+from datetime import timedelta
+from django.core import signing
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
 from attendance.models import Attendance
+from users.models import CustomUser
+from api.utils.kiosk_sync import decode_since
 from django.utils.timezone import now
 
 
@@ -8,6 +13,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attendance
         fields = "__all__"
+        read_only_fields = ["client_key"]
 
     def validate(self, data):
         """Ensure attendance is not marked twice for the same member on the same day."""
@@ -25,3 +31,111 @@ class AttendanceSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"attendance": "Attendance already marked for this date."})
 
         return data
+
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    """
+    Payload of the bulk check-in: {"members": [id, ...], "date": "YYYY-MM-DD"}, date defaults to today.
+    - Members are checked together so a bad id only fails itself, see `resolve_members`.
+    """
+    MAX_MEMBERS = 200
+
+    members = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=MAX_MEMBERS)
+    date = serializers.DateField(required=False)
+
+    def validate_date(self, value):
+        if value > now().date():
+            raise serializers.ValidationError("Cannot mark attendance for a future date.")
+        return value
+
+    def resolve_members(self):
+        """
+        Return (date, entries): one {"member": id, "status": ...} per requested id, in order.
+        - Existence and already-marked attendance are read with a single IN query.
+        - Statuses: "Pending" (to insert), "Already marked", "Not found" or "Duplicate" (repeated in the payload).
+        - Only active users with the Member role can be checked in; staff and inactive accounts are "Not found".
+        """
+        date = self.validated_data.get("date") or now().date()
+        member_ids = self.validated_data["members"]
+        marked = dict(
+            CustomUser.objects.filter(id__in=set(member_ids), role="Member", is_active=True)
+            .annotate(marked=Exists(Attendance.objects.filter(member=OuterRef("pk"), date=date)))
+            .values_list("id", "marked")
+        )
+
+        entries, seen = [], set()
+        for member_id in member_ids:
+            if member_id in seen:
+                entry_status = "Duplicate"
+            elif member_id not in marked:
+                entry_status = "Not found"
+            elif marked[member_id]:
+                entry_status = "Already marked"
+            else:
+                entry_status = "Pending"
+            seen.add(member_id)
+            entries.append({"member": member_id, "status": entry_status})
+        return date, entries
+
+
+class AttendanceSummaryQuerySerializer(serializers.Serializer):
+    """Query params of the attendance summary, the range defaults to the last 30 days."""
+    MAX_DAYS = 366 * 5
+
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        end_date = data.get("end_date") or now().date()
+        start_date = data.get("start_date") or end_date - timedelta(days=29)
+        if start_date > end_date:
+            raise serializers.ValidationError({"start_date": "start_date must be on or before end_date."})
+        if (end_date - start_date).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"start_date": f"The range cannot exceed {self.MAX_DAYS} days."})
+        return {"start_date": start_date, "end_date": end_date}
+
+
+class AttendanceSessionSerializer(serializers.Serializer):
+    """Payload of check-in and check-out: {"member": id}, always for today."""
+    member = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.only("id", "username", "role"))
+
+
+class KioskEventSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=64)  # Generated by the kiosk (e.g. a UUID), resent unchanged on retries
+    member = serializers.IntegerField()
+    at = serializers.DateTimeField()
+
+    def validate_at(self, value):
+        if value > now() + timedelta(minutes=5):  # Allow for tablet clock drift
+            raise serializers.ValidationError("Event is in the future.")
+        return value
+
+
+class KioskSyncSerializer(serializers.Serializer):
+    """
+    Payload of the kiosk sync: {"since": <token from the last sync or null>, "events": [{"key", "member", "at"}, ...]}.
+    - Events are checked one by one so a bad entry only fails itself, see `resolve_events`.
+    """
+    MAX_EVENTS = 5000
+
+    since = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    events = serializers.ListField(child=serializers.DictField(), required=False, default=list, max_length=MAX_EVENTS)
+
+    def validate_since(self, value):
+        if not value:
+            return None
+        try:
+            return decode_since(value)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise serializers.ValidationError("Invalid sync token, sync again without one.")
+
+    def resolve_events(self):
+        """Return (valid events, {key: errors}) for the payload's events."""
+        valid, errors = [], {}
+        for index, event in enumerate(self.validated_data["events"]):
+            event_serializer = KioskEventSerializer(data=event)
+            if event_serializer.is_valid():
+                valid.append(dict(event_serializer.validated_data))
+            else:
+                errors[str(event.get("key") or index)] = event_serializer.errors
+        return valid, errors
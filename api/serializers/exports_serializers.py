@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Optional ?start_date / ?end_date of an export, both inclusive. Without them the whole dataset is exported."""
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get("start_date") and data.get("end_date") and data["start_date"] > data["end_date"]:
+            raise serializers.ValidationError({"start_date": "start_date must be on or before end_date."})
+        return data
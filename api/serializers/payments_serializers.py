@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from payments.models import MpesaTransaction, Payment
+from subscriptions.models import Plan
+from users.models import CustomUser
 from phonenumber_field.serializerfields import PhoneNumberField
 from api.utils import helpers
 from decimal import Decimal, InvalidOperation
@@ -65,3 +67,61 @@ class PaymentsRequestPayLoadSerializer(serializers.ModelSerializer):
             # data.pop("transaction_description", None)
 
         return data
+
+
+class BatchPaymentItemSerializer(serializers.Serializer):
+    member = serializers.IntegerField()
+    plan = serializers.IntegerField()
+    phone_number = PhoneNumberField(region="KE", required=False, allow_blank=True)  # Defaults to the member's phone number
+    description = serializers.CharField(required=False, allow_blank=True)
+
+
+class BatchPaymentsRequestSerializer(serializers.Serializer):
+    """
+    Payload of the batch STK push: {"items": [{"member", "plan", "phone_number", "description"}, ...]}.
+    - Items are checked one by one so a bad entry only fails itself, see `resolve_items`.
+    """
+    MAX_ITEMS = 500
+
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_ITEMS)
+
+    def resolve_items(self):
+        """
+        Return one entry per item, in order: the resolved member/plan/phone/description, or {"error": ...}.
+        - Members and plans for the whole batch are fetched with one query each.
+        """
+        entries = []
+        for item in self.validated_data["items"]:
+            item_serializer = BatchPaymentItemSerializer(data=item)
+            if item_serializer.is_valid():
+                entries.append(dict(item_serializer.validated_data))
+            else:
+                entries.append({"error": item_serializer.errors})
+
+        valid = [entry for entry in entries if "error" not in entry]
+        members = CustomUser.objects.only("id", "username", "phone_number").in_bulk({entry["member"] for entry in valid})
+        plans = Plan.objects.in_bulk({entry["plan"] for entry in valid})
+
+        seen_members = set()
+        for entry in valid:
+            member = members.get(entry["member"])
+            plan = plans.get(entry["plan"])
+            if member is None:
+                entry["error"] = {"member": "Member not found"}
+            elif plan is None:
+                entry["error"] = {"plan": "Plan not found"}
+            elif not plan.price or plan.price < 1:
+                entry["error"] = {"amount": "Invalid Amount"}
+            elif not (entry.get("phone_number") or member.phone_number):
+                entry["error"] = {"phone_number": "Phone number is required for M-Pesa payments."}
+            elif member.id in seen_members:
+                entry["error"] = {"member": "Member appears more than once in this batch"}
+            else:
+                seen_members.add(member.id)
+                entry.update(
+                    member=member,
+                    plan=plan,
+                    phone_number=entry.get("phone_number") or member.phone_number,
+                    description=entry.get("description") or "Payment for services",
+                )
+        return entries
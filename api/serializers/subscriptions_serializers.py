@@ -16,6 +16,8 @@ class MemberSerailizer(serializers.ModelSerializer):
   
 
 class SubscriptionSerializer(serializers.ModelSerializer):
+  effective_status = serializers.CharField(read_only=True)  # Annotated by Subscription.objects.with_effective_status()
+
   class Meta:
     model = Subscription
     fields = "__all__"
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from users.models import CustomUser
-from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from users.backends import UsernameOrEmailBackend
+from api.utils.tokens import RoleRefreshToken
 from users.models import CustomUser
 from datetime import datetime, timezone
 
@@ -74,24 +74,22 @@ class LoginSerializer(serializers.Serializer):
         username_or_email = data["username_or_email"]
         password = data["password"]
 
-        # Try finding user by email first, then username
-        user = CustomUser.objects.filter(email=username_or_email).first()
-        if not user:
-            user = CustomUser.objects.filter(username=username_or_email).first()
+        # Find user by email or username in a single query
+        backend = UsernameOrEmailBackend()
+        user = backend.get_by_username_or_email(username_or_email)
 
         if not user:
             raise serializers.ValidationError("User not found.")
 
-        # Authenticate user using the retrieved username
-        user = authenticate(username=user.username, password=password)
-        if not user:
+        # Verify the password against the fetched row (no second lookup)
+        if not user.check_password(password):
             raise serializers.ValidationError("Invalid credentials.")
 
         if not user.is_active:
             raise serializers.ValidationError("User account is disabled.")
 
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        # Generate JWT tokens (carrying role claims for stateless permission checks)
+        refresh = RoleRefreshToken.for_user(user)
         access = refresh.access_token
 
         access_expiry = datetime.fromtimestamp(access["exp"], timezone.utc).isoformat()
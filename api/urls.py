@@ -1,11 +1,15 @@
 from django.urls import path, include
 from api.views.users_views import RegisterView, LoginView, CustomTokenRefreshView, LogoutView
-from api.views.payments_views import MpesaSTKPushView, mpesa_callback, FetchMpesaTransactionView, FetchPaymentRecords
+from api.views.payments_views import MpesaSTKPushView, BatchMpesaSTKPushView, mpesa_callback, FetchMpesaTransactionView, FetchPaymentRecords, MpesaPaymentStatusView
+from api.views.async_payments_views import async_stk_push, async_stk_query, async_mpesa_callback
 from rest_framework.routers import DefaultRouter
 from rest_framework.routers import DefaultRouter
 from api.views.users_views import UserViewSet
 from api.views.subscriptions_views import PlanViewSet, FetchSubscriptions
-from api.views.attendance_views import MarkAttendanceView, FetchAttendance
+from api.views.attendance_views import MarkAttendanceView, BulkMarkAttendanceView, CheckInView, CheckOutView, OccupancyView, KioskSyncView, FetchAttendance, AttendanceSummaryView, AttendanceHistoryView
+from api.views.access_views import AccessCheckView
+from api.views.dashboard_views import DashboardView
+from api.views.exports_views import ExportView
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet, basename="user")
@@ -18,11 +22,27 @@ urlpatterns = [
     path("", include(router.urls)), 
     path("auth/logout/", LogoutView.as_view(), name="logout"),
     path("payments/initiate-payment/", MpesaSTKPushView.as_view(), name="initiate_payments"),
+    path("payments/initiate-batch-payment/", BatchMpesaSTKPushView.as_view(), name="initiate_batch_payments"),
+    path("payments/status/<str:reference>/", MpesaPaymentStatusView.as_view(), name="payment_status"),
     path("mpesa/callback/", mpesa_callback, name="mpesa_callback"),
+    # Native async M-Pesa views, run under ASGI (gms.asgi)
+    path("payments/async/initiate-payment/", async_stk_push, name="async_initiate_payments"),
+    path("payments/async/stk-query/<str:checkout_request_id>/", async_stk_query, name="async_stk_query"),
+    path("mpesa/async/callback/", async_mpesa_callback, name="async_mpesa_callback"),
     path("mpesa/transactions/", FetchMpesaTransactionView.as_view(), name="fetch-mpesa-transactions"),
     path("subscriptions/", FetchSubscriptions.as_view(), name="subscriptions"),
     path("payments/fetch-records/", FetchPaymentRecords.as_view(), name="payment_records"),
     path("attendance/mark-member-attendance/", MarkAttendanceView.as_view(), name="member_attendance"),
-    path("attendance/fetch-attendance/", FetchAttendance.as_view(), name="attendance-records")
+    path("attendance/bulk-check-in/", BulkMarkAttendanceView.as_view(), name="bulk_member_attendance"),
+    path("attendance/check-in/", CheckInView.as_view(), name="attendance_check_in"),
+    path("attendance/check-out/", CheckOutView.as_view(), name="attendance_check_out"),
+    path("attendance/occupancy/", OccupancyView.as_view(), name="attendance_occupancy"),
+    path("attendance/kiosk/sync/", KioskSyncView.as_view(), name="attendance_kiosk_sync"),
+    path("attendance/fetch-attendance/", FetchAttendance.as_view(), name="attendance-records"),
+    path("attendance/summary/", AttendanceSummaryView.as_view(), name="attendance_summary"),
+    path("attendance/history/", AttendanceHistoryView.as_view(), name="attendance_history"),
+    path("access/check/<int:member_id>/", AccessCheckView.as_view(), name="access_check"),
+    path("dashboard/", DashboardView.as_view(), name="dashboard"),
+    path("exports/<str:dataset>/<str:file_format>/", ExportView.as_view(), name="export"),
     
 ]
\ No newline at end of file
@@ -0,0 +1,114 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from attendance.models import Attendance, DailyAttendanceSummary, MemberMonthlyAttendance
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def apply_attendance(rows, sign=1):
+    """
+    Add (or with sign=-1 remove) attendance rows to the daily and member/month rollups.
+    - `rows` are (member_id, date) pairs of present attendance just written or deleted.
+    - Missing rollup rows are created with ignore_conflicts, then counters move with F() UPDATEs grouped by increment,
+      so concurrent writers never overwrite each other's counts.
+    """
+    if not rows:
+        return
+    daily = Counter(day for _, day in rows)
+    monthly = Counter((member_id, _month(day)) for member_id, day in rows)
+
+    with transaction.atomic():
+        DailyAttendanceSummary.objects.bulk_create([DailyAttendanceSummary(date=day) for day in daily], ignore_conflicts=True)
+        MemberMonthlyAttendance.objects.bulk_create(
+            [MemberMonthlyAttendance(member_id=member_id, month=month) for member_id, month in monthly], ignore_conflicts=True
+        )
+
+        days_by_increment = defaultdict(list)
+        for day, count in daily.items():
+            days_by_increment[count].append(day)
+        for count, days in days_by_increment.items():
+            DailyAttendanceSummary.objects.filter(date__in=days).update(present_count=F("present_count") + sign * count)
+
+        members_by_month = defaultdict(list)  # A member is present at most once a day, so one call mostly adds 1 per member
+        for (member_id, month), count in monthly.items():
+            members_by_month[(month, count)].append(member_id)
+        for (month, count), member_ids in members_by_month.items():
+            MemberMonthlyAttendance.objects.filter(month=month, member_id__in=member_ids).update(
+                days_present=F("days_present") + sign * count
+            )
+
+
+def insert_attendance(rows):
+    """
+    Insert Attendance rows whose (member, date) is not marked yet and add the present ones to the rollups.
+    - Nothing is locked up front: a row marked concurrently after the existence read fails the unique (member, date)
+      constraint, and the rows are then inserted one by one in savepoints so only the losing rows are dropped.
+    - Only rows this call inserted are counted, with apply_attendance's atomic increments, so check-ins of the same day
+      never wait on each other beyond the single counter UPDATE.
+    - Returns the inserted rows; a row missing from the result was marked by someone else first.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    with transaction.atomic():
+        existing = _already_marked(rows)
+        inserted = [row for row in rows if (row.member_id, row.date) not in existing]
+        try:
+            with transaction.atomic():
+                Attendance.objects.bulk_create(inserted)
+        except IntegrityError:
+            inserted = [row for row in inserted if _insert_one(row)]
+        apply_attendance([(row.member_id, row.date) for row in inserted if row.present])
+
+    return inserted
+
+
+def _already_marked(rows):
+    return set(
+        Attendance.objects.filter(member_id__in={row.member_id for row in rows}, date__in={row.date for row in rows})
+        .values_list("member_id", "date")
+    )
+
+
+def _insert_one(row):
+    row.pk = None
+    row._state.adding = True
+    try:
+        with transaction.atomic():
+            Attendance.objects.bulk_create([row])
+    except IntegrityError:
+        return False
+    return True
+
+
+def rebuild_attendance_rollups(start_date, end_date):
+    """
+    Recompute both rollups from Attendance for the whole months spanning start_date..end_date (backfill or drift repair).
+    - Each table is replaced with one DELETE and an INSERT of aggregated rows. Returns the number of daily rows written.
+    """
+    first_day = _month(start_date)
+    after_last_day = _month(_month(end_date) + timedelta(days=31))
+    present = Attendance.objects.filter(present=True, date__gte=first_day, date__lt=after_last_day).order_by()
+
+    with transaction.atomic():
+        DailyAttendanceSummary.objects.filter(date__gte=first_day, date__lt=after_last_day).delete()
+        MemberMonthlyAttendance.objects.filter(month__gte=first_day, month__lt=after_last_day).delete()
+
+        daily = DailyAttendanceSummary.objects.bulk_create(
+            DailyAttendanceSummary(date=row["date"], present_count=row["count"])
+            for row in present.values("date").annotate(count=Count("id"))
+        )
+        MemberMonthlyAttendance.objects.bulk_create(
+            (
+                MemberMonthlyAttendance(member_id=row["member_id"], month=row["month"], days_present=row["count"])
+                for row in present.annotate(month=TruncMonth("date")).values("member_id", "month").annotate(count=Count("id"))
+            ),
+            batch_size=2000,
+        )
+    return len(daily)
@@ -1,5 +1,10 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from rest_framework.exceptions import AuthenticationFailed
+from api.utils.user_cache import get_cached_user, cache_user, claims_revoked, remember_claims_marker
+from api.utils.tokens import RoleTokenUser
+from django.utils.functional import SimpleLazyObject
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
@@ -14,6 +19,47 @@ class CookieJWTAuthentication(JWTAuthentication):
 
         try:
             validated_token = self.get_validated_token(auth_cookie)
-            return self.get_user(validated_token), validated_token
+            if self.has_trusted_claims(validated_token):
+                # Fast path: permissions read the role from the token, the row is loaded only if a view needs it
+                request.token_user = RoleTokenUser(validated_token)
+                return SimpleLazyObject(lambda: self.get_user(validated_token)), validated_token
+            user = self.get_user(validated_token)
+            remember_claims_marker(user)  # Later requests with current claims take the fast path again
+            return user, validated_token
         except AuthenticationFailed:
             return None  # Invalid token
+
+    def has_trusted_claims(self, validated_token):
+        """Check the token carries role claims for an active user that have not been revoked since they were taken."""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        auth_time = validated_token.get("auth_time")
+        if user_id is None or auth_time is None or "role" not in validated_token:
+            return False  # Tokens issued before role claims existed
+        if not validated_token.get("is_active", False):
+            return False
+        return not claims_revoked(user_id, auth_time)
+
+    def get_user(self, validated_token):
+        """
+        Resolve the user from the cache, falling back to the database on a miss.
+        Cached snapshots are invalidated whenever the user is saved (see users/signals.py).
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # Raises InvalidToken
+
+        version, user = get_cached_user(user_id)
+        if user is None:
+            user = super().get_user(validated_token)  # Hits the DB and runs the active/revoke checks
+            cache_user(user, version)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return user
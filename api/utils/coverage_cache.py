@@ -0,0 +1,41 @@
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from users.models import CustomUser
+
+COVERAGE_CACHE_TIMEOUT = getattr(settings, "ACCESS_COVERAGE_CACHE_TIMEOUT", 60 * 60 * 6)
+NO_COVERAGE = ""  # Cached for members without subscriptions, so repeated checks stay off the database
+
+
+def _coverage_key(member_id):
+    return f"access:coverage:{member_id}"
+
+
+def load_coverage(member_id):
+    """The member's denormalized current_end_date (None if never covered), a primary key lookup."""
+    return CustomUser.objects.filter(id=member_id).values_list("current_end_date", flat=True).first()
+
+
+def get_coverage(member_id):
+    """Return the date the member is covered until, or None. Reads the database only on a cache miss."""
+    key = _coverage_key(member_id)
+    cached = cache.get(key)
+    if cached is None:
+        end_date = load_coverage(member_id)
+        cache.set(key, end_date.isoformat() if end_date else NO_COVERAGE, COVERAGE_CACHE_TIMEOUT)
+        return end_date
+    return date.fromisoformat(cached) if cached else None
+
+
+def extend_coverage(member_id, end_date):
+    """Record a new subscription ending on `end_date`. Members not in the cache are left to load on their next check."""
+    key = _coverage_key(member_id)
+    cached = cache.get(key)
+    if cached is None:
+        return
+    if not cached or date.fromisoformat(cached) < end_date:
+        cache.set(key, end_date.isoformat(), COVERAGE_CACHE_TIMEOUT)
+
+
+def invalidate_coverage(member_id):
+    cache.delete(_coverage_key(member_id))
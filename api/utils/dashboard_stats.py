@@ -0,0 +1,72 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from attendance.models import DailyAttendanceSummary
+from payments.models import DailyStats, Payment
+from subscriptions.models import Subscription
+from users.models import CustomUser
+
+STATS_FIELDS = ["revenue", "payments", "revenue_by_method", "revenue_by_plan", "new_members", "active_members", "check_ins"]
+
+
+def _day_bounds(start_date, end_date):
+    """Aware datetimes covering start_date 00:00 to end_date 24:00 in the current timezone (index friendly)."""
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+    )
+
+
+def refresh_daily_stats(start_date, end_date):
+    """
+    Recompute DailyStats for start_date..end_date and upsert them in one statement. Returns the number of days written.
+    - Revenue and registrations are one grouped query each, check-ins come from the attendance rollup.
+    - Active members need one COUNT(DISTINCT) per day over the subscription indexes, cheap for the default 2-day window.
+    """
+    start, end = _day_bounds(start_date, end_date)
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    stats = {day: DailyStats(date=day, revenue=Decimal("0"), revenue_by_method={}, revenue_by_plan={}) for day in days}
+
+    revenue = (
+        Payment.objects.filter(status="Completed", created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "payment_method", "plan__name")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    by_method, by_plan = defaultdict(Decimal), defaultdict(Decimal)
+    for row in revenue:
+        day = stats[row["day"]]
+        day.revenue += row["total"]
+        day.payments += row["count"]
+        by_method[(row["day"], row["payment_method"])] += row["total"]
+        by_plan[(row["day"], row["plan__name"])] += row["total"]
+    for (day, method), total in by_method.items():
+        stats[day].revenue_by_method[method] = str(total)
+    for (day, plan), total in by_plan.items():
+        stats[day].revenue_by_plan[plan] = str(total)
+
+    registrations = (
+        CustomUser.objects.filter(role="Member", date_joined__gte=start, date_joined__lt=end)
+        .annotate(day=TruncDate("date_joined"))
+        .values("day")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for row in registrations:
+        stats[row["day"]].new_members = row["count"]
+
+    for day, present in DailyAttendanceSummary.objects.filter(date__gte=start_date, date__lte=end_date).values_list("date", "present_count"):
+        stats[day].check_ins = present
+
+    covering = Subscription.objects.exclude(status="Cancelled")  # Default manager, soft-deleted rows are already out
+    for day in days:
+        stats[day].active_members = covering.filter(start_date__lte=day, end_date__gte=day).values("member_id").distinct().count()
+
+    DailyStats.objects.bulk_create(
+        stats.values(), update_conflicts=True, unique_fields=["date"], update_fields=STATS_FIELDS + ["refreshed_at"]
+    )
+    return len(days)
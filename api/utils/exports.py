@@ -0,0 +1,172 @@
+import csv
+import tempfile
+from datetime import datetime
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from attendance.models import Attendance
+from payments.models import Payment
+from subscriptions.models import Subscription
+
+try:
+    from openpyxl import Workbook  # Optional, only needed for XLSX exports
+except ImportError:
+    Workbook = None
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class Export:
+    """
+    A downloadable dataset: column headers and the `values_list` lookups that fill them.
+    - Rows are read in primary key order, `chunk_size` at a time with keyset queries (WHERE pk > last). Unlike
+      `.iterator()`, which the MySQL driver buffers whole, memory stays bounded by one chunk.
+    """
+
+    def __init__(self, name, queryset, columns, date_lookup, chunk_size=2000):
+        self.name = name
+        self.queryset = queryset  # Callable, so each export gets a fresh queryset
+        self.headers = [header for header, _ in columns]
+        self.lookups = [lookup for _, lookup in columns]
+        self.date_lookup = date_lookup  # Filtered by ?start_date / ?end_date
+        self.chunk_size = chunk_size
+
+    def filter(self, start_date=None, end_date=None):
+        queryset = self.queryset()
+        if start_date:
+            queryset = queryset.filter(**{f"{self.date_lookup}__gte": start_date})
+        if end_date:
+            queryset = queryset.filter(**{f"{self.date_lookup}__lte": end_date})
+        return queryset
+
+    def rows(self, queryset):
+        """Yield one tuple per row, as plain values (no model instances)."""
+        rows = queryset.order_by("pk").values_list("pk", *self.lookups)
+        last_pk = None
+        while True:
+            chunk = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[: self.chunk_size])
+            for row in chunk:
+                yield row[1:]
+            if len(chunk) < self.chunk_size:
+                return
+            last_pk = chunk[-1][0]
+
+    def filename(self, extension):
+        return f"{self.name}-{timezone.localdate():%Y%m%d}.{extension}"
+
+
+EXPORTS = {
+    "payments": Export(
+        "payments",
+        lambda: Payment.objects.all(),
+        [
+            ("ID", "id"),
+            ("Date", "created_at"),
+            ("Member", "member__username"),
+            ("Plan", "plan__name"),
+            ("Amount", "amount"),
+            ("Method", "payment_method"),
+            ("Reference", "reference"),
+            ("Status", "status"),
+            ("Recorded by", "recorded_by__username"),
+            ("Confirmed by", "confirmed_by__username"),
+        ],
+        date_lookup="created_at__date",
+    ),
+    "subscriptions": Export(
+        "subscriptions",
+        lambda: Subscription.objects.all(),  # Soft-deleted rows are excluded by the default manager
+        [
+            ("ID", "id"),
+            ("Subscription", "subscription_id"),
+            ("Member", "member__username"),
+            ("Plan", "plan__name"),
+            ("Amount paid", "amount_paid"),
+            ("Payment reference", "payment_reference"),
+            ("Start date", "start_date"),
+            ("End date", "end_date"),
+            ("Status", "status"),
+            ("Created", "created_at"),
+        ],
+        date_lookup="start_date",
+    ),
+    "attendance": Export(
+        "attendance",
+        lambda: Attendance.objects.all(),
+        [
+            ("ID", "id"),
+            ("Date", "date"),
+            ("Member", "member__username"),
+            ("Present", "present"),
+            ("Check-in", "check_in_time"),
+            ("Check-out", "checkout_time"),
+            ("Marked by", "marked_by__username"),
+        ],
+        date_lookup="date",
+    ),
+}
+
+
+def _local(value):
+    """Aware datetimes in local time without tzinfo (spreadsheets have no timezones), everything else unchanged."""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+class Echo:
+    """File-like object whose write() returns the line, so csv.writer output can be yielded straight to the response."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(export, queryset):
+    """StreamingHttpResponse sending the header at once, then each chunk of rows as it is read."""
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(export.headers)
+        for row in export.rows(queryset):
+            yield writer.writerow(["" if value is None else _local(value) for value in row])
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{export.filename("csv")}"'
+    return response
+
+
+def xlsx_response(export, queryset):
+    """
+    XLSX built with openpyxl's write-only workbook (rows are flushed to disk as they are appended, not kept in memory),
+    then streamed from a temporary file. Raises RuntimeError when openpyxl is not installed.
+    """
+    if Workbook is None:
+        raise RuntimeError("XLSX export requires openpyxl (pip install openpyxl)")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(export.name)
+    sheet.append(export.headers)
+    for row in export.rows(queryset):
+        sheet.append([_local(value) for value in row])
+
+    file = tempfile.TemporaryFile()  # Deleted when FileResponse closes it
+    workbook.save(file)
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=export.filename("xlsx"), content_type=XLSX_CONTENT_TYPE)
+
+
+def export_action(name, file_format="csv"):
+    """Django admin action exporting the selected rows of dataset `name`."""
+    export = EXPORTS[name]
+
+    def action(modeladmin, request, queryset):
+        if file_format == "xlsx":
+            try:
+                return xlsx_response(export, queryset)
+            except RuntimeError as e:
+                modeladmin.message_user(request, str(e), level="error")
+                return None
+        return stream_csv(export, queryset)
+
+    action.__name__ = f"export_{name}_{file_format}"
+    action.short_description = f"Export selected rows as {file_format.upper()}"
+    return action
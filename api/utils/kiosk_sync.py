@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from api.utils.attendance_rollups import insert_attendance
+from api.utils.occupancy_cache import refresh_occupancy
+from attendance.models import Attendance
+from users.models import CustomUser, UserTombstone
+
+ROSTER_FIELDS = ["id", "username", "first_name", "last_name", "is_active", "current_end_date"]
+ROSTER_PAGE_SIZE = getattr(settings, "KIOSK_ROSTER_PAGE_SIZE", 5000)
+# Caught-up tokens point this far back, so rows committed late by slow transactions are picked up on the next sync
+SYNC_OVERLAP = timedelta(seconds=getattr(settings, "KIOSK_SYNC_OVERLAP_SECONDS", 60))
+TOKEN_SALT = "kiosk-sync"
+
+
+def encode_since(updated_at, member_id):
+    """Opaque, signed since-token: the (updated_at, id) keyset position in the roster."""
+    return signing.dumps([updated_at.isoformat(), member_id], salt=TOKEN_SALT, compress=True)
+
+
+def decode_since(token):
+    """Return (updated_at, id) from a token made by `encode_since`. Raises signing.BadSignature or ValueError."""
+    updated_at, member_id = signing.loads(token, salt=TOKEN_SALT)
+    return datetime.fromisoformat(updated_at), int(member_id)
+
+
+def record_check_ins(events, marked_by_id):
+    """
+    Apply kiosk check-in events ({"key", "member", "at"}) and return one {"key", "status"} per event, in order.
+    - Members, existing attendance and rows already holding the batch's keys are read with one query each, new rows
+      are written with a single `insert_attendance`; a day marked concurrently in between is reported as "Already marked".
+    - Replaying an event (same key) returns "Recorded" again without writing, so a kiosk can resend until acknowledged.
+    - Statuses: "Recorded", "Already marked" (another event or a trainer marked that day first), "Not found" or
+      "Conflict" (the key already belongs to a check-in of another member or day).
+    """
+    if not events:
+        return []
+    for event in events:
+        local = timezone.localtime(event["at"])
+        event["date"], event["time"] = local.date(), local.time()
+
+    known_members = set(CustomUser.objects.filter(id__in={event["member"] for event in events}).values_list("id", flat=True))
+    existing = {
+        (member_id, day): client_key
+        for member_id, day, client_key in Attendance.objects.filter(
+            member_id__in=known_members, date__in={event["date"] for event in events}
+        ).values_list("member_id", "date", "client_key")
+    }
+    key_owners = {
+        client_key: (member_id, day)
+        for client_key, member_id, day in Attendance.objects.filter(
+            client_key__in={event["key"] for event in events}
+        ).values_list("client_key", "member_id", "date")
+    }
+
+    rows, recorded_by_row, statuses = {}, {}, [None] * len(events)
+    for index in sorted(range(len(events)), key=lambda index: events[index]["at"]):  # Earliest event of a day sets its check-in time
+        event = events[index]
+        pair = (event["member"], event["date"])
+        if event["member"] not in known_members:
+            statuses[index] = "Not found"
+        elif key_owners.get(event["key"], pair) != pair:
+            statuses[index] = "Conflict"
+        elif pair in existing:
+            statuses[index] = "Recorded" if existing[pair] == event["key"] else "Already marked"
+        elif pair in rows:
+            statuses[index] = "Recorded" if rows[pair].client_key == event["key"] else "Already marked"
+        else:
+            rows[pair] = Attendance(
+                member_id=event["member"], date=event["date"], check_in_time=event["time"], marked_by_id=marked_by_id,
+                client_key=event["key"],
+            )
+            key_owners[event["key"]] = pair
+            statuses[index] = "Recorded"
+        if statuses[index] == "Recorded" and pair in rows:
+            recorded_by_row.setdefault(pair, []).append(index)
+
+    with transaction.atomic():
+        inserted = insert_attendance(rows.values())
+        today = timezone.localdate()
+        if any(row.date == today for row in inserted):
+            transaction.on_commit(lambda: refresh_occupancy(today))
+
+    for pair in rows.keys() - {(row.member_id, row.date) for row in inserted}:  # A concurrent mark of the same day won
+        for index in recorded_by_row[pair]:
+            statuses[index] = "Already marked"
+
+    return [{"key": event["key"], "status": status} for event, status in zip(events, statuses)]
+
+
+def roster_delta(since=None, limit=ROSTER_PAGE_SIZE):
+    """
+    Members changed after the `since` position (from `decode_since`; None for a full download), oldest change first.
+    - Returns (rows, removed, next_token, has_more). Rows are lists in ROSTER_FIELDS order; coverage is `current_end_date`.
+    - `removed` lists the ids the kiosk must drop: users whose role moved away from Member, and deleted members
+      (UserTombstone) within the same window. A full download has nothing to remove.
+    - While has_more, the token continues right after the last row. Once caught up it points SYNC_OVERLAP back, so
+      the next sync may resend a few rows (clients upsert and delete by id) but never misses a late commit.
+    """
+    users = CustomUser.objects.order_by("updated_at", "id")  # Every role: a change away from Member is a removal
+    if since is not None:
+        updated_at, member_id = since
+        users = users.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=member_id))
+
+    page = list(users.values_list(*ROSTER_FIELDS, "role", "updated_at")[: limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    rows = [list(row[:-2]) for row in page if row[-2] == "Member"]
+    removed = []
+    if since is not None:
+        removed = [row[0] for row in page if row[-2] != "Member"]  # Kiosks delete ids they don't know as a no-op
+        tombstones = UserTombstone.objects.filter(deleted_at__gt=since[0])
+        if has_more:
+            tombstones = tombstones.filter(deleted_at__lte=page[-1][-1])  # The rest comes with the next page
+        removed += tombstones.order_by("deleted_at").values_list("user_id", flat=True)
+
+    if has_more:
+        next_token = encode_since(page[-1][-1], page[-1][0])
+    else:
+        next_token = encode_since(timezone.now() - SYNC_OVERLAP, 0)
+    return rows, removed, next_token, has_more
@@ -1,15 +1,174 @@
+import logging
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
 
+logger = logging.getLogger("gms.performance")
+
+# Profile of the request being handled. A context variable follows the request into the threads that run its ORM
+# work (sync_to_async copies the context), which a per-connection wrapper installed by the middleware would not.
+_current_profile = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Per-request timings collected by RequestTimerMiddleware.
+    - Times are in milliseconds.
+    - `app_ms` is view time spent outside SQL: serializers, but also password hashing or other Python work in the
+      view. `render_ms` is the renderer.
+    """
+
+    def __init__(self):
+        self.query_count = 0
+        self.sql_ms = 0.0
+        self.app_ms = None
+        self.render_ms = None
+        self.total_ms = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper: counts queries and their time."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+
+    def as_dict(self):
+        return {
+            "queries": self.query_count,
+            "sql": f"{self.sql_ms:.1f}ms",
+            "app": f"{self.app_ms:.1f}ms" if self.app_ms is not None else "N/A",
+        }
+
+    def server_timing(self):
+        """Value for the Server-Timing header."""
+        metrics = [f'db;dur={self.sql_ms:.1f};desc="{self.query_count} queries"']
+        if self.app_ms is not None:
+            metrics.append(f"app;dur={self.app_ms:.1f}")
+        if self.render_ms is not None:
+            metrics.append(f"render;dur={self.render_ms:.1f}")
+        metrics.append(f"total;dur={self.total_ms:.1f}")
+        return ", ".join(metrics)
+
+
+
+@contextmanager
+def profiling(profile):
+    """Count the queries run in this context (and threads started from it) into `profile`."""
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper installed on every connection: times the query into the current request's profile."""
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorders(**kwargs):
+    """
+    Connect `record_query` to the connections of the thread handling ORM work for requests.
+    - request_started runs in the request thread under WSGI and in the thread-sensitive executor under ASGI, which is
+      where sync views and sync_to_async calls run; connection_created covers connections opened by any other thread.
+    """
+    targets = [kwargs["connection"]] if "connection" in kwargs else connections.all(initialized_only=True)
+    for connection in targets:
+        install_query_recorder(connection)
+
+
+request_started.connect(install_query_recorders, dispatch_uid="gms_install_query_recorders")
+connection_created.connect(install_query_recorders, dispatch_uid="gms_install_query_recorder")
 
 class RequestTimerMiddleware:
     """
     Middleware to track request processing time.
+    - Stamps `request.start_time` (used by CustomJSONRenderer for `duration`).
+    - Profiles the request: query count and SQL time, other view time and render time.
+    - Reports them in a Server-Timing header and logs routes that exceed their budget (settings.REQUEST_PROFILING).
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):  # Under ASGI, async views run without a sync thread hop
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started = self.start(request)
+        with profiling(request.profile):
+            response = self.get_response(request)
+        return self.finish(request, response, started)
+
+    async def __acall__(self, request):
+        started = self.start(request)
+        with profiling(request.profile):
+            response = await self.get_response(request)
+        return self.finish(request, response, started)
+
+    def start(self, request):
         request.start_time = time.time()
-        response = self.get_response(request)
+        request.profile = RequestProfile()
+        return time.perf_counter()
+
+    def finish(self, request, response, started):
+        profile = request.profile
+        profile.total_ms = (time.perf_counter() - started) * 1000
+        if getattr(request, "view_ended_at", None) is not None and not response.streaming:
+            profile.render_ms = (time.perf_counter() - request.view_ended_at) * 1000
+
+        response["Server-Timing"] = profile.server_timing()
+        self.check_budget(request, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_started_at = time.perf_counter()
+        request.view_sql_ms = request.profile.sql_ms
+
+    def process_template_response(self, request, response):
+        """Called after the view returns a DRF Response and before it is rendered."""
+        if not hasattr(request, "view_started_at"):
+            return response
+        request.view_ended_at = time.perf_counter()
+        view_ms = (request.view_ended_at - request.view_started_at) * 1000
+        request.profile.app_ms = max(view_ms - (request.profile.sql_ms - request.view_sql_ms), 0.0)
         return response
+
+    def check_budget(self, request, profile):
+        budgets = getattr(settings, "REQUEST_PROFILING", {}).get("BUDGETS", {})
+        match = getattr(request, "resolver_match", None)
+        route = match.url_name if match else None
+        budget = budgets.get(route) or budgets.get("default")
+        if not budget:
+            return
+
+        over = []
+        if "queries" in budget and profile.query_count > budget["queries"]:
+            over.append(f"{profile.query_count} queries > {budget['queries']}")
+        if "duration_ms" in budget and profile.total_ms > budget["duration_ms"]:
+            over.append(f"{profile.total_ms:.0f}ms > {budget['duration_ms']}ms")
+
+        if over:
+            logger.warning(
+                "Request budget exceeded: %s %s (%s): %s [%s]",
+                request.method, request.path, route or "unnamed", ", ".join(over), profile.server_timing(),
+            )
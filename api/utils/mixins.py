@@ -0,0 +1,60 @@
+import logging
+from django.http import StreamingHttpResponse
+from api.utils.middlewares import profiling
+from api.utils.pagination import KeysetPagination
+from api.utils.renderers import CustomJSONRenderer
+
+logger = logging.getLogger("gms.performance")
+
+
+class StreamingListMixin:
+    """
+    Adds a streaming mode to list views: `?stream=true`.
+    - Reads the filtered queryset `stream_chunk_size` rows at a time with keyset queries on the view's
+      `keyset_ordering`. Unlike `.iterator()`, which the MySQL driver buffers whole, memory stays bounded by one chunk.
+    - Serializes row by row and sends the CustomJSONRenderer envelope as it goes.
+    - Rows are read after the response headers are sent, so Server-Timing only covers the queries made before
+      streaming; the streamed queries are added to the request profile and logged once the stream ends.
+    """
+
+    stream_chunk_size = 2000  # Rows fetched from the DB per round trip
+
+    def should_stream(self, request):
+        return request.query_params.get("stream", "").lower() in ["1", "true", "yes"]
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_stream(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()  # Bound once, reused for every row
+        rows = (serializer.to_representation(obj) for obj in self.stream_queryset(queryset, request))
+
+        return StreamingHttpResponse(
+            CustomJSONRenderer().render_stream(rows, request=request),
+            content_type=CustomJSONRenderer.media_type,
+        )
+
+    def stream_queryset(self, queryset, request):
+        """Yield the rows of `queryset` in keyset order, one chunk per query."""
+        keyset = KeysetPagination()
+        ordering = keyset.get_ordering(self)
+        queryset = queryset.order_by(*ordering)
+        profile = getattr(request, "profile", None)
+
+        values, streamed = None, 0
+        while True:
+            page = queryset if values is None else queryset.filter(keyset.keyset_filter(ordering, values))
+            with profiling(profile):
+                chunk = list(page[: self.stream_chunk_size])
+            yield from chunk
+            streamed += len(chunk)
+            if len(chunk) < self.stream_chunk_size:
+                break
+            values = [getattr(chunk[-1], field.lstrip("-")) for field in ordering]
+
+        if profile is not None:
+            logger.info(
+                "Streamed %s %s: %s rows, %s queries, %.1fms SQL in total",
+                request.method, request.path, streamed, profile.query_count, profile.sql_ms,
+            )
@@ -0,0 +1,103 @@
+import asyncio
+import time
+import weakref
+from django.conf import settings
+from api.utils.mpesa_client import DarajaRequests
+
+try:
+    import httpx  # Optional, only needed for the async views
+except ImportError:
+    httpx = None
+
+
+class AsyncMpesaClient(DarajaRequests):
+    """
+    asyncio Daraja client built on httpx.AsyncClient.
+    - One pooled keep-alive AsyncClient per event loop; a single ASGI worker can hold hundreds of pushes in flight.
+    - Same token caching as MpesaClient, with an asyncio.Lock so concurrent pushes share one refresh.
+    - Use `get_async_mpesa_client()` to get the instance for the running loop.
+    """
+
+    TOKEN_EXPIRY_MARGIN = 60
+    TIMEOUT = 30.0
+
+    def __init__(self):
+        if httpx is None:
+            raise RuntimeError("httpx is required for AsyncMpesaClient (pip install httpx)")
+
+        self.base_url = self.get_base_url()
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=getattr(settings, "MPESA_ASYNC_MAX_CONNECTIONS", 200)),
+            transport=httpx.AsyncHTTPTransport(retries=3),  # Retries connection failures only
+        )
+        self._access_token = None
+        self._token_expires_at = 0
+        self._token_lock = asyncio.Lock()
+
+    async def get_access_token(self):
+        if self._access_token and time.monotonic() < self._token_expires_at:
+            return self._access_token
+
+        async with self._token_lock:
+            if self._access_token and time.monotonic() < self._token_expires_at:
+                return self._access_token
+
+            response = await self.client.get(
+                "/oauth/v1/generate",
+                params={"grant_type": "client_credentials"},
+                auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET),
+            )
+            if response.status_code != 200:
+                raise Exception(f"Failed to get access token: {response.status_code}, {response.text}")
+
+            try:
+                data = response.json()
+            except ValueError:
+                raise Exception(f"Invalid JSON response: {response.text}")
+
+            self._access_token = data.get("access_token")
+            self._token_expires_at = time.monotonic() + max(int(data.get("expires_in", 0)) - self.TOKEN_EXPIRY_MARGIN, 0)
+            return self._access_token
+
+    async def post(self, path, payload, action):
+        """POST an authorized Daraja request, returning the JSON body or {"error": ...} like MpesaClient."""
+        try:
+            access_token = await self.get_access_token()
+            if not access_token:
+                return {"error": "Failed to get access token"}
+
+            response = await self.client.post(path, json=payload, headers={"Authorization": f"Bearer {access_token}"})
+
+            if response.status_code == 401:
+                self._access_token = None  # Token revoked early, fetch a fresh one next time
+
+            if response.status_code != 200:
+                return {"error": f"{action} failed: {response.status_code}, {response.text}"}
+
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def stk_push(self, phone_number, amount, account_reference, transaction_desc):
+        payload = self.stk_push_payload(phone_number, amount, account_reference, transaction_desc)
+        return await self.post("/mpesa/stkpush/v1/processrequest", payload, "STK Push")
+
+    async def stk_query(self, checkout_request_id):
+        return await self.post("/mpesa/stkpushquery/v1/query", self.stk_query_payload(checkout_request_id), "STK Query")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = weakref.WeakKeyDictionary()  # Event loop -> client
+
+
+def get_async_mpesa_client():
+    """Return the AsyncMpesaClient bound to the running event loop (httpx clients can't be shared across loops)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncMpesaClient()
+    return client
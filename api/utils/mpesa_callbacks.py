@@ -0,0 +1,146 @@
+import logging
+import threading
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from api.utils.mpesa_dispatcher import get_executor
+from payments.models import MpesaCallback, MpesaTransaction, Payment
+from api.utils.renewals import renew_subscription
+
+CALLBACK_ACK = {"ResultCode": 0, "ResultDesc": "Accepted"}
+
+logger = logging.getLogger("gms.mpesa")
+
+
+def enqueue_stk_callback(data):
+    """
+    Store an STK callback and acknowledge it, the payment is applied in the background.
+    - Safaricom retries of the same CheckoutRequestID are acknowledged without being stored again.
+    - Returns (response body, status code) for the sync and async callback views.
+    """
+    callback_data = data.get("Body", {}).get("stkCallback", {}) if isinstance(data, dict) else {}
+    checkout_request_id = callback_data.get("CheckoutRequestID") if isinstance(callback_data, dict) else None
+    if not checkout_request_id:
+        return {"error": "Invalid callback data", "message": "CheckoutRequestID is missing"}, 400
+
+    with transaction.atomic():
+        callback, created = MpesaCallback.objects.get_or_create(
+            checkout_request_id=checkout_request_id, defaults={"payload": data}
+        )
+        if created:
+            transaction.on_commit(lambda: dispatch_stk_callback(callback.id))
+        else:
+            print(f"Duplicate callback for CheckoutRequestID {checkout_request_id} ignored")
+
+    return CALLBACK_ACK, 200
+
+
+def dispatch_stk_callback(callback_id):
+    """Apply a stored callback on the worker pool."""
+    get_executor().submit(run_stk_callback, callback_id)
+
+
+def schedule_callback_retry(callback_id):
+    """Dispatch the callback again after settings.MPESA_CALLBACK_RETRY_DELAY seconds."""
+    timer = threading.Timer(getattr(settings, "MPESA_CALLBACK_RETRY_DELAY", 5), dispatch_stk_callback, args=[callback_id])
+    timer.daemon = True
+    timer.start()
+
+
+def run_stk_callback(callback_id):
+    close_old_connections()
+    try:
+        apply_stk_callback(callback_id)
+    except Exception:
+        logger.exception("M-Pesa callback %s failed", callback_id)
+    finally:
+        close_old_connections()
+
+
+def apply_stk_callback(callback_id):
+    """
+    Apply a "Received" callback exactly once.
+    - The callback row is locked, so concurrent workers skip it once another one has it.
+    - Payment updates run in a savepoint; when they fail the callback is kept as "Failed" with the error.
+    - A callback for an unknown CheckoutRequestID may have beaten the push that saves it: it stays "Received" and is
+      retried after a delay, up to settings.MPESA_CALLBACK_MAX_ATTEMPTS attempts, before it is marked "Failed".
+    """
+    with transaction.atomic():
+        callback = MpesaCallback.objects.select_for_update().filter(id=callback_id, status="Received").first()
+        if callback is None:
+            return None  # Applied by another worker
+
+        callback.attempts += 1
+        try:
+            with transaction.atomic():
+                apply_stk_result(callback.payload["Body"]["stkCallback"])
+        except MpesaTransaction.DoesNotExist as e:
+            callback.error = f"{e.__class__.__name__}: {e}"
+            if callback.attempts < getattr(settings, "MPESA_CALLBACK_MAX_ATTEMPTS", 10):
+                transaction.on_commit(lambda: schedule_callback_retry(callback.id))
+            else:
+                callback.status = "Failed"
+        except (Payment.DoesNotExist, IntegrityError, KeyError, TypeError) as e:
+            callback.status = "Failed"
+            callback.error = f"{e.__class__.__name__}: {e}"
+        else:
+            callback.status = "Processed"
+            callback.error = None
+
+        if callback.status != "Received":
+            callback.processed_at = timezone.now()
+        callback.save(update_fields=["status", "attempts", "error", "processed_at"])
+        if callback.status == "Failed":
+            logger.warning("M-Pesa callback %s failed: %s", callback.id, callback.error)
+        return callback
+
+
+def apply_stk_result(callback_data):
+    """
+    Complete or fail the transaction and payment named in an stkCallback.
+    - Both rows are locked; a transaction that already has its result is left alone, so no subscription is created twice.
+    - Success renews the member's subscription, failure deletes the pending payment.
+    """
+    checkout_request_id = callback_data["CheckoutRequestID"]
+    result_code = callback_data.get("ResultCode")
+
+    mpesa_transaction = MpesaTransaction.objects.select_for_update().get(checkout_request_id=checkout_request_id)
+    if mpesa_transaction.status in ["Completed", "Failed"]:
+        return mpesa_transaction
+
+    payments = Payment.objects.select_for_update()
+    if mpesa_transaction.payment_id:
+        payment = payments.get(id=mpesa_transaction.payment_id)
+    else:
+        payment = payments.get(reference=mpesa_transaction.reference)  # Transactions recorded before the payment link
+
+    mpesa_transaction.result_code = result_code
+    mpesa_transaction.result_desc = callback_data.get("ResultDesc")
+
+    if result_code != 0:
+        print(f"Payment {payment.reference} failed: {mpesa_transaction.result_desc}")
+        mpesa_transaction.status = "Failed"
+        mpesa_transaction.save()
+        payment.delete()  # Ensures you only keep payments that succeeded
+        return mpesa_transaction
+
+    mpesa_transaction.status = "Completed"
+    for item in callback_data.get("CallbackMetadata", {}).get("Item", []):
+        if item["Name"] == "Amount":
+            mpesa_transaction.amount = item["Value"]
+        elif item["Name"] == "MpesaReceiptNumber":
+            mpesa_transaction.mpesa_receipt_number = item["Value"]
+        elif item["Name"] == "TransactionDate":
+            mpesa_transaction.transaction_date = item["Value"]
+        elif item["Name"] == "PhoneNumber":
+            mpesa_transaction.phone_number = str(item["Value"])
+    mpesa_transaction.save()
+
+    payment.status = "Completed"
+    payment.save(update_fields=["status", "updated_at"])
+
+    renew_subscription(payment.member_id, payment.plan, payment.reference)  # Stacked on the member's current coverage
+
+    print(f"Payment {payment.reference} completed")
+    return mpesa_transaction
+
@@ -1,36 +1,129 @@
 import requests
 import datetime
 import base64
+import threading
+import time
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
-class MpesaClient:
+class DarajaRequests:
+    """Daraja URLs and request payloads shared by MpesaClient and AsyncMpesaClient."""
+
+    STK_CALLBACK_URL = "https://e911-41-220-235-155.ngrok-free.app/api/mpesa/callback/"
+
+    def get_base_url(self):
+        # MPESA_BASE_URL overrides the environment, e.g. to point at the local stub server (mpesa_stub_server)
+        if getattr(settings, "MPESA_BASE_URL", ""):
+            return settings.MPESA_BASE_URL.rstrip("/")
+        return "https://sandbox.safaricom.co.ke" if settings.MPESA_ENV == "sandbox" else "https://api.safaricom.co.ke"
+
+    def generate_password(self, timestamp):
+        """Generates Mpesa API password using the provided shortcode and passkey"""
+        password_str = f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}"
+        password_bytes = password_str.encode("utf-8")  # Convert to bytes
+        return base64.b64encode(password_bytes).decode("utf-8")  # Encode and decode to string
+
+    def stk_push_payload(self, phone_number, amount, account_reference, transaction_desc):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        return {
+            "BusinessShortCode": settings.MPESA_SHORTCODE,
+            "Password": self.generate_password(timestamp=timestamp),
+            "Timestamp": timestamp,
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": amount,
+            "PartyA": phone_number,
+            "PartyB": settings.MPESA_SHORTCODE,
+            "PhoneNumber": phone_number,
+            "CallBackURL": self.STK_CALLBACK_URL,
+            "AccountReference": account_reference,
+            "TransactionDesc": transaction_desc,
+        }
+
+    def stk_query_payload(self, checkout_request_id):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        return {
+            "BusinessShortCode": settings.MPESA_SHORTCODE,
+            "Password": self.generate_password(timestamp=timestamp),
+            "Timestamp": timestamp,
+            "CheckoutRequestID": checkout_request_id,
+        }
+
+
+class MpesaClient(DarajaRequests):
+    """
+    Daraja API client.
+    - Uses one pooled keep-alive `requests.Session`, so pushes reuse TCP/TLS connections.
+    - Caches the OAuth access token until shortly before `expires_in`; concurrent callers share a single refresh.
+    - Use `get_mpesa_client()` to get the process-wide instance.
+    """
+
+    TOKEN_EXPIRY_MARGIN = 60  # Refresh the token this many seconds before Safaricom expires it
+    TIMEOUT = (5, 30)  # (connect, read) seconds
+
     def __init__(self):
-        self.base_url = "https://sandbox.safaricom.co.ke" if settings.MPESA_ENV == "sandbox" else "https://api.safaricom.co.ke"
+        self.base_url = self.get_base_url()
+        self.session = self.build_session()
+        self._access_token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+
+    def build_session(self):
+        # Connection errors are retried for every method (nothing reached Safaricom).
+        # Read/status retries only for GET so an STK push is never sent twice.
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=2,
+            status=2,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)  # Sandbox/stub base URLs (MPESA_BASE_URL)
+        return session
 
     def get_access_token(self):
+        """Return a cached access token, fetching a new one (once, under a lock) when it is about to expire."""
+        if self._access_token and time.monotonic() < self._token_expires_at:
+            return self._access_token
+
+        with self._token_lock:
+            # Another thread may have refreshed it while we waited
+            if self._access_token and time.monotonic() < self._token_expires_at:
+                return self._access_token
+
+            access_token, expires_in = self.fetch_access_token()
+            self._access_token = access_token
+            self._token_expires_at = time.monotonic() + max(expires_in - self.TOKEN_EXPIRY_MARGIN, 0)
+            return access_token
+
+    def fetch_access_token(self):
+        """Request a new OAuth token. Returns (access_token, expires_in seconds)."""
         # url = settings.ACCESS_TOKEN_URL
 
-        url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
+        url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
 
         # Make the request with Basic Auth
-        response = requests.get(url, auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET))
+        response = self.session.get(
+            url, auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET), timeout=self.TIMEOUT
+        )
 
-        print("Access Token Response:", response.status_code, response.text)  # Debugging
+        print("Access Token Response:", response.status_code)  # Debugging
 
         if response.status_code != 200:
             raise Exception(f"Failed to get access token: {response.status_code}, {response.text}")
 
         try:
-            return response.json().get("access_token")
+            data = response.json()
         except requests.exceptions.JSONDecodeError:
             raise Exception(f"Invalid JSON response: {response.text}")
 
-    def generate_password(self, timestamp):
-        """Generates Mpesa API password using the provided shortcode and passkey"""
-        password_str = f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}"
-        password_bytes = password_str.encode("utf-8")  # Convert to bytes
-        return base64.b64encode(password_bytes).decode("utf-8")  # Encode and decode to string
+        return data.get("access_token"), int(data.get("expires_in", 0))
 
     def stk_push(self, phone_number, amount, account_reference, transaction_desc):
         try:
@@ -41,40 +134,63 @@ class MpesaClient:
 
             # url = settings.STK_PUSH_URL
 
-            url = "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest"
+            url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
             headers = {
                 "Authorization": f"Bearer {access_token}",
             }
 
-            timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-            print("timestamp:", timestamp)
-
-            password = self.generate_password(timestamp=timestamp)
-            print("Generated Password:", password)
-
-            payload = {
-                "BusinessShortCode": settings.MPESA_SHORTCODE,
-                "Password": password,
-                "Timestamp": timestamp,
-                "TransactionType": "CustomerPayBillOnline",
-                "Amount": amount,
-                "PartyA": phone_number,
-                "PartyB": settings.MPESA_SHORTCODE,
-                "PhoneNumber": phone_number,
-                "CallBackURL": "https://e911-41-220-235-155.ngrok-free.app/api/mpesa/callback/",
-                "AccountReference": account_reference,
-                "TransactionDesc": transaction_desc,
-            }
+            payload = self.stk_push_payload(phone_number, amount, account_reference, transaction_desc)
 
             print(f"payload : {payload}")
 
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.session.post(url, json=payload, headers=headers, timeout=self.TIMEOUT)
 
             print("STK Push Response:", response.status_code, response.text) 
 
+            if response.status_code == 401:
+                self.clear_access_token()  # Token revoked early, fetch a fresh one next time
+
             if response.status_code != 200:
                 return {"error": f"STK Push failed: {response.status_code}, {response.text}"}
 
             return response.json()
         except Exception as e:
             return {"error": str(e)}
+
+    def stk_query(self, checkout_request_id):
+        """Ask Daraja for the result of an STK push (useful when a callback never arrives)."""
+        try:
+            url = f"{self.base_url}/mpesa/stkpushquery/v1/query"
+            headers = {"Authorization": f"Bearer {self.get_access_token()}"}
+            response = self.session.post(
+                url, json=self.stk_query_payload(checkout_request_id), headers=headers, timeout=self.TIMEOUT
+            )
+
+            if response.status_code == 401:
+                self.clear_access_token()
+
+            if response.status_code != 200:
+                return {"error": f"STK Query failed: {response.status_code}, {response.text}"}
+
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def clear_access_token(self):
+        with self._token_lock:
+            self._access_token = None
+            self._token_expires_at = 0
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_mpesa_client():
+    """Return the process-wide MpesaClient (shared connection pool and token cache)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MpesaClient()
+    return _client
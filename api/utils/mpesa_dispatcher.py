@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from api.utils.mpesa_client import get_mpesa_client
+from payments.models import MpesaTransaction, Payment
+
+logger = logging.getLogger("gms.mpesa")
+
+_executors = {}
+_executor_lock = threading.Lock()
+_rate_limiter = None
+
+
+def _get_pool(name, max_workers):
+    executor = _executors.get(name)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+    return executor
+
+
+def get_executor():
+    """Process-wide pool for M-Pesa work done off the request thread (queued single STK pushes and callbacks)."""
+    return _get_pool("stk-push", getattr(settings, "MPESA_PUSH_WORKERS", 4))
+
+
+def get_batch_executor():
+    """Separate pool for batch pushes, so a large batch waiting on the rate limiter never holds up callbacks."""
+    return _get_pool("stk-batch", getattr(settings, "MPESA_BATCH_PUSH_WORKERS", 2))
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads. A rate of 0 disables it."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.interval
+        time.sleep(start_at - now)
+
+
+def get_rate_limiter():
+    """Process-wide limiter for queued pushes, set by settings.MPESA_PUSH_RATE_LIMIT (pushes per second)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _executor_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(getattr(settings, "MPESA_PUSH_RATE_LIMIT", 0))
+    return _rate_limiter
+
+
+def daraja_phone_number(phone_number):
+    """Format a stored PhoneNumber the way Daraja expects it (e.g. 2547XXXXXXXX)."""
+    if phone_number is None:
+        return ""
+    if getattr(phone_number, "is_valid", None) and phone_number.is_valid():
+        return f"{phone_number.country_code}{phone_number.national_number}"
+    return str(phone_number).lstrip("+")
+
+
+def dispatch_stk_push(transaction_id):
+    """Queue the STK push for a "Queued" MpesaTransaction on the worker pool."""
+    get_executor().submit(run_stk_push, transaction_id)
+
+
+def dispatch_batch_push(transaction_ids):
+    """
+    Queue the STK pushes for many "Queued" MpesaTransactions on the batch pool.
+    - Concurrency is bounded by the pool (MPESA_BATCH_PUSH_WORKERS) and pace by the rate limiter.
+    """
+    executor = get_batch_executor()
+    for transaction_id in transaction_ids:
+        executor.submit(run_stk_push, transaction_id)
+
+
+def run_stk_push(transaction_id):
+    close_old_connections()
+    try:
+        return push_queued_transaction(transaction_id)
+    except Exception:
+        logger.exception("STK push for transaction %s failed", transaction_id)
+    finally:
+        close_old_connections()
+
+
+def push_queued_transaction(transaction_id):
+    """
+    Send the STK push for a queued transaction and record Safaricom's answer.
+    - The row is claimed first (Queued -> Pushing, stamping claimed_at) so it is never pushed twice while the claim holds.
+    - On success the transaction is "Pending" with its CheckoutRequestID, the callback completes it.
+    - On failure both the transaction and its payment are marked "Failed".
+    """
+    claimed = MpesaTransaction.objects.filter(id=transaction_id, status="Queued").update(status="Pushing", claimed_at=timezone.now())
+    if not claimed:
+        return None
+
+    mpesa_transaction = MpesaTransaction.objects.get(id=transaction_id)
+    get_rate_limiter().wait()
+    response = get_mpesa_client().stk_push(
+        daraja_phone_number(mpesa_transaction.phone_number),
+        int(mpesa_transaction.amount),
+        mpesa_transaction.reference,
+        mpesa_transaction.description or "Payment for services",
+    )
+
+    if "error" not in response and response.get("ResponseCode") == "0":
+        mpesa_transaction.merchant_request_id = response.get("MerchantRequestID")
+        mpesa_transaction.checkout_request_id = response.get("CheckoutRequestID")
+        mpesa_transaction.status = "Pending"  # Awaiting the callback
+    else:
+        mpesa_transaction.status = "Failed"
+        mpesa_transaction.result_desc = response.get("error") or response.get("ResponseDescription")
+        Payment.objects.filter(id=mpesa_transaction.payment_id).update(status="Failed")
+
+    mpesa_transaction.save(update_fields=["merchant_request_id", "checkout_request_id", "status", "result_desc"])
+    return mpesa_transaction
+
+
+def requeue_stale_pushes(timeout=None):
+    """
+    Put "Pushing" rows claimed more than `timeout` seconds ago (settings.MPESA_PUSH_CLAIM_TIMEOUT) back to "Queued".
+    - A worker that died between the claim and Safaricom's answer would otherwise leave the row in Pushing forever.
+    - The timeout must exceed a push (rate limiter wait plus the HTTP timeout), or live pushes are sent twice.
+    - Returns the number of rows re-queued.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "MPESA_PUSH_CLAIM_TIMEOUT", 300)
+    expired = timezone.now() - timedelta(seconds=timeout)
+    return MpesaTransaction.objects.filter(status="Pushing", claimed_at__lt=expired).update(status="Queued", claimed_at=None)
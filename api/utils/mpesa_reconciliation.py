@@ -0,0 +1,221 @@
+import csv
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from api.utils.mpesa_client import get_mpesa_client
+from api.utils.renewals import renew_subscriptions
+from payments.models import MpesaTransaction, Payment
+from subscriptions.models import Plan
+
+# Default column names of the M-Pesa organisation statement export
+STATEMENT_COLUMNS = {
+    "receipt": "Receipt No.",
+    "reference": "A/C No.",
+    "amount": "Paid In",
+    "status": "Transaction Status",
+}
+
+# stk_query ResultCodes that mean the customer never paid
+FAILED_RESULT_CODES = {"1", "1001", "1019", "1025", "1032", "1037", "2001"}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def read_statement(file, columns=STATEMENT_COLUMNS):
+    """
+    Stream outcomes from a CSV statement export, one dict per row.
+    - Rows are read lazily, so large statements are never fully loaded.
+    - Only "Completed" and "Failed"/"Cancelled" rows are settled; anything else is skipped.
+    """
+    for row in csv.DictReader(file):
+        state = (row.get(columns["status"]) or "").strip().lower()
+        if state == "completed":
+            succeeded = True
+        elif state in ["failed", "cancelled"]:
+            succeeded = False
+        else:
+            continue
+
+        try:
+            amount = Decimal((row.get(columns["amount"]) or "").replace(",", "")) or None
+        except InvalidOperation:
+            amount = None
+
+        yield {
+            "reference": (row.get(columns["reference"]) or "").strip(),
+            "checkout_request_id": None,
+            "receipt": (row.get(columns["receipt"]) or "").strip() or None,
+            "amount": amount,
+            "succeeded": succeeded,
+            "result_desc": f"Reconciled from statement ({state})",
+        }
+
+
+def query_pending(transactions, workers=8):
+    """
+    Stream outcomes by asking Daraja (STK Push Query) about pending transactions, `workers` queries at a time.
+    - Pushes Safaricom is still processing, or that could not be queried, are skipped and stay pending.
+    """
+    mpesa = get_mpesa_client()
+
+    def query(mpesa_transaction):
+        return mpesa_transaction, mpesa.stk_query(mpesa_transaction.checkout_request_id)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mpesa-reconcile") as pool:
+        for chunk in chunked(transactions, workers * 10):
+            for mpesa_transaction, response in pool.map(query, chunk):
+                result_code = str(response.get("ResultCode", ""))
+                if "error" in response or not result_code:
+                    continue  # Still being processed, or the query failed
+                if result_code != "0" and result_code not in FAILED_RESULT_CODES:
+                    continue
+
+                yield {
+                    "reference": mpesa_transaction.reference,
+                    "checkout_request_id": mpesa_transaction.checkout_request_id,
+                    "receipt": None,  # STK Push Query does not return the receipt
+                    "amount": None,
+                    "succeeded": result_code == "0",
+                    "result_code": int(result_code),
+                    "result_desc": response.get("ResultDesc"),
+                }
+
+
+def update_rows(transactions, fields):
+    """
+    Write per-row values of `fields` for many transactions with a single executemany.
+    - bulk_update builds a CASE WHEN expression per row and field in Python, which costs ~8s per 30k rows;
+      a parameterised UPDATE through executemany does the same in a fraction of a second.
+    """
+    if not transactions:
+        return
+    quote_name = connection.ops.quote_name
+    columns = [MpesaTransaction._meta.get_field(name) for name in fields]
+    sql = "UPDATE {} SET {} WHERE {} = %s".format(
+        quote_name(MpesaTransaction._meta.db_table),
+        ", ".join(f"{quote_name(column.column)} = %s" for column in columns),
+        quote_name(MpesaTransaction._meta.pk.column),
+    )
+    params = [
+        [column.get_db_prep_save(getattr(mpesa_transaction, column.attname), connection) for column in columns] + [mpesa_transaction.pk]
+        for mpesa_transaction in transactions
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class Reconciler:
+    """
+    Settles pending M-Pesa transactions from a stream of outcomes (see `read_statement` and `query_pending`).
+    - Pending transactions are loaded once into hash tables keyed by reference and CheckoutRequestID.
+    - Outcomes are matched in memory and settled per chunk: one locked read, then set-based updates and renew_subscriptions.
+    - Rows are re-checked under the lock, so a callback applied meanwhile is never settled twice.
+    """
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+        self.by_reference = {}
+        self.by_checkout = {}
+        self.counts = {"rows": 0, "matched": 0, "completed": 0, "failed": 0, "unmatched": 0, "skipped": 0}
+
+        pending = MpesaTransaction.objects.filter(status="Pending").values_list("id", "reference", "checkout_request_id")
+        for transaction_id, reference, checkout_request_id in pending.iterator(chunk_size=5000):
+            if reference:
+                self.by_reference[reference] = transaction_id
+            if checkout_request_id:
+                self.by_checkout[checkout_request_id] = transaction_id
+
+    def run(self, outcomes):
+        for chunk in chunked(outcomes, self.chunk_size):
+            self.settle(chunk)
+        return self.counts
+
+    def match(self, outcome):
+        if outcome.get("checkout_request_id") in self.by_checkout:
+            return self.by_checkout[outcome["checkout_request_id"]]
+        return self.by_reference.get(outcome.get("reference"))
+
+    def settle(self, outcomes):
+        self.counts["rows"] += len(outcomes)
+        matched = {}
+        for outcome in outcomes:
+            transaction_id = self.match(outcome)
+            if transaction_id is None:
+                self.counts["unmatched"] += 1
+            else:
+                matched[transaction_id] = outcome
+        if not matched:
+            return
+
+        with transaction.atomic():
+            transactions = list(MpesaTransaction.objects.select_for_update().filter(id__in=matched, status="Pending"))
+            self.counts["skipped"] += len(matched) - len(transactions)  # Settled since the index was built
+
+            payment_filter = Q(id__in=[t.payment_id for t in transactions if t.payment_id])
+            payment_filter |= Q(reference__in=[t.reference for t in transactions if not t.payment_id])
+            payments = list(Payment.objects.select_for_update().filter(payment_filter))
+            payments_by_id = {payment.id: payment for payment in payments}
+            payments_by_reference = {payment.reference: payment for payment in payments}
+            plans = Plan.objects.in_bulk({payment.plan_id for payment in payments})
+
+            receipts = [matched[t.id]["receipt"] for t in transactions if matched[t.id]["receipt"]]
+            used_receipts = set(
+                MpesaTransaction.objects.filter(mpesa_receipt_number__in=receipts).values_list("mpesa_receipt_number", flat=True)
+            )
+
+            # Rows sharing an outcome are settled with one UPDATE ... WHERE id IN (...); only receipts and amounts differ per row
+            settled_ids = defaultdict(list)  # (status, result_code, result_desc) -> transaction ids
+            row_fields = {"mpesa_receipt_number"}  # "amount" is added when a statement amount differs
+            settled_transactions, settled_rows, completed_payment_ids, failed_payment_ids, renewals = [], [], [], [], []
+            for mpesa_transaction in transactions:
+                outcome = matched[mpesa_transaction.id]
+                payment = payments_by_id.get(mpesa_transaction.payment_id) or payments_by_reference.get(mpesa_transaction.reference)
+                if outcome["receipt"] in used_receipts:
+                    self.counts["skipped"] += 1  # Receipt already belongs to another transaction
+                    continue
+
+                if outcome["receipt"]:
+                    mpesa_transaction.mpesa_receipt_number = outcome["receipt"]
+                    used_receipts.add(outcome["receipt"])
+                if outcome["amount"] and outcome["amount"] != mpesa_transaction.amount:
+                    mpesa_transaction.amount = outcome["amount"]
+                    row_fields.add("amount")
+                if outcome["receipt"] or outcome["amount"]:
+                    settled_rows.append(mpesa_transaction)
+
+                if outcome["succeeded"]:
+                    status = "Completed"
+                    if payment is not None:
+                        completed_payment_ids.append(payment.id)
+                        renewals.append((payment.member_id, plans[payment.plan_id], payment.reference))
+                    self.counts["completed"] += 1
+                else:
+                    status = "Failed"
+                    if payment is not None:
+                        failed_payment_ids.append(payment.id)
+                    self.counts["failed"] += 1
+
+                result_code = outcome.get("result_code", 0 if outcome["succeeded"] else None)
+                settled_ids[(status, result_code, outcome["result_desc"])].append(mpesa_transaction.id)
+                settled_transactions.append(mpesa_transaction)
+
+            for (status, result_code, result_desc), ids in settled_ids.items():
+                MpesaTransaction.objects.filter(id__in=ids).update(status=status, result_code=result_code, result_desc=result_desc)
+            update_rows(settled_rows, sorted(row_fields))
+            Payment.objects.filter(id__in=completed_payment_ids).update(status="Completed", updated_at=timezone.now())
+            Payment.objects.filter(id__in=failed_payment_ids).delete()  # Same as a failed callback
+            if renewals:
+                renew_subscriptions(renewals)  # One locked read of the chunk's members, stacked on their coverage
+
+        self.counts["matched"] += len(settled_transactions)
+        for mpesa_transaction in settled_transactions:
+            self.by_reference.pop(mpesa_transaction.reference, None)
+            self.by_checkout.pop(mpesa_transaction.checkout_request_id, None)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from attendance.models import Attendance
+
+OCCUPANCY_CACHE_TIMEOUT = getattr(settings, "OCCUPANCY_CACHE_TIMEOUT", 60 * 5)
+
+
+def _occupancy_key(day):
+    return f"attendance:occupancy:{day.isoformat()}"
+
+
+def load_occupancy(day):
+    """Ids of members checked in on `day` and not checked out (served by the (date, checkout_time) index)."""
+    return set(
+        Attendance.objects.filter(date=day, check_in_time__isnull=False, checkout_time__isnull=True).values_list("member_id", flat=True)
+    )
+
+
+def get_occupancy(day=None):
+    """Return the set of members currently in the gym. Reads the database only on a cache miss."""
+    day = day or timezone.localdate()
+    key = _occupancy_key(day)
+    members = cache.get(key)
+    if members is None:
+        members = load_occupancy(day)
+        cache.set(key, members, OCCUPANCY_CACHE_TIMEOUT)
+    return members
+
+
+def refresh_occupancy(day=None):
+    """
+    Reload the set after a check-in or check-out (run on commit).
+    - Reloaded rather than patched: concurrent read-modify-writes of one cache key would lose members, a reload cannot.
+    """
+    day = day or timezone.localdate()
+    cache.set(_occupancy_key(day), load_occupancy(day), OCCUPANCY_CACHE_TIMEOUT)
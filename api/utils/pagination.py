@@ -0,0 +1,108 @@
+import base64
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination used by every list endpoint.
+    - Opt-in: only applies when the client sends `page_size` or `cursor`, otherwise lists are returned whole as before.
+    - Pages are ordered by the view's `keyset_ordering` (e.g. ("-created_at", "-id")), which must end with a unique field.
+    - The cursor holds the key of the last row, so every page is an index range scan (no OFFSET).
+    """
+
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    default_ordering = ("id",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, "keyset_ordering", self.default_ordering))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, queryset, ordering):
+        """Turn the `cursor` query param back into typed key values (None when absent)."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if len(values) != len(ordering):
+                raise ValueError
+            return [
+                queryset.model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, ordering):
+        values = [getattr(obj, field.lstrip("-")) for field in ordering]
+        values = [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def keyset_filter(self, ordering, values):
+        """
+        Rows strictly after the cursor:
+        (a > va) OR (a = va AND b > vb) OR ... with `<` for descending fields.
+        """
+        condition = Q()
+        for position, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            branch = Q(**{f"{name}__{lookup}": values[position]})
+            for previous_field, previous_value in zip(ordering[:position], values[:position]):
+                branch &= Q(**{previous_field.lstrip("-"): previous_value})
+            condition |= branch
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None  # Pagination not requested
+
+        self.request = request
+        ordering = self.get_ordering(view)
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*ordering)
+        values = self.decode_cursor(request, queryset, ordering)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+
+        rows = list(queryset[: page_size + 1])  # One extra row tells us whether there is a next page
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1], ordering) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
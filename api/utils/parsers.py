@@ -0,0 +1,31 @@
+import io
+import zlib
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+MAX_DECOMPRESSED_BYTES = getattr(settings, "KIOSK_SYNC_MAX_BYTES", 5 * 1024 * 1024)
+
+
+class CompressedJSONParser(JSONParser):
+    """
+    JSON parser that also accepts gzip bodies (`Content-Encoding: gzip`), for clients on slow or metered links.
+    - Decompression stops at MAX_DECOMPRESSED_BYTES so a small body cannot expand without bound.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        encoding = request.META.get("HTTP_CONTENT_ENCODING", "").strip().lower() if request is not None else ""
+        if encoding in ["", "identity"]:
+            return super().parse(stream, media_type, parser_context)
+        if encoding != "gzip":
+            raise ParseError(f"Unsupported Content-Encoding: {encoding}")
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # gzip header and trailer
+        try:
+            body = decompressor.decompress(stream.read() if stream is not None else b"", MAX_DECOMPRESSED_BYTES)
+        except zlib.error as e:
+            raise ParseError(f"Invalid gzip body: {e}")
+        if decompressor.unconsumed_tail:
+            raise ParseError(f"Decompressed body exceeds {MAX_DECOMPRESSED_BYTES} bytes")
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from api.utils.tokens import get_token_user
 
 class IsAdminOrTrainer(permissions.BasePermission):
     """
@@ -10,32 +11,34 @@ class IsAdminOrTrainer(permissions.BasePermission):
 
     def has_permission(self, request, view):
         """Check if the user is authenticated and has permission based on their role."""
-        if not request.user.is_authenticated:
+        user = get_token_user(request)  # Role comes from the token claims when available
+        if not user.is_authenticated:
             return False
 
         # Read access (GET, HEAD, OPTIONS) is allowed for Admins and Trainers
         if request.method in permissions.SAFE_METHODS:
-            return request.user.role in ["Admin", "Trainer"]
+            return user.role in ["Admin", "Trainer"]
 
         # Allow user creation (Admins create Trainers & Members, Trainers create Members)
         if request.method == "POST":
-            return request.user.role in ["Admin", "Trainer"]
+            return user.role in ["Admin", "Trainer"]
 
         # Only Admins can update or delete users, EXCEPT for the custom "approve" action
         if request.method in ["PUT", "PATCH", "DELETE"]:
             # Check if it's an "approve" action, which Trainers can do for Members
             if view.action == "approve":
-                return request.user.role in ["Admin", "Trainer"]
-            return request.user.role == "Admin"  # Other updates only allowed for Admins
+                return user.role in ["Admin", "Trainer"]
+            return user.role == "Admin"  # Other updates only allowed for Admins
 
         return False  # Deny access otherwise
 
     def has_object_permission(self, request, view, obj):
         """Admins can modify anyone, Trainers can only manage Members (view, add, approve)."""
-        if request.user.role == "Admin":
+        user = get_token_user(request)
+        if user.role == "Admin":
             return True  # Admins can manage Trainers and Members
 
-        if request.user.role == "Trainer" and obj.role == "Member":
+        if user.role == "Trainer" and obj.role == "Member":
             # Trainers can read (GET) and create (POST) Members
             if request.method in ["GET", "POST"]:
                 return True
@@ -56,7 +59,8 @@ class IsAdminForPlans(permissions.BasePermission):
 
     def has_permission(self, request, view):
         """Global permission checks before accessing any object."""
-        if not request.user.is_authenticated:
+        user = get_token_user(request)
+        if not user.is_authenticated:
             return False # Unauthenticted Users Cannot access
 
         # Allow everyone (Admins, Trainers, Members) to view plans (GET, HEAD, OPTIONS)
@@ -64,11 +68,21 @@ class IsAdminForPlans(permissions.BasePermission):
             return True
 
         # Allow only Admins to create, update, or delete plans
-        return request.user.role == "Admin"
+        return user.role == "Admin"
     
 class IsStaff(permissions.BasePermission):
     def has_permission(self, request, view):
-        if not request.user.is_authenticated:
+        user = get_token_user(request)
+        if not user.is_authenticated:
             return False  # Unauthenticted Users Cannot access
         
-        return request.user.role in ["Admin", "Trainer"]
+        return user.role in ["Admin", "Trainer"]
+
+
+class IsAdmin(permissions.BasePermission):
+    def has_permission(self, request, view):
+        user = get_token_user(request)
+        if not user.is_authenticated:
+            return False  # Unauthenticted Users Cannot access
+
+        return user.role == "Admin"
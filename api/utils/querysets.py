@@ -0,0 +1,37 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def select_for_serializer(queryset, serializer_class):
+    """
+    Load exactly what `serializer_class` renders, in one query.
+    - Nested (non-many) serializers become `select_related` joins, limited to the fields they render.
+    - Plain model fields are listed in `only()`; write-only fields (e.g. password) are deferred.
+    - Falls back to loading full rows if the serializer renders anything that is not a model field.
+    """
+    model = queryset.model
+    related, only = [], ["pk"]
+
+    for field in serializer_class().fields.values():
+        if field.write_only:
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            nested_fields = getattr(field, "fields", None)
+            if nested_fields is None or isinstance(field, serializers.ListSerializer):
+                return queryset  # Many-related serializers are not handled here
+            related.append(field.source)
+            only.append(field.source)
+            only.extend(f"{field.source}__{sub.source}" for sub in nested_fields.values() if not sub.write_only)
+            continue
+
+        if field.source in queryset.query.annotations:
+            continue  # Computed by the queryset itself
+
+        try:
+            model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return queryset.select_related(*related)  # Computed field, it may need anything on the row
+        only.append(field.source)
+
+    return queryset.select_related(*related).only(*only)
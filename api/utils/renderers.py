@@ -1,12 +1,74 @@
 from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from phonenumber_field.phonenumber import PhoneNumber
+from django.conf import settings
 from django.utils.timezone import now
+from decimal import Decimal
+import math
 import time
 
+try:
+    import orjson  # Optional C-accelerated encoder
+except ImportError:
+    orjson = None
+
+
+class GMSJSONEncoder(JSONEncoder):
+    """DRF's encoder plus types that show up in our payloads (e.g. PhoneNumber)."""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)  # Same as DRF, checked first because it is the most common fallback in list payloads
+        if isinstance(obj, PhoneNumber):
+            return str(obj)
+        return super().default(obj)
+
+
+_fallback_encoder = GMSJSONEncoder()
+
+
+def _orjson_default(obj):
+    """
+    GMSJSONEncoder.default for orjson, refusing the Decimals orjson would write differently from the json engine.
+    - orjson writes floats in exponent form as 1e16 (json: 1e+16) and NaN/Infinity as null (json: ValueError), so those
+      raise and `encode` hands the whole payload to the json engine.
+    """
+    if isinstance(obj, Decimal):
+        value = float(obj)
+        if not math.isfinite(value) or "e" in repr(value):
+            raise TypeError("Float not rendered identically by orjson")
+        return value
+    return _fallback_encoder.default(obj)
+
+if orjson is not None:
+    # Dates and times are encoded natively ("Z" for UTC like DRF), dataclasses go to GMSJSONEncoder like in the json engine
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
 class CustomJSONRenderer(JSONRenderer):
     """
     Custom renderer to ensure a consistent JSON response format.
+    - Encodes with orjson when installed and selected via settings.JSON_RENDERER_ENGINE, otherwise with DRF's json encoder.
+    - The engines give the same bytes for what the views send (strings, ints, Decimals, dates, PhoneNumbers): Decimals
+      orjson would write differently go to the json engine. Native floats are left to orjson, which writes 1e16 for
+      1e+16 and null for NaN/Infinity; views only send small finite ones (e.g. attendance averages).
     """
 
+    encoder_class = GMSJSONEncoder
+
+    def encode(self, data):
+        """Encode the response envelope with the configured engine."""
+        engine = getattr(settings, "JSON_RENDERER_ENGINE", "json")
+        if engine == "orjson" and orjson is not None and self.compact and not self.ensure_ascii:
+            try:
+                ret = orjson.dumps(data, default=_orjson_default, option=ORJSON_OPTIONS)
+            except orjson.JSONEncodeError:
+                pass  # Let the json engine encode it (or raise its usual error)
+            else:
+                # Same \u2028/\u2029 escaping as JSONRenderer
+                return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return super().render(data)
+
     def render(self, data, accepted_media_type=None, renderer_context=None):
         response = renderer_context.get("response", None)
         request = renderer_context.get("request", None)
@@ -22,26 +84,71 @@ class CustomJSONRenderer(JSONRenderer):
 
         # If response is an error (status_code >= 400)
         if response is not None and response.status_code >= 400:
-            return super().render(
+            return self.encode(
+                self.with_profile(
+                    {
+                        "status": "Fail",
+                        "statusCode": response.status_code,
+                        "timestamp": timestamp,
+                        "path": path,
+                        "message": data.get("message", "An error occurred"),
+                        "error": data.get("error", "Error"),
+                        "duration": duration,
+                    },
+                    request,
+                )
+            )
+
+        # Standard success response format
+        return self.encode(
+            self.with_profile(
                 {
-                    "status": "Fail",
-                    "statusCode": response.status_code,
-                    "timestamp": timestamp,
+                    "status": "Success",
+                    "data": data if data else {},
                     "path": path,
-                    "message": data.get("message", "An error occurred"),
-                    "error": data.get("error", "Error"),
+                    "method": method,
+                    "timestamp": timestamp,
                     "duration": duration,
-                }
+                },
+                request,
             )
+        )
 
-        # Standard success response format
-        return super().render(
-            {
-                "status": "Success",
-                "data": data if data else {},
-                "path": path,
-                "method": method,
-                "timestamp": timestamp,
-                "duration": duration,
-            }
+    def with_profile(self, envelope, request):
+        """Add the request profile (queries, SQL and serializer time) when REQUEST_PROFILING["ENVELOPE"] is on."""
+        profile = getattr(request, "profile", None) if request else None
+        if profile is not None and getattr(settings, "REQUEST_PROFILING", {}).get("ENVELOPE", False):
+            envelope["profile"] = profile.as_dict()
+        return envelope
+
+    def render_stream(self, rows, request=None, chunk_size=500):
+        """
+        Yield the success envelope incrementally for StreamingHttpResponse.
+        - Rows are encoded one at a time and flushed every `chunk_size` rows, so memory stays flat.
+        - Produces the same envelope as `render` (an empty result is still `"data":{}`).
+        """
+        yield b'{"status":"Success","data":'
+
+        opened = False  # Whether "[" has been sent
+        buffer = []
+        for row in rows:
+            buffer.append(self.encode(row))
+            if len(buffer) >= chunk_size:
+                yield (b"," if opened else b"[") + b",".join(buffer)
+                opened = True
+                buffer = []
+
+        if buffer:
+            yield (b"," if opened else b"[") + b",".join(buffer)
+            opened = True
+        yield b"]" if opened else b"{}"
+
+        path = request.path if request else "N/A"
+        method = request.method if request else "N/A"
+        duration = (
+            f"{int((time.time() - request.start_time) * 1000)}ms"
+            if hasattr(request, "start_time")
+            else "N/A"
         )
+        tail = self.encode({"path": path, "method": method, "timestamp": now().isoformat(), "duration": duration})
+        yield b"," + tail[1:]  # Drop the opening brace, the closing one ends the envelope
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.utils import timezone
+from api.utils import helpers
+from api.utils.coverage_cache import extend_coverage, invalidate_coverage
+from subscriptions.models import Subscription
+from users.models import CustomUser
+
+
+def renew_subscriptions(renewals, today=None):
+    """
+    Create one Subscription per (member_id, plan, payment_reference), stacked on the member's current coverage.
+    - The members are locked with a single query; their `current_end_date` is the only history read.
+    - A renewal starts the day after the current end_date, or today when the member is not covered.
+    - Several renewals for one member in the same call are stacked in order.
+    - Returns the created subscriptions, in order.
+    """
+    today = today or timezone.localdate()
+
+    with transaction.atomic():
+        end_dates = dict(
+            CustomUser.objects.select_for_update()
+            .filter(id__in={member_id for member_id, _, _ in renewals})
+            .values_list("id", "current_end_date")
+        )
+
+        subscriptions = []
+        for member_id, plan, payment_reference in renewals:
+            current_end_date = end_dates.get(member_id)
+            start_date = current_end_date + timedelta(days=1) if current_end_date and current_end_date >= today else today
+            end_dates[member_id] = start_date + timedelta(days=plan.duration_days)
+            subscriptions.append(
+                Subscription(
+                    subscription_id=helpers.generateSubscriptionID(payment_reference, member_id),
+                    plan=plan,
+                    amount_paid=plan.price,
+                    payment_reference=payment_reference,
+                    start_date=start_date,
+                    end_date=end_dates[member_id],
+                    member_id=member_id,
+                )
+            )
+        Subscription.objects.bulk_create(subscriptions)
+
+        members_by_end_date = defaultdict(list)
+        for member_id in {subscription.member_id for subscription in subscriptions}:
+            members_by_end_date[end_dates[member_id]].append(member_id)
+        for end_date, member_ids in members_by_end_date.items():
+            CustomUser.objects.filter(id__in=member_ids).update(current_end_date=end_date, updated_at=timezone.now())  # No save(), it would revoke auth claims
+
+        transaction.on_commit(lambda: [extend_coverage(member_id, end_date) for end_date, ids in members_by_end_date.items() for member_id in ids])
+
+    return subscriptions
+
+
+def renew_subscription(member_id, plan, payment_reference, today=None):
+    """Single-member `renew_subscriptions`."""
+    return renew_subscriptions([(member_id, plan, payment_reference)], today=today)[0]
+
+
+def extend_member_coverage(member_id, end_date):
+    """Raise `current_end_date` to `end_date` for subscriptions created outside renew_subscriptions (e.g. the admin)."""
+    CustomUser.objects.filter(Q(current_end_date__lt=end_date) | Q(current_end_date__isnull=True), id=member_id).update(
+        current_end_date=end_date, updated_at=timezone.now()
+    )
+    extend_coverage(member_id, end_date)
+
+
+def active_end_date_subquery():
+    return Subquery(
+        Subscription.objects.filter(member_id=OuterRef("pk"), status="Active", is_deleted=False)
+        .order_by()
+        .values("member_id")
+        .annotate(latest=Max("end_date"))
+        .values("latest")
+    )
+
+
+def refresh_member_coverage(member_id=None):
+    """
+    Recompute `current_end_date` from the subscriptions in one UPDATE, for one member (after a cancel/delete) or for everyone.
+    """
+    members = CustomUser.objects.all() if member_id is None else CustomUser.objects.filter(id=member_id)
+    updated = members.update(current_end_date=active_end_date_subquery(), updated_at=timezone.now())
+    if member_id is not None:
+        invalidate_coverage(member_id)
+    return updated
@@ -0,0 +1,44 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+
+class QueryCountAssertionsMixin:
+    """
+    Test mixin for catching N+1 queries on list endpoints.
+    - `assertQueryCountConstant` requests the endpoint at several result sizes and fails if the query count changes.
+    """
+
+    def login_staff(self, role="Admin", **extra_fields):
+        """Create an active staff user and return an APIClient carrying their auth cookies."""
+        user = CustomUser.objects.create_user(
+            username=f"{role.lower()}_tester", email=f"{role.lower()}_tester@example.com", password="tester-password",
+            role=role, is_active=True, **extra_fields,
+        )
+        client = APIClient()
+        response = client.post("/api/auth/login/", {"username_or_email": user.username, "password": "tester-password"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return user, client
+
+    def assertQueryCountConstant(self, client, url, create_rows, sizes=(1, 5, 20)):
+        """
+        Call `create_rows(n)` to grow the data set to each size in `sizes` and check `url` always runs the same number of queries.
+        - `create_rows` receives how many rows to add, not the running total.
+        """
+        client.get(url)  # Warm up per-process caches (e.g. the authenticated user) so they don't count as growth
+        counts, created = [], 0
+        for size in sizes:
+            create_rows(size - created)
+            created = size
+
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            counts.append(len(queries))
+
+        if len(set(counts)) != 1:
+            self.fail(
+                f"Query count for {url} grows with the result size: "
+                + ", ".join(f"{size} rows -> {count} queries" for size, count in zip(sizes, counts))
+            )
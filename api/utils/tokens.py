@@ -0,0 +1,40 @@
+import time
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from api.utils.user_cache import remember_claims_marker
+
+
+class RoleRefreshToken(RefreshToken):
+    """
+    Refresh token carrying signed role and active-state claims.
+    - Claims are copied to every access token derived from it (including refreshes).
+    - `auth_time` records when the claims were taken so they can be revoked (see CustomUser.claims_valid_after).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token["role"] = user.role
+        token["is_active"] = user.is_active
+        token["auth_time"] = time.time()
+        remember_claims_marker(user)  # Lets the first request with this token skip the database
+        return token
+
+
+class RoleTokenUser(TokenUser):
+    """Stateless user built from token claims. Enough for role checks, never touches the database."""
+
+    @cached_property
+    def role(self):
+        return self.token.get("role")
+
+    @cached_property
+    def is_active(self):
+        return self.token.get("is_active", False)
+
+
+def get_token_user(request):
+    """Return the claims-backed user set by CookieJWTAuthentication, otherwise the regular user."""
+    request.user  # Make sure authentication has run
+    return getattr(request, "token_user", None) or request.user
@@ -0,0 +1,71 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+
+
+def _version_key(user_id):
+    return f"auth:user-version:{user_id}"
+
+
+def _user_key(user_id, version):
+    return f"auth:user:{user_id}:v{version}"
+
+
+def get_cached_user(user_id):
+    """
+    Return a (version, user) pair for the given user id.
+    - `user` is None on a cache miss.
+    - The version must be passed back to `cache_user` so a snapshot loaded before
+      an invalidation can never be stored under the new version.
+    - A missing (evicted) version key is replaced by a fresh one, so older snapshots are never served again.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+        if version is None:  # Evicted again at once, behave as a miss
+            return time.time_ns(), None
+    return version, cache.get(_user_key(user_id, version))
+
+
+def cache_user(user, version):
+    """Store a snapshot of the user under the version read before it was loaded."""
+    cache.set(_user_key(user.pk, version), user, USER_CACHE_TIMEOUT)
+
+
+def invalidate_cached_user(user_id):
+    """Move the user to a new version so any cached snapshot is ignored from now on."""
+    cache.set(_version_key(user_id), time.time_ns(), None)  # Version keys never expire
+
+
+def _claims_key(user_id):
+    return f"auth:claims-valid-after:{user_id}"
+
+
+def remember_claims_marker(user, overwrite=False):
+    """
+    Cache the user's `claims_valid_after` (the durable revocation marker) for `claims_revoked`.
+    - Without `overwrite` a marker already cached is kept, it is never older than the one read with the user.
+    """
+    valid_after = user.claims_valid_after.timestamp() if user.claims_valid_after else 0.0
+    if overwrite:
+        cache.set(_claims_key(user.pk), valid_after, None)
+    else:
+        cache.add(_claims_key(user.pk), valid_after, None)
+
+
+def forget_claims_marker(user_id):
+    cache.delete(_claims_key(user_id))
+
+
+def claims_revoked(user_id, auth_time):
+    """
+    Check whether claims taken at `auth_time` were revoked afterwards.
+    - Fails closed: with no cached marker (evicted, or not loaded yet) the claims count as revoked, the caller
+      loads the user from the database and `remember_claims_marker` restores the marker.
+    """
+    valid_after = cache.get(_claims_key(user_id))
+    return valid_after is None or auth_time <= valid_after
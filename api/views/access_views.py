@@ -0,0 +1,26 @@
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.utils.coverage_cache import get_coverage
+from api.utils.permissions import IsStaff
+
+
+class AccessCheckView(APIView):
+    """
+    Door check: is the member covered by an active subscription today?
+    - Answered from the coverage cache (see api/utils/coverage_cache.py), no database access on a cache hit.
+    """
+    permission_classes = [IsStaff]
+
+    def get(self, request, member_id):
+        covered_until = get_coverage(member_id)
+
+        return Response(
+            {
+                "member": member_id,
+                "covered": covered_until is not None and covered_until >= timezone.localdate(),
+                "covered_until": covered_until,
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,116 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, PermissionDenied, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from api.serializers.payments_serializers import PaymentsRequestPayLoadSerializer
+from api.utils import helpers
+from api.utils.authentication import CookieJWTAuthentication
+from api.utils.exception_handler import custom_exception_handler
+from api.utils.mpesa_async_client import get_async_mpesa_client
+from api.utils.permissions import IsStaff
+from api.utils.renderers import CustomJSONRenderer
+from api.utils.mpesa_callbacks import enqueue_stk_callback
+from api.views.payments_views import record_accepted_stk_push
+
+
+# ---------------------------------------------------------------------------------------------------------------------------------------------------------------
+# Native async counterparts of the M-Pesa views, for deployments served over ASGI (see README).
+# DRF views are sync only, so these are plain Django async views that reuse DRF's authentication, permissions,
+# serializers, renderer envelope and exception handler. Only the ORM work runs in a thread; the Daraja round trip
+# is awaited, so a worker is not tied up while Safaricom responds.
+# ---------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+def render(request, data, status_code):
+    """Wrap `data` in the same envelope CustomJSONRenderer gives the DRF views."""
+    response = HttpResponse(status=status_code, content_type="application/json")
+    response.content = CustomJSONRenderer().render(data, renderer_context={"request": request, "response": response})
+    return response
+
+
+def render_exception(request, exc):
+    response = custom_exception_handler(exc, {"request": request})
+    return render(request, response.data, response.status_code)
+
+
+def staff_request(request):
+    """Authenticate the request with the cookie JWT and require a staff role, returning the DRF Request."""
+    drf_request = Request(request, authenticators=[CookieJWTAuthentication()], parsers=[JSONParser()])
+    if not IsStaff().has_permission(drf_request, None):
+        if drf_request.user.is_authenticated:
+            raise PermissionDenied()
+        raise NotAuthenticated()
+    return drf_request
+
+
+def validate_push_request(request):
+    drf_request = staff_request(request)
+    serializer = PaymentsRequestPayLoadSerializer(data=drf_request.data)
+    serializer.is_valid(raise_exception=True)
+
+    if serializer.validated_data["payment_method"] != "M-Pesa":
+        raise ValidationError({"payment_method": "Only M-Pesa payments are handled here, record cash on /api/payments/initiate-payment/"})
+
+    plan = serializer.validated_data["plan"]
+    return {
+        "member": serializer.validated_data["member"],
+        "plan": plan,
+        "amount": int(plan.price),
+        "phone_number": serializer.validated_data["phone_number"],
+        "account_reference": helpers.generate_reference(payment_method="M-Pesa"),
+        "transaction_desc": serializer.validated_data["description"] or "Payment for services",
+        "recorded_by": drf_request.user,
+    }
+
+
+@csrf_exempt
+@require_POST
+async def async_stk_push(request):
+    """Async version of MpesaSTKPushView for M-Pesa payments. Same payload and responses."""
+    try:
+        push = await sync_to_async(validate_push_request)(request)
+    except APIException as exc:
+        return render_exception(request, exc)
+
+    response = await get_async_mpesa_client().stk_push(
+        push["phone_number"], push["amount"], push["account_reference"], push["transaction_desc"]
+    )
+
+    if "error" in response:
+        return render(request, response, status.HTTP_400_BAD_REQUEST)
+
+    await sync_to_async(record_accepted_stk_push)(response, **push)
+
+    return render(request, response, status.HTTP_200_OK)
+
+
+@require_GET
+async def async_stk_query(request, checkout_request_id):
+    """Ask Safaricom for the current state of an STK push, e.g. when its callback never arrived."""
+    try:
+        await sync_to_async(staff_request)(request)
+    except APIException as exc:
+        return render_exception(request, exc)
+
+    response = await get_async_mpesa_client().stk_query(checkout_request_id)
+
+    if "error" in response:
+        return render(request, response, status.HTTP_400_BAD_REQUEST)
+
+    return render(request, response, status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def async_mpesa_callback(request):
+    """Async version of mpesa_callback."""
+    try:
+        data = JSONParser().parse(request)
+    except APIException as exc:
+        return render_exception(request, exc)
+
+    body, status_code = await sync_to_async(enqueue_stk_callback)(data)
+    return render(request, body, status_code)
@@ -1,10 +1,18 @@
 from rest_framework import views, status, generics, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from attendance.models import Attendance
+from rest_framework.permissions import IsAuthenticated
+from attendance.models import Attendance, DailyAttendanceSummary, MemberMonthlyAttendance
 from api.utils.permissions import IsStaff
-from api.serializers.attendance_serializers import AttendanceSerializer
-from django.utils.timezone import now
+from api.utils.tokens import get_token_user
+from api.utils.mixins import StreamingListMixin
+from api.serializers.attendance_serializers import AttendanceSerializer, AttendanceSessionSerializer, AttendanceSummaryQuerySerializer, BulkAttendanceSerializer, KioskSyncSerializer
+from django.utils.timezone import localdate, localtime, now
+from django.db import transaction
+from api.utils.attendance_rollups import insert_attendance
+from api.utils.occupancy_cache import get_occupancy, refresh_occupancy
+from api.utils.kiosk_sync import ROSTER_FIELDS, record_check_ins, roster_delta
+from api.utils.parsers import CompressedJSONParser
 
 class MarkAttendanceView(APIView):
     permission_classes = [IsStaff]
@@ -20,13 +28,8 @@ class MarkAttendanceView(APIView):
         if not date:
             date = now().date()
 
-        attendance, created = Attendance.objects.get_or_create(
-            member=member,
-            date=date,
-            defaults={"marked_by": requesting_user}  #Avoids duplicate marking
-        )
-
-        if not created:
+        attendance = Attendance(member=member, date=date, marked_by=requesting_user)
+        if not insert_attendance([attendance]):  #Avoids duplicate marking, and keeps the report rollups in step
             return Response(
                 {"error": "Attendance already marked for this date."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -40,12 +43,201 @@ class MarkAttendanceView(APIView):
             status=status.HTTP_201_CREATED
         )
 
+class BulkMarkAttendanceView(APIView):
+    """
+    Check in a whole class at once: {"members": [id, ...], "date": "YYYY-MM-DD"}.
+    - One IN query validates every member, one INSERT adds the rows; members marked concurrently are reported as already marked.
+    - Returns a status per member, in order: "Marked", "Already marked", "Not found" or "Duplicate".
+    """
+    permission_classes = [IsStaff]
+
+    def post(self, request):
+        serializer = BulkAttendanceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        date, entries = serializer.resolve_members()
+
+        pending = [entry for entry in entries if entry["status"] == "Pending"]
+        inserted = insert_attendance(
+            Attendance(member_id=entry["member"], date=date, marked_by_id=get_token_user(request).id) for entry in pending
+        )
+        marked = {row.member_id for row in inserted}
+        for entry in pending:
+            entry["status"] = "Marked" if entry["member"] in marked else "Already marked"
+
+        return Response(
+            {"date": date, "marked": len(inserted), "results": entries},
+            status=status.HTTP_201_CREATED if inserted else status.HTTP_200_OK,
+        )
+
+class CheckInView(APIView):
+    """
+    Check a member into the gym now, stamping check_in_time on today's attendance (created if needed).
+    - A member who checked out earlier today is checked back in on the same row; their first check_in_time is kept.
+    - Updates the live occupancy set once committed.
+    """
+    permission_classes = [IsStaff]
+
+    def post(self, request):
+        serializer = AttendanceSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        member = serializer.validated_data["member"]
+        today, now_time = localdate(), localtime().time()
+
+        with transaction.atomic():
+            attendance = Attendance(member=member, date=today, marked_by_id=get_token_user(request).id, check_in_time=now_time)
+            created = bool(insert_attendance([attendance]))
+            if not created:
+                attendance = Attendance.objects.select_for_update().get(member=member, date=today)
+            if not created and attendance.check_in_time and attendance.checkout_time is None:
+                return Response({"error": f"{member} is already checked in."}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not created:
+                attendance.present = True  # An absent row now counts in the rollups, see attendance/signals.py
+                attendance.check_in_time = attendance.check_in_time or now_time
+                attendance.checkout_time = None
+                attendance.save(update_fields=["present", "check_in_time", "checkout_time"])
+            transaction.on_commit(lambda: refresh_occupancy(today))
+
+        return Response(
+            {"message": f"{member} checked in", "attendance_details": AttendanceSerializer(attendance).data},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class CheckOutView(APIView):
+    """Check a member out now: stamps checkout_time on today's open session and updates the live occupancy set."""
+    permission_classes = [IsStaff]
+
+    def post(self, request):
+        serializer = AttendanceSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        member = serializer.validated_data["member"]
+        today = localdate()
+
+        with transaction.atomic():
+            checked_out = Attendance.objects.filter(
+                member=member, date=today, check_in_time__isnull=False, checkout_time__isnull=True
+            ).update(checkout_time=localtime().time())
+            if checked_out:
+                transaction.on_commit(lambda: refresh_occupancy(today))
+
+        if not checked_out:
+            return Response({"error": f"{member} is not checked in."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": f"{member} checked out"}, status=status.HTTP_200_OK)
+
+
+class OccupancyView(APIView):
+    """Members in the gym right now (checked in today, not checked out), served from the occupancy cache."""
+    permission_classes = [IsStaff]
+
+    def get(self, request):
+        members = get_occupancy()
+        return Response({"date": localdate(), "count": len(members), "members": sorted(members)}, status=status.HTTP_200_OK)
+
+class KioskSyncView(APIView):
+    """
+    Offline kiosk sync: upload queued check-ins, download what changed in the member roster.
+    - Body may be gzip compressed (Content-Encoding: gzip), see CompressedJSONParser.
+    - Events are applied idempotently by key; invalid ones are reported under "errors" by key.
+    - Returns roster rows (ROSTER_FIELDS order) changed since the token, the ids to remove, and the token to send next time.
+      With "has_more" the kiosk should sync again straight away to fetch the next page.
+    """
+    permission_classes = [IsStaff]
+    parser_classes = [CompressedJSONParser]
+
+    def post(self, request):
+        serializer = KioskSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        events, errors = serializer.resolve_events()
+
+        results = record_check_ins(events, marked_by_id=get_token_user(request).id)
+        rows, removed, since, has_more = roster_delta(serializer.validated_data.get("since"))
+
+        return Response(
+            {
+                "results": results,
+                "errors": errors,
+                "roster": {"fields": ROSTER_FIELDS, "rows": rows, "removed": removed},
+                "since": since,
+                "has_more": has_more,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 # Fetch Attendance from db
-class FetchAttendance(generics.ListAPIView): 
+class FetchAttendance(StreamingListMixin, generics.ListAPIView): 
     queryset = Attendance.objects.all()
     permission_classes = [IsStaff]
     serializer_class = AttendanceSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ["date"]
+    keyset_ordering = ["-date", "-id"]
+
+class AttendanceSummaryView(APIView):
+    """
+    Gym-wide attendance between ?start_date and ?end_date (default: the last 30 days).
+    - Read from the daily rollup, one row per day, so a year-long report is a single small query.
+    """
+    permission_classes = [IsStaff]
+
+    def get(self, request):
+        query = AttendanceSummaryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start_date, end_date = query.validated_data["start_date"], query.validated_data["end_date"]
 
-class FetchAttendancForMember(APIView): ...
\ No newline at end of file
+        days = list(
+            DailyAttendanceSummary.objects.filter(date__gte=start_date, date__lte=end_date, present_count__gt=0)
+            .order_by("date")
+            .values("date", "present_count")
+        )
+        total = sum(day["present_count"] for day in days)
+        busiest = max(days, key=lambda day: day["present_count"], default=None)
+
+        return Response(
+            {
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_check_ins": total,
+                "average_per_day": round(total / ((end_date - start_date).days + 1), 2),
+                "busiest_day": {"date": busiest["date"], "present": busiest["present_count"]} if busiest else None,
+                "days": [{"date": day["date"], "present": day["present_count"]} for day in days],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class AttendanceHistoryView(APIView):
+    """
+    A member's attendance history: days present per month plus their last visit.
+    - ?member_id=<id> for staff; members always get their own history.
+    - Read from the member/month rollup and the (member, date) unique index.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = get_token_user(request)
+        try:
+            member_id = int(request.query_params.get("member_id", user.id))  # Token claims carry the id as a string
+        except (TypeError, ValueError):
+            return Response({"error": "member_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if member_id != int(user.id) and user.role not in ["Admin", "Trainer"]:
+            return Response({"error": "You can only view your own attendance."}, status=status.HTTP_403_FORBIDDEN)
+
+        months = list(
+            MemberMonthlyAttendance.objects.filter(member_id=member_id, days_present__gt=0)
+            .order_by("-month")
+            .values_list("month", "days_present")
+        )
+        last_attended = (
+            Attendance.objects.filter(member_id=member_id, present=True).order_by("-date").values_list("date", flat=True).first()
+        )
+
+        return Response(
+            {
+                "member": member_id,
+                "total_days": sum(days for _, days in months),
+                "last_attended": last_attended,
+                "months": [{"month": month.strftime("%Y-%m"), "days_present": days} for month, days in months],
+            },
+            status=status.HTTP_200_OK,
+        )
\ No newline at end of file
@@ -0,0 +1,60 @@
+from decimal import Decimal
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.serializers.attendance_serializers import AttendanceSummaryQuerySerializer
+from api.utils.permissions import IsAdmin
+from payments.models import DailyStats
+
+
+class DashboardView(APIView):
+    """
+    Admin dashboard between ?start_date and ?end_date (default: the last 30 days): revenue per day, method and plan,
+    active members, new registrations and check-ins.
+    - One read of the materialized DailyStats rows (refreshed by manage.py refresh_dashboard_stats), totals are summed here.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        query = AttendanceSummaryQuerySerializer(data=request.query_params)  # Same date range rules as the attendance summary
+        query.is_valid(raise_exception=True)
+        start_date, end_date = query.validated_data["start_date"], query.validated_data["end_date"]
+
+        days = list(DailyStats.objects.filter(date__gte=start_date, date__lte=end_date).order_by("date"))
+        totals = {"revenue": Decimal("0"), "payments": 0, "new_members": 0, "check_ins": 0, "revenue_by_method": {}, "revenue_by_plan": {}}
+        rows = []
+        for day in days:
+            by_method = {method: Decimal(amount) for method, amount in day.revenue_by_method.items()}
+            by_plan = {plan: Decimal(amount) for plan, amount in day.revenue_by_plan.items()}
+            totals["revenue"] += day.revenue
+            totals["payments"] += day.payments
+            totals["new_members"] += day.new_members
+            totals["check_ins"] += day.check_ins
+            for method, amount in by_method.items():
+                totals["revenue_by_method"][method] = totals["revenue_by_method"].get(method, Decimal("0")) + amount
+            for plan, amount in by_plan.items():
+                totals["revenue_by_plan"][plan] = totals["revenue_by_plan"].get(plan, Decimal("0")) + amount
+            rows.append(
+                {
+                    "date": day.date,
+                    "revenue": day.revenue,
+                    "payments": day.payments,
+                    "revenue_by_method": by_method,
+                    "revenue_by_plan": by_plan,
+                    "new_members": day.new_members,
+                    "active_members": day.active_members,
+                    "check_ins": day.check_ins,
+                }
+            )
+
+        return Response(
+            {
+                "start_date": start_date,
+                "end_date": end_date,
+                "totals": totals,
+                "active_members": days[-1].active_members if days else 0,  # As of the latest materialized day
+                "refreshed_at": max((day.refreshed_at for day in days), default=None),
+                "days": rows,
+            },
+            status=status.HTTP_200_OK,
+        )
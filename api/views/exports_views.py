@@ -0,0 +1,31 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.serializers.exports_serializers import ExportQuerySerializer
+from api.utils.exports import EXPORTS, stream_csv, xlsx_response
+from api.utils.permissions import IsAdmin
+
+
+class ExportView(APIView):
+    """
+    Download payments, subscriptions or attendance as CSV or XLSX: /api/exports/<dataset>/<csv|xlsx>/?start_date&end_date.
+    - CSV is streamed, the first bytes go out before the data set is read; XLSX is written to a temporary file first.
+    - Rows come from keyset-paged `values_list` queries (see api/utils/exports.py), memory does not grow with the export.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request, dataset, file_format):
+        export = EXPORTS.get(dataset)
+        if export is None or file_format not in ["csv", "xlsx"]:
+            return Response({"error": f"Unknown export: {dataset}/{file_format}"}, status=status.HTTP_404_NOT_FOUND)
+
+        query = ExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        queryset = export.filter(query.validated_data.get("start_date"), query.validated_data.get("end_date"))
+
+        if file_format == "csv":
+            return stream_csv(export, queryset)
+        try:
+            return xlsx_response(export, queryset)
+        except RuntimeError as e:
+            return Response({"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
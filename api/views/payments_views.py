@@ -1,26 +1,81 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from api.utils.mpesa_client import MpesaClient
+from api.utils.mpesa_client import get_mpesa_client
+from api.utils.mpesa_dispatcher import dispatch_batch_push, dispatch_stk_push
+from api.utils.mpesa_callbacks import enqueue_stk_callback
+from api.utils.renewals import renew_subscription
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from api.utils.permissions import IsStaff
+from api.utils.mixins import StreamingListMixin
 from payments.models import MpesaTransaction, Payment
 from rest_framework import generics, status
-from api.serializers.payments_serializers import MpesaTransactionSerializer, PaymentsRequestPayLoadSerializer, PaymentSerializer
+from api.serializers.payments_serializers import MpesaTransactionSerializer, PaymentsRequestPayLoadSerializer, PaymentSerializer, BatchPaymentsRequestSerializer
 from rest_framework import filters
 from api.utils import helpers
 from django.views.decorators.csrf import csrf_exempt
 from users.models import CustomUser as Member
 from decimal import Decimal
-from subscriptions.models import Subscription
-from datetime import timedelta
-from django.utils import timezone
+from django.db import transaction as db_transaction
+from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.urls import reverse
+
+
+def record_accepted_stk_push(response, member, plan, amount, phone_number, account_reference, transaction_desc, recorded_by):
+    """Save the transaction and pending payment for an STK push Safaricom accepted (shared by the sync and async views)."""
+    if response.get("ResponseCode") != "0":
+        return
+
+    payment = Payment.objects.create(
+        member=member,
+        amount=Decimal(amount),
+        payment_method="M-Pesa",
+        reference=account_reference,
+        plan=plan,
+        recorded_by=recorded_by,
+    )
+
+    MpesaTransaction.objects.create(
+        payment=payment,
+        merchant_request_id=response.get("MerchantRequestID"),
+        checkout_request_id=response.get("CheckoutRequestID"),
+        reference=account_reference,
+        phone_number=phone_number,
+        amount=amount,
+        description=transaction_desc,
+    )
+
+
+def record_cash_payment(member, plan, amount, account_reference, requesting_user):
+    """Record a completed cash payment and renew the member's subscription."""
+    payment = Payment.objects.create(
+        member=member,
+        amount=Decimal(amount),
+        payment_method="Cash",
+        reference=account_reference,
+        plan=plan,
+        recorded_by=requesting_user,
+        status = "Completed",
+        confirmed_by=requesting_user,
+    )
+    
+    renew_subscription(member.id, plan, account_reference)  # Starts after the member's current coverage, if any
+
+    return payment
 
 
 class MpesaSTKPushView(APIView):
     permission_classes = [IsStaff]
 
+    def use_async_push(self, request):
+        """Async mode comes from settings.MPESA_ASYNC_PUSH, a request can override it with ?async=true|false."""
+        flag = request.query_params.get("async")
+        if flag is None:
+            return getattr(settings, "MPESA_ASYNC_PUSH", False)
+        return flag.lower() in ["1", "true", "yes"]
+
     def post(self, request):
 
         serializer = PaymentsRequestPayLoadSerializer(data = request.data)
@@ -51,7 +106,12 @@ class MpesaSTKPushView(APIView):
         match payment_method:
             case "M-Pesa":
                 print("Processing Mpesa Payments")
-                mpesa = MpesaClient()
+                if self.use_async_push(request):
+                    return self.queue_stk_push(
+                        request, member, plan, amount, phone_number, account_reference, transaction_desc
+                    )
+
+                mpesa = get_mpesa_client()
                 response = mpesa.stk_push(
                     phone_number, amount, account_reference, transaction_desc
                 )
@@ -59,60 +119,17 @@ class MpesaSTKPushView(APIView):
                 if "error" in response:
                     return Response(response, status=400)
 
-                response_code = response.get("ResponseCode")
-                checkout_request_id = response.get("CheckoutRequestID")
-                merchant_request_id = response.get("MerchantRequestID")
-                if response_code == "0":
-                    MpesaTransaction.objects.create(
-                        merchant_request_id=merchant_request_id,
-                        checkout_request_id=checkout_request_id,
-                        reference=account_reference,
-                        phone_number=phone_number,
-                        amount=amount,
-                        description=transaction_desc,
-                    )
-
-                    Payment.objects.create(
-                        member=member,
-                        amount=Decimal(amount),
-                        payment_method=payment_method,
-                        reference=account_reference,
-                        plan=plan,
-                        recorded_by=requesting_user,
-                    )
+                record_accepted_stk_push(
+                    response, member, plan, amount, phone_number, account_reference, transaction_desc, requesting_user
+                )
 
                 return Response(response, status=200)
 
             case "Cash": 
                 print("Processing Cash Payments")
 
-                # Record Payment
-                payment = Payment.objects.create(
-                    member=member,
-                    amount=Decimal(amount),
-                    payment_method=payment_method,
-                    reference=account_reference,
-                    plan=plan,
-                    recorded_by=requesting_user,
-                    status = "Completed",
-                    confirmed_by=requesting_user,
-                )
-                
-                # Create Subscription for this payment
-                susbscription_start_date = timezone.now().date()
-                subscription_end_date = susbscription_start_date + timedelta(days=duration)
-                subscription_id = helpers.generateSubscriptionID(account_reference, member.id)
-
-                print(f"start_date: {susbscription_start_date} end_date: {subscription_end_date}")
-                Subscription.objects.create(
-                    subscription_id = subscription_id,
-                    plan = plan,
-                    amount_paid = plan.price,
-                    payment_reference = account_reference,
-                    start_date = susbscription_start_date,
-                    end_date = subscription_end_date,
-                    member = member
-                )
+                # Record Payment and create the Subscription for it
+                payment = record_cash_payment(member, plan, amount, account_reference, requesting_user)
 
                 payment_data = PaymentSerializer(payment).data
 
@@ -127,95 +144,139 @@ class MpesaSTKPushView(APIView):
                 print("Unknown Payments method")
                 return Response({"error": "Invalid Payment Method", "message": "Payment Method not recognized"}, status=status.HTTP_400_BAD_REQUEST)
 
-
-@csrf_exempt
-@api_view(["POST"])
-@permission_classes([AllowAny])
-def mpesa_callback(request):
-    data = request.data
-    print("M-Pesa Callback Received:", data)  # Debugging
-
-    try:
-        callback_data = data.get("Body", {}).get("stkCallback", {})
-        checkout_request_id = callback_data.get("CheckoutRequestID")
-        result_code = callback_data.get("ResultCode")
-        result_desc = callback_data.get("ResultDesc")
-
-        # Get transaction from db
-        transaction = transaction = MpesaTransaction.objects.get(checkout_request_id=checkout_request_id)
-        reference = transaction.reference
-
-        # Get payment from db
-        payment = Payment.objects.get(reference = reference)
-        duration = payment.plan.duration_days
-        plan = payment.plan
-        payment_reference = payment.reference
-        member = payment.member
-
-        transaction.result_code = result_code
-        transaction.result_desc = result_desc
-
-        if result_code == 0:
-            print("Processing successful payment")
-
-            transaction.status = "Completed"
-            payment.status = "Completed"
-
-            metadata = callback_data.get("CallbackMetadata", {}).get("Item", [])
-            for item in metadata:
-                if item["Name"] == "Amount":
-                    transaction.amount = item["Value"]
-                elif item["Name"] == "MpesaReceiptNumber":
-                    transaction.mpesa_receipt_number = item["Value"]
-                elif item["Name"] == "TransactionDate":
-                    transaction.transaction_date = item["Value"]
-                elif item["Name"] == "PhoneNumber":
-                    transaction.phone_number = str(item["Value"])
-
-            transaction.save() # Save mpesa transaction
-            payment.save() # Save payment record
-
-            # Create Subscription for this payment
-            susbscription_start_date = timezone.now().date()
-            subscription_end_date = susbscription_start_date + timedelta(days=duration)
-            subscription_id = helpers.generateSubscriptionID(payment_reference, member.id)
-            print(f"start_date: {susbscription_start_date} end_date: {subscription_end_date}")
-
-            Subscription.objects.create(
-                subscription_id =subscription_id,
-                plan=plan,
-                amount_paid=plan.price,
-                payment_reference=payment_reference,
-                start_date=susbscription_start_date,
-                end_date=subscription_end_date,
+    def queue_stk_push(self, request, member, plan, amount, phone_number, account_reference, transaction_desc):
+        """
+        Record the payment and a "Queued" transaction, then push in the background.
+        - Returns 202 at once; poll the status endpoint for the outcome.
+        """
+        with db_transaction.atomic():
+            payment = Payment.objects.create(
                 member=member,
+                amount=Decimal(amount),
+                payment_method="M-Pesa",
+                reference=account_reference,
+                plan=plan,
+                recorded_by=request.user,
             )
+            mpesa_transaction = MpesaTransaction.objects.create(
+                payment=payment,
+                reference=account_reference,
+                phone_number=phone_number,
+                amount=amount,
+                description=transaction_desc,
+                status="Queued",
+            )
+            # Only push once the rows are committed and visible to the worker
+            db_transaction.on_commit(lambda: dispatch_stk_push(mpesa_transaction.id))
+
+        return Response(
+            {
+                "message": "STK push queued",
+                "reference": account_reference,
+                "status": mpesa_transaction.status,
+                "status_url": reverse("payment_status", kwargs={"reference": account_reference}),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class BatchMpesaSTKPushView(APIView):
+    """
+    STK pushes for many members at once (e.g. month-end renewals).
+    - Payload: {"items": [{"member", "plan", "phone_number", "description"}, ...]}, phone defaults to the member's.
+    - Validated with a handful of queries, rows are bulk inserted and pushed on the bounded, rate limited batch pool.
+    - Always queued: a batch of 500 at the rate limit takes minutes, so it returns 202 at once with a result and,
+      for valid items, a status_url per item, in order.
+    - The batch pool holds at most MPESA_BATCH_PUSH_WORKERS rate limiter slots at a time, so single pushes and
+      callbacks on the main pool are never stuck behind a whole batch.
+    """
+    permission_classes = [IsStaff]
 
-            print("Transaction saved as Completed")
+    def post(self, request):
+        serializer = BatchPaymentsRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.resolve_items()
+
+        valid = [entry for entry in entries if "error" not in entry]
+        for entry in valid:
+            entry["reference"] = helpers.generate_reference(payment_method="M-Pesa")
+            entry["amount"] = int(entry["plan"].price)
+
+        with db_transaction.atomic():
+            Payment.objects.bulk_create(
+                Payment(
+                    member=entry["member"],
+                    amount=Decimal(entry["amount"]),
+                    payment_method="M-Pesa",
+                    reference=entry["reference"],
+                    plan=entry["plan"],
+                    recorded_by=request.user,
+                )
+                for entry in valid
+            )
+            # bulk_create does not return primary keys on every backend (MySQL), read them back by reference
+            references = [entry["reference"] for entry in valid]
+            payment_ids = dict(Payment.objects.filter(reference__in=references).values_list("reference", "id"))
+            MpesaTransaction.objects.bulk_create(
+                MpesaTransaction(
+                    payment_id=payment_ids[entry["reference"]],
+                    reference=entry["reference"],
+                    phone_number=entry["phone_number"],
+                    amount=entry["amount"],
+                    description=entry["description"],
+                    status="Queued",
+                )
+                for entry in valid
+            )
+            transaction_ids = dict(MpesaTransaction.objects.filter(reference__in=references).values_list("reference", "id"))
+
+            # Only push once the rows are committed and visible to the workers
+            db_transaction.on_commit(lambda: dispatch_batch_push(transaction_ids[reference] for reference in references))
 
-            transaction_data = MpesaTransactionSerializer(transaction).data
+        results = [self.queued_result(entry) for entry in entries]
+        return Response({"results": results}, status=status.HTTP_202_ACCEPTED)
 
-            return Response({"transaction_details": transaction_data}, status=200)
-        else:
-            print("Processing failed payment")
-            transaction.status = "Failed"
-            # payment.status = "Failed"
-            payment.delete() # Ensures you only save if payment is successful
-            transaction.save()
+    def queued_result(self, entry):
+        if "error" in entry:
+            return {"member": entry.get("member"), "plan": entry.get("plan"), "status": "Invalid", "error": entry["error"]}
+        return {
+            "member": entry["member"].id,
+            "plan": entry["plan"].id,
+            "reference": entry["reference"],
+            "status": "Queued",
+            "status_url": reverse("payment_status", kwargs={"reference": entry["reference"]}),
+        }
 
-            return Response({"error": "Payment failed", "message": result_desc}, status=400)
-    except MpesaTransaction.DoesNotExist:
-        print(f"Transaction with CheckoutRequestID {checkout_request_id} not found")
-        return Response({"error": "Transaction not found", "message": "No such transaction"}, status=400)
-    except Payment.DoesNotExist: 
-        print(f"Payment with reference {checkout_request_id} was not found")
-        return Response({"error": "Payment not found", "message": "A payment with the reference provided was not found"}, status=400)
-    except Exception as e:
-        print("Error processing M-Pesa callback:", str(e))
-        return Response({"error": "Invalid callback data"}, status=400)
+
+class MpesaPaymentStatusView(APIView):
+    """Lets the front desk poll an M-Pesa payment started with the async STK push."""
+    permission_classes = [IsStaff]
+
+    def get(self, request, reference):
+        mpesa_transaction = get_object_or_404(MpesaTransaction.objects.select_related("payment"), reference=reference)
+        payment = mpesa_transaction.payment
+
+        return Response(
+            {
+                "reference": reference,
+                "transaction_status": mpesa_transaction.status,
+                "payment_status": payment.status if payment else "Failed",  # Failed callbacks delete the payment
+                "transaction_details": MpesaTransactionSerializer(mpesa_transaction).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def mpesa_callback(request):
+    """Store the callback and ACK at once, it is applied by the callback workers (see api/utils/mpesa_callbacks.py)."""
+    body, status_code = enqueue_stk_callback(request.data)
+    return Response(body, status=status_code)
 
 
-class FetchMpesaTransactionView(generics.ListAPIView):
+class FetchMpesaTransactionView(StreamingListMixin, generics.ListAPIView):
 
     queryset = MpesaTransaction.objects.all()
     permission_classes = [IsStaff]
@@ -224,8 +285,9 @@ class FetchMpesaTransactionView(generics.ListAPIView):
     # filter_backends = [filters.SearchFilter, filters.OrderingFilter] # Provided as default in settings
     search_fields = ["id","phone_number", "transaction_date", "mpesa_receipt_number", "checkout_request_id"]
     ordering = ["-id"]
+    keyset_ordering = ["-id"]
 
-class FetchPaymentRecords(generics.ListAPIView):
+class FetchPaymentRecords(StreamingListMixin, generics.ListAPIView):
 
     queryset = Payment.objects.all()
     permission_classes = [IsStaff]
@@ -234,3 +296,4 @@ class FetchPaymentRecords(generics.ListAPIView):
     # filter_backends = [filters.SearchFilter]
     search_fields = ["reference", "plan__name", "payment_method"]
     ordering = ["-created_at"]
+    keyset_ordering = ["-created_at", "-id"]
@@ -1,4 +1,5 @@
 from api.utils.permissions import IsAdminForPlans
+from api.utils.mixins import StreamingListMixin
 from api.serializers.subscriptions_serializers import PlanSerializer, SubscriptionSerializer
 from rest_framework import viewsets, permissions
 from subscriptions.models import Plan, Subscription
@@ -27,8 +28,12 @@ class PlanViewSet(viewsets.ModelViewSet):
                 "Cannot delete this plan because it has subscriptions associated to it."
             )
 
-class FetchSubscriptions(generics.ListAPIView): 
+class FetchSubscriptions(StreamingListMixin, generics.ListAPIView): 
     queryset = Subscription.objects.all()
     serializer_class = SubscriptionSerializer
     permission_classes = [permissions.IsAdminUser]
-    ordering = ["-created_at"]
\ No newline at end of file
+    ordering = ["-created_at"]
+    keyset_ordering = ["-created_at", "-id"]
+
+    def get_queryset(self):
+        return super().get_queryset().with_effective_status()  # Annotated per request so "today" is current
@@ -19,6 +19,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from datetime import datetime
 from api.utils.filters import UserFilter
+from api.utils.querysets import select_for_serializer
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 
@@ -173,6 +174,7 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ["username", "first_name", "last_name"]
     ordering_fields = ["id", "username", "role", "dob"]
     ordering = ["id"]
+    keyset_ordering = ["id"]
 
     def get_queryset(self):
         """
@@ -182,10 +184,14 @@ class UserViewSet(viewsets.ModelViewSet):
         user = self.request.user  # Currently logged-in user
 
         if user.role == "Admin":
-            return CustomUser.objects.all() # Admins see Trainers & Members
+            queryset = CustomUser.objects.all() # Admins see Trainers & Members
         elif user.role == "Trainer":
-            return CustomUser.objects.filter(role="Member")  # Trainers see only Members
-        return CustomUser.objects.none()  # Members should not see anyone
+            queryset = CustomUser.objects.filter(role="Member")  # Trainers see only Members
+        else:
+            return CustomUser.objects.none()  # Members should not see anyone
+
+        # Join added_by/approved_by and load only the serialized columns (avoids 2 extra queries per user)
+        return select_for_serializer(queryset, self.get_serializer_class())
     
     def get_object(self):
         """
@@ -238,7 +244,7 @@ class UserViewSet(viewsets.ModelViewSet):
         # Approve user
         user_to_approve.approved_by = user
         user_to_approve.is_active = True
-        user_to_approve.save(update_fields=["approved_by", "is_active"])  # Update approved_by and is_active
+        user_to_approve.save(update_fields=["approved_by", "is_active", "updated_at"])  # updated_at feeds the kiosk roster sync
 
         return Response(
             {
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from api.utils.exports import export_action
+from .models import Attendance
 
-# Register your models here.
+
+@admin.register(Attendance)
+class AttendanceAdmin(admin.ModelAdmin):
+    list_display = ("member", "date", "present", "check_in_time", "checkout_time", "marked_by")
+    list_filter = ("present", "date")
+    date_hierarchy = "date"
+    actions = [export_action("attendance"), export_action("attendance", "xlsx")]
@@ -0,0 +1,27 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.utils.attendance_rollups import rebuild_attendance_rollups
+from attendance.models import Attendance
+
+
+class Command(BaseCommand):
+    help = "Recompute the attendance report rollups from Attendance (backfill, or repair after bulk edits)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start-date", type=date.fromisoformat, help="First day to rebuild (default: the oldest attendance)")
+        parser.add_argument("--end-date", type=date.fromisoformat, help="Last day to rebuild (default: today)")
+
+    def handle(self, *args, **options):
+        start_date = options["start_date"] or Attendance.objects.order_by("date").values_list("date", flat=True).first()
+        end_date = options["end_date"] or timezone.localdate()
+        if start_date is None:
+            self.stdout.write("No attendance to roll up")
+            return
+        if start_date > end_date:
+            raise CommandError("--start-date must be on or before --end-date")
+
+        started = time.perf_counter()
+        days = rebuild_attendance_rollups(start_date, end_date)
+        self.stdout.write(f"Rebuilt {days} day(s) of rollups from {start_date:%Y-%m} to {end_date:%Y-%m} in {time.perf_counter() - started:.2f}s")
@@ -13,6 +13,41 @@ class Attendance(models.Model):
     check_in_time = models.TimeField(null=True, blank=True)
     checkout_time = models.TimeField(null=True, blank=True)
     marked_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, related_name="marked_attendance", null=True, blank=True)
+    client_key = models.CharField(max_length=64, null=True, blank=True, unique=True)  # Idempotency key of a kiosk sync event
     
     class Meta:
         unique_together = ("member", "date")
+        indexes = [
+            models.Index(fields=["date", "id"], name="attendance_date_id_idx"),  # Keyset pagination
+            models.Index(fields=["date", "checkout_time"], name="attendance_open_session_idx"),  # Who is still in the gym today
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not {"member_id", "date", "present"} & instance.get_deferred_fields():
+            instance.counted_as = instance.rollup_key()  # What the rollups hold for this row, see attendance/signals.py
+        return instance
+
+    def rollup_key(self):
+        """The (member_id, date) this row adds to the attendance rollups, or None when it is not present."""
+        return (self.member_id, self.date) if self.present else None
+
+
+class DailyAttendanceSummary(models.Model):
+    """
+    One row per day with the number of members present, maintained by api/utils/attendance_rollups.py.
+    - Range reports read these (~365 rows a year) instead of every Attendance row.
+    """
+    date = models.DateField(unique=True)
+    present_count = models.PositiveIntegerField(default=0)
+
+
+class MemberMonthlyAttendance(models.Model):
+    """One row per member and month (`month` is its first day) with the days they were present."""
+    member = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="monthly_attendance")
+    month = models.DateField()
+    days_present = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("member", "month")
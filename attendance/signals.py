@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from attendance.models import Attendance
+from api.utils.attendance_rollups import apply_attendance
+
+ROLLUP_FIELDS = {"member", "member_id", "date", "present"}
+
+
+# insert_attendance (bulk_create, no signals) counts the rows it inserts; every other write goes through save() or
+# delete() - the admin, a check-in turning an absent row present, a member cascade - and is caught here.
+# QuerySet.update() bypasses both: run rebuild_attendance_rollups after such an edit.
+@receiver(post_save, sender=Attendance)
+def move_in_rollups(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+        return
+    if not created and not hasattr(instance, "counted_as"):
+        return  # Unknown previous state (deferred fields): leave the rollups to rebuild_attendance_rollups
+
+    before, after = (None if created else instance.counted_as), instance.rollup_key()
+    if before != after:
+        if before:
+            apply_attendance([before], sign=-1)
+        if after:
+            apply_attendance([after])
+    instance.counted_as = after
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_from_rollups(sender, instance, **kwargs):
+    counted_as = getattr(instance, "counted_as", instance.rollup_key())
+    if counted_as:
+        apply_attendance([counted_as], sign=-1)
@@ -1,3 +1,301 @@
+import gzip
+import json
+from datetime import date, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+from api.utils.attendance_rollups import insert_attendance, rebuild_attendance_rollups
+from api.utils.kiosk_sync import decode_since, record_check_ins, roster_delta
+from api.utils.renewals import renew_subscription
+from api.serializers.attendance_serializers import BulkAttendanceSerializer
+from api.utils.testing import QueryCountAssertionsMixin
+from attendance.models import Attendance, DailyAttendanceSummary, MemberMonthlyAttendance
+from subscriptions.models import Plan
+from users.models import CustomUser
 
-# Create your tests here.
+
+class AttendanceListQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.member = CustomUser.objects.create_user(username="member", email="member@example.com")
+        self.row_count = 0
+
+    def create_attendance(self, count):
+        for _ in range(count):
+            self.row_count += 1
+            Attendance.objects.create(member=self.member, date=date.today() - timedelta(days=self.row_count), marked_by=self.admin)
+
+    def test_attendance_list_query_count_is_constant(self):
+        self.assertQueryCountConstant(self.client, "/api/attendance/fetch-attendance/", self.create_attendance)
+
+
+class BulkAttendanceTests(QueryCountAssertionsMixin, TestCase):
+    URL = "/api/attendance/bulk-check-in/"
+
+    def setUp(self):
+        self.admin, self.client = self.login_staff(role="Trainer")
+        self.members = [
+            CustomUser.objects.create_user(username=f"member{i}", email=f"member{i}@example.com") for i in range(40)
+        ]
+
+    def test_marks_class_with_constant_queries(self):
+        Attendance.objects.create(member=self.members[0], date=date.today(), marked_by=self.admin)
+        ids = [member.id for member in self.members] + [self.members[1].id, 999999]
+
+        with self.assertNumQueries(13):  # One IN query to validate, the re-check, one INSERT in a savepoint, then the rollups
+            response = self.client.post(self.URL, {"members": ids}, format="json")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        statuses = [result["status"] for result in response.json()["data"]["results"]]
+        self.assertEqual(statuses[:2], ["Already marked", "Marked"])
+        self.assertEqual(statuses[-2:], ["Duplicate", "Not found"])
+        self.assertEqual(response.json()["data"]["marked"], 39)
+        self.assertEqual(Attendance.objects.filter(date=date.today()).count(), 40)
+
+    def test_member_marked_concurrently_is_counted_once(self):
+        member = self.members[0]
+        resolve_members = BulkAttendanceSerializer.resolve_members
+
+        def marked_in_between(serializer):
+            resolved = resolve_members(serializer)
+            insert_attendance([Attendance(member=member, date=date.today(), marked_by=self.admin)])  # Another request wins the race
+            return resolved
+
+        with mock.patch.object(BulkAttendanceSerializer, "resolve_members", marked_in_between):
+            response = self.client.post(self.URL, {"members": [member.id]}, format="json")
+
+        self.assertEqual(response.json()["data"]["results"][0]["status"], "Already marked")
+        self.assertEqual(Attendance.objects.filter(member=member).count(), 1)
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=date.today()).present_count, 1)
+        self.assertEqual(MemberMonthlyAttendance.objects.get(member=member).days_present, 1)
+
+        self.assertEqual(record_check_ins([{"key": "k1", "member": member.id, "at": timezone.now()}], self.admin.id)[0]["status"], "Already marked")
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=date.today()).present_count, 1)
+
+    def test_row_inserted_after_the_check_is_skipped(self):
+        Attendance.objects.create(member=self.members[0], date=date.today(), marked_by=self.admin)
+        rows = [Attendance(member=member, date=date.today(), marked_by=self.admin) for member in self.members[:3]]
+
+        with mock.patch("api.utils.attendance_rollups._already_marked", return_value=set()):  # Lost the race after the check
+            inserted = insert_attendance(rows)
+
+        self.assertEqual([row.member_id for row in inserted], [member.id for member in self.members[1:3]])
+        self.assertEqual(Attendance.objects.filter(date=date.today()).count(), 3)
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=date.today()).present_count, 3)
+
+    def test_only_active_members_are_checked_in(self):
+        inactive = CustomUser.objects.create_user(username="inactive", email="inactive@example.com", is_active=False)
+
+        response = self.client.post(self.URL, {"members": [self.members[0].id, inactive.id, self.admin.id]}, format="json")
+
+        statuses = [result["status"] for result in response.json()["data"]["results"]]
+        self.assertEqual(statuses, ["Marked", "Not found", "Not found"])
+        self.assertEqual(Attendance.objects.get().member, self.members[0])
+
+    def test_rejects_future_date(self):
+        response = self.client.post(self.URL, {"members": [self.members[0].id], "date": str(date.today() + timedelta(days=1))}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AttendanceReportTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.members = [CustomUser.objects.create_user(username=f"member{i}", email=f"member{i}@example.com") for i in range(3)]
+        self.today = date.today()
+
+    def mark(self, member, day):
+        response = self.client.post("/api/attendance/mark-member-attendance/", {"member": member.id, "date": str(day)}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_writes_maintain_rollups(self):
+        yesterday = self.today - timedelta(days=1)
+        self.mark(self.members[0], yesterday)
+        self.client.post("/api/attendance/bulk-check-in/", {"members": [member.id for member in self.members]}, format="json")
+
+        self.assertEqual(
+            dict(DailyAttendanceSummary.objects.values_list("date", "present_count")), {yesterday: 1, self.today: 3}
+        )
+        self.assertEqual(
+            MemberMonthlyAttendance.objects.filter(member=self.members[0]).aggregate(total=Sum("days_present"))["total"], 2
+        )
+
+        Attendance.objects.filter(member=self.members[1]).get().delete()
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=self.today).present_count, 2)
+
+    def test_saved_edits_move_the_rollups(self):
+        yesterday = self.today - timedelta(days=1)
+        attendance = Attendance.objects.create(member=self.members[0], date=self.today)  # e.g. the admin add form
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=self.today).present_count, 1)
+
+        attendance = Attendance.objects.get()
+        attendance.present = False
+        attendance.save()
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=self.today).present_count, 0)
+
+        attendance.present, attendance.date = True, yesterday
+        attendance.save()
+        attendance.check_in_time = timezone.localtime().time()
+        attendance.save(update_fields=["check_in_time"])
+        self.assertEqual(
+            dict(DailyAttendanceSummary.objects.values_list("date", "present_count")), {yesterday: 1, self.today: 0}
+        )
+
+        Attendance.objects.get().delete()
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=yesterday).present_count, 0)
+        self.assertEqual(MemberMonthlyAttendance.objects.filter(member=self.members[0]).aggregate(total=Sum("days_present"))["total"], 0)
+
+    def test_summary_reads_the_daily_rollup(self):
+        for member in self.members:
+            self.mark(member, self.today)
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/attendance/summary/", {"start_date": str(self.today - timedelta(days=364))})
+
+        data = response.json()["data"]
+        self.assertEqual(data["total_check_ins"], 3)
+        self.assertEqual(data["busiest_day"], {"date": str(self.today), "present": 3})
+        self.assertEqual(self.client.get("/api/attendance/summary/", {"start_date": "2030-01-02", "end_date": "2030-01-01"}).status_code, 400)
+
+    def test_history_matches_a_rebuild(self):
+        for days_ago in (0, 1, 40):
+            self.mark(self.members[0], self.today - timedelta(days=days_ago))
+        live = self.client.get("/api/attendance/history/", {"member_id": self.members[0].id}).json()["data"]
+
+        rebuild_attendance_rollups(self.today - timedelta(days=60), self.today)
+        rebuilt = self.client.get("/api/attendance/history/", {"member_id": self.members[0].id}).json()["data"]
+
+        self.assertEqual(live["total_days"], 3)
+        self.assertEqual(live["last_attended"], str(self.today))
+        self.assertEqual(live, rebuilt)
+
+
+class CheckInOutTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin, self.client = self.login_staff(role="Trainer")
+        self.member = CustomUser.objects.create_user(username="member", email="member@example.com")
+
+    def post(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/attendance/{action}/", {"member": self.member.id}, format="json")
+
+    def occupancy(self):
+        response = self.client.get("/api/attendance/occupancy/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]["members"]
+
+    def test_sessions_drive_occupancy(self):
+        self.assertEqual(self.occupancy(), [])
+
+        self.assertEqual(self.post("check-in").status_code, 201)
+        self.assertEqual(self.post("check-in").status_code, 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.occupancy(), [self.member.id])
+        attendance = Attendance.objects.get(member=self.member)
+        self.assertIsNotNone(attendance.check_in_time)
+
+        self.assertEqual(self.post("check-out").status_code, 200)
+        self.assertEqual(self.post("check-out").status_code, 400)
+        self.assertEqual(self.occupancy(), [])
+
+        self.assertEqual(self.post("check-in").status_code, 200)  # Back in on the same row, counted once in the rollups
+        self.assertEqual(self.occupancy(), [self.member.id])
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=date.today()).present_count, 1)
+
+
+class KioskSyncTests(QueryCountAssertionsMixin, TestCase):
+    URL = "/api/attendance/kiosk/sync/"
+
+    def setUp(self):
+        cache.clear()
+        self.admin, self.client = self.login_staff(role="Trainer")
+        self.members = [CustomUser.objects.create_user(username=f"member{i}", email=f"member{i}@example.com") for i in range(3)]
+
+    def sync(self, payload):
+        body = gzip.compress(json.dumps(payload).encode())
+        response = self.client.post(self.URL, body, content_type="application/json", HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["data"]
+
+    def test_events_are_idempotent(self):
+        at = timezone.now().isoformat()
+        events = [
+            {"key": "k1", "member": self.members[0].id, "at": at},
+            {"key": "k2", "member": self.members[1].id, "at": at},
+            {"key": "k3", "member": self.members[1].id, "at": at},
+            {"key": "k4", "member": 999999, "at": at},
+            {"key": "k5", "member": self.members[2].id, "at": "not-a-date"},
+        ]
+
+        first = self.sync({"since": None, "events": events})
+        replay = self.sync({"since": None, "events": events})
+
+        expected = {"k1": "Recorded", "k2": "Recorded", "k3": "Already marked", "k4": "Not found"}
+        self.assertEqual({result["key"]: result["status"] for result in first["results"]}, expected)
+        self.assertEqual(first["results"], replay["results"])
+        self.assertEqual(list(first["errors"]), ["k5"])
+        self.assertEqual(len(first["roster"]["rows"]), 3)
+        self.assertEqual(Attendance.objects.count(), 2)
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=timezone.localdate()).present_count, 2)
+
+    def test_roster_delta_pages_and_resumes(self):
+        rows, _, since, has_more = roster_delta(limit=2)
+        self.assertTrue(has_more)
+        more, _, since, has_more = roster_delta(decode_since(since), limit=2)
+        self.assertFalse(has_more)
+        self.assertEqual([row[0] for row in rows + more], [member.id for member in self.members])
+
+        CustomUser.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        rows, _, since, _ = roster_delta()
+        self.assertEqual(roster_delta(decode_since(since))[0], [])
+
+        plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        renew_subscription(self.members[1].id, plan, "REF1")
+        changed = roster_delta(decode_since(since))[0]
+        self.assertEqual([(row[0], row[-1]) for row in changed], [(self.members[1].id, date.today() + timedelta(days=30))])
+
+    def test_approved_member_is_in_the_next_delta(self):
+        pending = CustomUser.objects.create_user(username="pending", email="pending@example.com", is_active=False)
+        CustomUser.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        _, _, since, _ = roster_delta()
+
+        response = self.client.post(f"/api/users/{pending.id}/approve/")
+        self.assertEqual(response.status_code, 200, response.content)
+
+        changed = roster_delta(decode_since(since))[0]
+        self.assertEqual([(row[0], row[4]) for row in changed], [(pending.id, True)])
+
+    def test_removed_members_are_sent_as_tombstones(self):
+        CustomUser.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        _, _, since, _ = roster_delta()
+
+        deleted_id = self.members[0].id
+        self.members[0].delete()
+        self.members[1].role = "Trainer"
+        self.members[1].save()
+
+        rows, removed, _, _ = roster_delta(decode_since(since))
+        self.assertEqual(rows, [])
+        self.assertEqual(sorted(removed), sorted([deleted_id, self.members[1].id]))
+        self.assertEqual(roster_delta()[1], [])  # A full download has nothing to remove
+
+    def test_reused_keys_are_conflicts(self):
+        at = timezone.now().isoformat()
+        self.sync({"since": None, "events": [{"key": "k1", "member": self.members[0].id, "at": at}]})
+
+        results = self.sync({"since": None, "events": [
+            {"key": "k1", "member": self.members[1].id, "at": at},  # Already used by another member's check-in
+            {"key": "k2", "member": self.members[1].id, "at": at},
+            {"key": "k2", "member": self.members[2].id, "at": at},  # Reused within the batch
+        ]})["results"]
+
+        self.assertEqual([result["status"] for result in results], ["Conflict", "Recorded", "Conflict"])
+        self.assertEqual(Attendance.objects.count(), 2)
+
+    def test_rejects_tampered_token(self):
+        response = self.client.post(self.URL, {"since": "forged"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
@@ -75,6 +75,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",  # Requires authentication by default
     ),
     "DEFAULT_RENDERER_CLASSES": ["api.utils.renderers.CustomJSONRenderer"],
+    "DEFAULT_PAGINATION_CLASS": "api.utils.pagination.KeysetPagination",  # Cursor pagination, opt-in with ?page_size= / ?cursor=
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",  # Filtering
         "rest_framework.filters.SearchFilter",  # Searching
@@ -82,6 +83,10 @@ REST_FRAMEWORK = {
     ],
 }
 
+# "orjson" uses the C-accelerated encoder when installed, "json" uses DRF's stdlib encoder. Output is identical except
+# for native float values in exponent form or NaN/Infinity (see CustomJSONRenderer).
+JSON_RENDERER_ENGINE = env("JSON_RENDERER_ENGINE", default="orjson")
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=6),  # Access token expires in 6 hours
     "REFRESH_TOKEN_LIFETIME": timedelta(days=15),  # Refresh token expires in 15 days
@@ -95,6 +100,41 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "user_id",
 }
 
+# Cache used for hot lookups such as the authenticated user snapshot.
+# Use a shared backend (Redis/Memcached) when running several workers so invalidations reach all of them.
+CACHES = {
+    "default": {
+        "BACKEND": env("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env("CACHE_LOCATION", default="gms-default"),
+    }
+}
+
+AUTH_USER_CACHE_TIMEOUT = 60 * 5  # Seconds an authenticated user snapshot is served from cache
+ACCESS_COVERAGE_CACHE_TIMEOUT = 60 * 60 * 6  # Seconds a member's coverage (latest subscription end_date) is served from cache
+OCCUPANCY_CACHE_TIMEOUT = 60 * 5  # Seconds the set of members currently checked in is served from cache (refreshed on every check-in/out)
+KIOSK_ROSTER_PAGE_SIZE = 5000  # Members returned per kiosk sync, the kiosk syncs again while has_more is true
+KIOSK_SYNC_OVERLAP_SECONDS = 60  # How far back a caught-up since-token points, to catch slow commits
+KIOSK_SYNC_MAX_BYTES = 5 * 1024 * 1024  # Largest decompressed gzip request body
+
+# Request profiling done by RequestTimerMiddleware (always sends a Server-Timing header)
+REQUEST_PROFILING = {
+    "ENVELOPE": env.bool("REQUEST_PROFILE_IN_ENVELOPE", default=False),  # Add a "profile" object to response envelopes
+    "BUDGETS": {  # Keyed by URL name, "default" covers every other route. Offenders are logged to "gms.performance"
+        "default": {"queries": 20, "duration_ms": 500},
+        "payment_records": {"queries": 10, "duration_ms": 1000},
+        "fetch-mpesa-transactions": {"queries": 10, "duration_ms": 1000},
+        "attendance-records": {"queries": 10, "duration_ms": 1000},
+        "subscriptions": {"queries": 10, "duration_ms": 1000},
+        "access_check": {"queries": 1, "duration_ms": 10},  # Door check, served from the coverage cache
+        "attendance_summary": {"queries": 2, "duration_ms": 200},  # Read from the daily rollup
+        "attendance_history": {"queries": 3, "duration_ms": 200},  # Read from the member/month rollup
+        "attendance_occupancy": {"queries": 1, "duration_ms": 10},  # Live occupancy, served from the occupancy cache
+        "dashboard": {"queries": 2, "duration_ms": 200},  # Read from the materialized DailyStats
+        "login": {"queries": 5, "duration_ms": 2000},  # Password hashing alone takes ~600ms at PASSWORD_HASH_ITERATIONS
+        "register": {"queries": 5, "duration_ms": 2000},  # Hashes the new password too
+    },
+}
+
 
 TEMPLATES = [
     {
@@ -148,6 +188,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Login with either username or email in a single query
+AUTHENTICATION_BACKENDS = ["users.backends.UsernameOrEmailBackend"]
+
+# PBKDF2 work factor. Leave unset for Django's default; lower it to trade hash cost for login throughput.
+# Existing hashes are re-hashed to the configured cost on the next successful login.
+PASSWORD_HASH_ITERATIONS = env.int("PASSWORD_HASH_ITERATIONS", default=None)
+
+PASSWORD_HASHERS = [
+    "users.hashers.TieredPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -185,3 +240,12 @@ MPESA_PASSKEY = env("MPESA_PASSKEY")
 MPESA_CALLBACK_URL = env("MPESA_CALLBACK_URL")
 ACCESS_TOKEN_URL = env("ACCESS_TOKEN_URL")
 STK_PUSH_URL = env("STK_PUSH_URL")
+MPESA_ASYNC_PUSH = env.bool("MPESA_ASYNC_PUSH", default=False)  # Queue STK pushes and return 202 instead of waiting on Safaricom
+MPESA_PUSH_WORKERS = env.int("MPESA_PUSH_WORKERS", default=4)  # Background threads performing queued pushes
+MPESA_BATCH_PUSH_WORKERS = env.int("MPESA_BATCH_PUSH_WORKERS", default=2)  # Background threads performing batch pushes, kept apart from callbacks
+MPESA_PUSH_RATE_LIMIT = env.float("MPESA_PUSH_RATE_LIMIT", default=5)  # Max queued/batch pushes per second per process, 0 for no limit
+MPESA_PUSH_CLAIM_TIMEOUT = env.int("MPESA_PUSH_CLAIM_TIMEOUT", default=300)  # Seconds before dispatch_stk_pushes re-queues a push stuck in Pushing
+MPESA_CALLBACK_MAX_ATTEMPTS = env.int("MPESA_CALLBACK_MAX_ATTEMPTS", default=10)  # Tries for a callback whose CheckoutRequestID is not saved yet
+MPESA_CALLBACK_RETRY_DELAY = env.float("MPESA_CALLBACK_RETRY_DELAY", default=5)  # Seconds between those tries
+MPESA_BASE_URL = env("MPESA_BASE_URL", default="")  # Overrides the Daraja host, e.g. http://127.0.0.1:8900 for mpesa_stub_server
+MPESA_ASYNC_MAX_CONNECTIONS = env.int("MPESA_ASYNC_MAX_CONNECTIONS", default=200)  # Connection pool of the async client, per event loop
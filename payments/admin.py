@@ -1,8 +1,23 @@
 from django.contrib import admin
-from .models import Payment
+from api.utils.exports import export_action
+from .models import Payment, MpesaCallback, DailyStats
 
 @admin.register(Payment)
 class PaymentsAdmin(admin.ModelAdmin):
   list_display = ["member", "plan", "amount", "payment_method", "reference", "status", "created_at"]
   search_fields = ["member", "plan", "reference"]
   list_filter = ["status", "payment_method"]
+  actions = [export_action("payments"), export_action("payments", "xlsx")]
+
+
+@admin.register(MpesaCallback)
+class MpesaCallbackAdmin(admin.ModelAdmin):
+  list_display = ["checkout_request_id", "status", "attempts", "received_at", "processed_at"]
+  search_fields = ["checkout_request_id"]
+  list_filter = ["status"]
+
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+  list_display = ["date", "revenue", "payments", "new_members", "active_members", "check_ins", "refreshed_at"]
+  date_hierarchy = "date"
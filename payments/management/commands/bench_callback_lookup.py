@@ -0,0 +1,72 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from payments.models import MpesaTransaction, Payment
+from subscriptions.models import Plan
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the callback lookups (transaction by CheckoutRequestID, its payment, receipt reconciliation) "
+        "as the transaction history grows. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated transaction counts")
+        parser.add_argument("--lookups", type=int, default=200, help="Lookups timed at each size")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        lookups = options["lookups"]
+
+        with transaction.atomic():
+            member = CustomUser.objects.create_user(username="bench_callback_user", email="bench_callback@example.com")
+            plan = Plan.objects.filter(name="monthly").first() or Plan.objects.create(name="monthly", price=1000, duration_days=30)
+
+            self.stdout.write(f"{'rows':>10}{'median ms':>12}{'p95 ms':>10}{'queries':>10}")
+            created = 0
+            for size in sizes:
+                self.create_rows(member, plan, created, size, options["batch_size"])
+                created = size
+
+                step = max(size // lookups, 1)
+                timings = []
+                with CaptureQueriesContext(connection) as queries:
+                    for i in range(0, size, step):
+                        started = time.perf_counter()
+                        mpesa_transaction = MpesaTransaction.objects.select_for_update().get(checkout_request_id=f"ws_CO_BENCH{i}")
+                        Payment.objects.select_for_update().get(id=mpesa_transaction.payment_id)
+                        MpesaTransaction.objects.filter(mpesa_receipt_number=f"RCPT{i}").exists()
+                        timings.append((time.perf_counter() - started) * 1000)
+
+                timings.sort()
+                self.stdout.write(
+                    f"{size:>10}{statistics.median(timings):>12.3f}{timings[int(len(timings) * 0.95) - 1]:>10.3f}"
+                    f"{len(queries) / len(timings):>10.1f}"
+                )
+
+            transaction.set_rollback(True)
+
+    def create_rows(self, member, plan, start, end, batch_size):
+        for batch_start in range(start, end, batch_size):
+            batch = range(batch_start, min(batch_start + batch_size, end))
+            payments = Payment.objects.bulk_create(
+                Payment(member=member, amount=1000, payment_method="M-Pesa", reference=f"BENCH{i}", plan=plan, status="Completed")
+                for i in batch
+            )
+            MpesaTransaction.objects.bulk_create(
+                MpesaTransaction(
+                    payment=payment,
+                    merchant_request_id=f"BENCH-M{i}",
+                    checkout_request_id=f"ws_CO_BENCH{i}",
+                    mpesa_receipt_number=f"RCPT{i}",
+                    reference=f"BENCH{i}",
+                    amount=1000,
+                    status="Completed",
+                )
+                for i, payment in zip(batch, payments)
+            )
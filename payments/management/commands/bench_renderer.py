@@ -0,0 +1,87 @@
+import datetime
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from phonenumber_field.phonenumber import PhoneNumber
+from api.utils.renderers import CustomJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = "Compare CustomJSONRenderer engines (json vs orjson) on large payment/transaction list payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000, help="Rows per payload")
+        parser.add_argument("--repeat", type=int, default=5, help="Renders per engine (best time is reported)")
+
+    def payment_rows(self, rows):
+        """Rows shaped like PaymentSerializer output."""
+        created = datetime.datetime(2025, 1, 1, 8, 30, tzinfo=datetime.timezone.utc)
+        return [
+            {
+                "id": i,
+                "amount": f"{1000 + i % 500}.00",
+                "payment_method": "M-Pesa" if i % 2 else "Cash",
+                "reference": f"MPS{i:09d}",
+                "status": "Completed",
+                "created_at": (created + datetime.timedelta(minutes=i)).isoformat(),
+                "updated_at": (created + datetime.timedelta(minutes=i)).isoformat(),
+                "member": i % 300,
+                "plan": 1 + i % 3,
+                "recorded_by": 1,
+                "confirmed_by": None,
+            }
+            for i in range(rows)
+        ]
+
+    def native_rows(self, rows):
+        """Rows holding native Decimal/date/datetime/time/PhoneNumber values the encoders must convert."""
+        phone = PhoneNumber.from_string("+254798114462")
+        day = datetime.date(2025, 1, 1)
+        created = datetime.datetime(2025, 1, 1, 8, 30, 15, 250, tzinfo=datetime.timezone.utc)
+        return [
+            {
+                "id": i,
+                "amount": Decimal(f"{1000 + i % 500}.50"),
+                "phone_number": phone,
+                "transaction_date": day + datetime.timedelta(days=i % 365),
+                "timestamp": datetime.time(8, i % 60, i % 60),
+                "created_at": created + datetime.timedelta(seconds=i),
+                "description": "Malipo ya uanachama ✓",
+            }
+            for i in range(rows)
+        ]
+
+    def render(self, engine, payload, repeat):
+        renderer = CustomJSONRenderer()
+        best, output = None, None
+        with override_settings(JSON_RENDERER_ENGINE=engine):
+            for _ in range(repeat):
+                started = time.perf_counter()
+                output = renderer.render(payload, renderer_context={})
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+        return best, output
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson is not installed, only the json engine is available.")
+            return
+
+        rows, repeat = options["rows"], options["repeat"]
+        self.stdout.write(f"{'payload':<12}{'json ms':>10}{'orjson ms':>12}{'speedup':>10}{'identical':>11}")
+        for name, payload in [("payments", self.payment_rows(rows)), ("native", self.native_rows(rows))]:
+            json_time, json_output = self.render("json", payload, repeat)
+            orjson_time, orjson_output = self.render("orjson", payload, repeat)
+            # Envelopes carry their own render timestamp, compare everything but that
+            identical = _strip_timestamp(json_output) == _strip_timestamp(orjson_output)
+            self.stdout.write(
+                f"{name:<12}{json_time * 1000:>10.1f}{orjson_time * 1000:>12.1f}"
+                f"{json_time / orjson_time:>9.1f}x{str(identical):>11}"
+            )
+
+
+def _strip_timestamp(output):
+    start = output.rindex(b'"timestamp":')
+    end = output.index(b",", start)
+    return output[:start] + output[end:]
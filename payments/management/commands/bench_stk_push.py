@@ -0,0 +1,50 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.utils.mpesa_async_client import AsyncMpesaClient
+from api.utils.mpesa_client import MpesaClient
+
+
+class Command(BaseCommand):
+    help = "Compare STK push throughput of the sync client (thread pool) and the async client (one event loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pushes", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=20, help="Thread pool size for the sync client")
+        parser.add_argument("--concurrency", type=int, default=200, help="Pushes in flight for the async client")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "MPESA_BASE_URL", ""):
+            raise CommandError("Set MPESA_BASE_URL to a stub server (manage.py mpesa_stub_server) before benchmarking")
+
+        pushes = options["pushes"]
+        self.stdout.write(f"Pushing {pushes} STK requests to {settings.MPESA_BASE_URL}")
+
+        client = MpesaClient()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            results = list(pool.map(lambda i: client.stk_push("254700000000", 1, f"BENCH{i}", "Benchmark"), range(pushes)))
+        self.report(f"sync x{options['threads']} threads", results, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = asyncio.run(self.run_async(pushes, options["concurrency"]))
+        self.report(f"async x{options['concurrency']} in flight", results, time.perf_counter() - start)
+
+    async def run_async(self, pushes, concurrency):
+        client = AsyncMpesaClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def push(i):
+            async with semaphore:
+                return await client.stk_push("254700000000", 1, f"BENCH{i}", "Benchmark")
+
+        try:
+            return await asyncio.gather(*(push(i) for i in range(pushes)))
+        finally:
+            await client.aclose()
+
+    def report(self, label, results, elapsed):
+        failed = sum(1 for result in results if "error" in result)
+        self.stdout.write(f"{label}: {elapsed:.2f}s, {len(results) / elapsed:.1f} pushes/s, {failed} failed")
@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.utils.mpesa_dispatcher import requeue_stale_pushes, run_stk_push
+from payments.models import MpesaTransaction
+
+
+class Command(BaseCommand):
+    help = "Send STK pushes for queued M-Pesa transactions (worker mode, or to recover pushes lost in a restart)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for queued transactions")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop")
+        parser.add_argument("--workers", type=int, default=getattr(settings, "MPESA_PUSH_WORKERS", 4))
+        parser.add_argument(
+            "--claim-timeout", type=int, default=getattr(settings, "MPESA_PUSH_CLAIM_TIMEOUT", 300),
+            help="Re-queue pushes stuck in Pushing for longer than this many seconds (a worker died mid-push)",
+        )
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix="stk-push") as pool:
+            while True:
+                requeued = requeue_stale_pushes(options["claim_timeout"])
+                if requeued:
+                    self.stdout.write(f"Re-queued {requeued} stale STK push(es)")
+
+                queued = list(
+                    MpesaTransaction.objects.filter(status="Queued").order_by("id").values_list("id", flat=True)[:500]
+                )
+                # run_stk_push claims each row first, so rows taken by the in-process pool are skipped
+                list(pool.map(run_stk_push, queued))
+                if queued:
+                    self.stdout.write(f"Processed {len(queued)} queued STK push(es)")
+
+                if not options["loop"]:
+                    break
+                if not queued:
+                    time.sleep(options["interval"])
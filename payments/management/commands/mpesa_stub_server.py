@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+import requests
+
+
+class StubDarajaHandler(BaseHTTPRequestHandler):
+    """Answers the Daraja endpoints the M-Pesa clients use, after `latency` seconds (like Safaricom does)."""
+
+    latency = 0.0
+    callback_url = None  # When set, a successful stkCallback is POSTed here after each push
+    callback_delay = 1.0
+
+    def do_GET(self):
+        if self.path.startswith("/oauth/v1/generate"):
+            return self.reply({"access_token": uuid.uuid4().hex, "expires_in": "3599"})
+        self.reply({"errorMessage": "Not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path == "/mpesa/stkpush/v1/processrequest":
+            body = {
+                "MerchantRequestID": f"stub-{uuid.uuid4().hex[:12]}",
+                "CheckoutRequestID": f"ws_CO_stub_{uuid.uuid4().hex}",
+                "ResponseCode": "0",
+                "ResponseDescription": "Success. Request accepted for processing",
+                "CustomerMessage": "Success. Request accepted for processing",
+            }
+            if self.callback_url:
+                threading.Timer(self.callback_delay, self.send_callback, args=(body, payload)).start()
+            return self.reply(body)
+
+        if self.path == "/mpesa/stkpushquery/v1/query":
+            return self.reply(
+                {
+                    "ResponseCode": "0",
+                    "ResponseDescription": "The service request has been accepted successsfully",
+                    "MerchantRequestID": "stub",
+                    "CheckoutRequestID": payload.get("CheckoutRequestID"),
+                    "ResultCode": "0",
+                    "ResultDesc": "The service request is processed successfully.",
+                }
+            )
+
+        self.reply({"errorMessage": "Not found"}, status=404)
+
+    def reply(self, body, status=200):
+        time.sleep(self.latency)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_callback(self, body, payload):
+        callback = {
+            "Body": {
+                "stkCallback": {
+                    "MerchantRequestID": body["MerchantRequestID"],
+                    "CheckoutRequestID": body["CheckoutRequestID"],
+                    "ResultCode": 0,
+                    "ResultDesc": "The service request is processed successfully.",
+                    "CallbackMetadata": {
+                        "Item": [
+                            {"Name": "Amount", "Value": payload.get("Amount")},
+                            {"Name": "MpesaReceiptNumber", "Value": uuid.uuid4().hex[:10].upper()},
+                            {"Name": "TransactionDate", "Value": int(time.strftime("%Y%m%d%H%M%S"))},
+                            {"Name": "PhoneNumber", "Value": payload.get("PhoneNumber")},
+                        ]
+                    },
+                }
+            }
+        }
+        try:
+            requests.post(self.callback_url, json=callback, timeout=10)
+        except requests.RequestException as e:
+            print("Stub callback failed:", str(e))
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the Daraja API, for load testing the M-Pesa clients (set MPESA_BASE_URL to its address)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8900)
+        parser.add_argument("--latency", type=float, default=0.5, help="Seconds each response is delayed")
+        parser.add_argument("--callback-url", help="POST a successful stkCallback here after each push")
+        parser.add_argument("--callback-delay", type=float, default=1.0, help="Seconds between a push and its callback")
+
+    def handle(self, *args, **options):
+        StubDarajaHandler.latency = options["latency"]
+        StubDarajaHandler.callback_url = options["callback_url"]
+        StubDarajaHandler.callback_delay = options["callback_delay"]
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), StubDarajaHandler)
+        server.daemon_threads = True
+        self.stdout.write(f"Stub Daraja API on http://{options['host']}:{options['port']} (latency {options['latency']}s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
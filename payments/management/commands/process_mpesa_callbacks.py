@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.utils.mpesa_callbacks import run_stk_callback
+from payments.models import MpesaCallback
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Apply stored M-Pesa callbacks (worker mode, or to recover callbacks lost in a restart)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for received callbacks")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop")
+        parser.add_argument("--workers", type=int, default=getattr(settings, "MPESA_PUSH_WORKERS", 4))
+        parser.add_argument("--retry-failed", action="store_true", help="Apply callbacks that previously failed again")
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            retried = MpesaCallback.objects.filter(status="Failed").update(status="Received")
+            self.stdout.write(f"Retrying {retried} failed callback(s)")
+
+        with ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix="mpesa-callback") as pool:
+            while True:
+                received = list(
+                    MpesaCallback.objects.filter(status="Received").order_by("id").values_list("id", flat=True)[:BATCH_SIZE]
+                )
+                # apply_stk_callback locks each row, so callbacks taken by the in-process pool are skipped
+                list(pool.map(run_stk_callback, received))
+                if received:
+                    self.stdout.write(f"Processed {len(received)} callback(s)")
+
+                if not options["loop"]:
+                    break
+                if len(received) < BATCH_SIZE:
+                    time.sleep(options["interval"])
@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.utils.mpesa_reconciliation import STATEMENT_COLUMNS, Reconciler, query_pending, read_statement
+from payments.models import MpesaTransaction
+
+
+class Command(BaseCommand):
+    help = "Settle M-Pesa payments stuck in Pending (missed callbacks) from a CSV statement export or Daraja STK queries."
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--csv", help="Path to an M-Pesa statement export")
+        source.add_argument("--daraja", action="store_true", help="Query Daraja for each pending STK push")
+        parser.add_argument("--older-than", type=int, default=10, help="With --daraja, only query pushes older than this many minutes")
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent Daraja queries")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows settled per database transaction")
+        for column, default in STATEMENT_COLUMNS.items():
+            parser.add_argument(f"--{column}-column", default=default, help=f'CSV column holding the {column} (default "{default}")')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        reconciler = Reconciler(chunk_size=options["chunk_size"])
+        self.stdout.write(f"{len(reconciler.by_reference)} pending transaction(s) indexed")
+
+        if options["csv"]:
+            columns = {column: options[f"{column}_column"] for column in STATEMENT_COLUMNS}
+            try:
+                with open(options["csv"], newline="", encoding="utf-8-sig") as statement:
+                    counts = reconciler.run(read_statement(statement, columns))
+            except OSError as e:
+                raise CommandError(f"Could not read {options['csv']}: {e}")
+        else:
+            cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+            pending = (
+                MpesaTransaction.objects.filter(status="Pending", checkout_request_id__isnull=False, payment__created_at__lte=cutoff)
+                .only("id", "reference", "checkout_request_id")
+                .iterator(chunk_size=2000)
+            )
+            counts = reconciler.run(query_pending(pending, workers=options["workers"]))
+
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Reconciled in {time.perf_counter() - started:.2f}s: {summary}"))
@@ -0,0 +1,31 @@
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.utils.dashboard_stats import refresh_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Materialize the admin dashboard's daily stats (run every few minutes with --loop, or once with a date range to backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=2, help="Refresh this many days up to today (default: yesterday and today)")
+        parser.add_argument("--start-date", type=date.fromisoformat, help="Backfill from this day instead of --days")
+        parser.add_argument("--end-date", type=date.fromisoformat, help="Last day to refresh (default: today)")
+        parser.add_argument("--loop", action="store_true", help="Keep refreshing every --interval seconds")
+        parser.add_argument("--interval", type=float, default=300.0, help="Seconds between refreshes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            end_date = options["end_date"] or timezone.localdate()
+            start_date = options["start_date"] or end_date - timedelta(days=max(options["days"], 1) - 1)
+            if start_date > end_date:
+                raise CommandError("--start-date must be on or before --end-date")
+
+            started = time.perf_counter()
+            days = refresh_daily_stats(start_date, end_date)
+            self.stdout.write(f"Refreshed {days} day(s) of dashboard stats in {time.perf_counter() - started:.2f}s")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -33,22 +33,88 @@ class Payment(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="Pending")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="payment_created_id_idx"),  # Keyset pagination
+        ]
+
     def __str__(self):
         return f"Payment {self.id} - {self.member.username} ({self.status})"
 
 class MpesaTransaction(models.Model):
-    merchant_request_id = models.CharField(max_length=100)
-    checkout_request_id = models.CharField(max_length=100)
+    # Queued (async push not sent yet) -> Pushing -> Pending (awaiting callback) -> Completed / Failed
+    # Safaricom identifiers are unique (NULL until known), callbacks and reconciliation look them up directly
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name="mpesa_transactions")
+    merchant_request_id = models.CharField(max_length=100, unique=True, null=True, blank=True)  # Set once Safaricom accepts the push
+    checkout_request_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     status = models.CharField(max_length=20, default="Pending")
     result_code = models.IntegerField(null=True)
     result_desc = models.TextField(null=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    reference = models.CharField(max_length=50, blank=True)
+    reference = models.CharField(max_length=50, blank=True, db_index=True)
     description = models.TextField(null=True, blank=True)
-    mpesa_receipt_number = models.CharField(max_length=50, null=True, blank=True)
+    mpesa_receipt_number = models.CharField(max_length=50, unique=True, null=True, blank=True)
     transaction_date = models.BigIntegerField(null=True, blank=True)
     phone_number = PhoneNumberField(region= "KE", blank=True, null=True) # Default to region Kenya
     timestamp = models.TimeField(auto_now=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # When a worker took the row (Queued -> Pushing)
+
+    class Meta:
+        indexes = [
+            # Workers poll Queued rows and reclaim Pushing rows whose claim expired
+            models.Index(fields=["status", "claimed_at"], name="mpesa_txn_status_claim_idx"),
+        ]
 
     def __str__(self):
         return f"Transaction {self.mpesa_receipt_number or 'Failed'} - {self.result_desc}"
+
+
+class MpesaCallback(models.Model):
+    """
+    Raw STK callbacks as received from Safaricom, applied later by the callback workers.
+    - One row per CheckoutRequestID, so Safaricom's retries are absorbed by the unique constraint.
+    - Received -> Processed, or Failed (with `error`) when it could not be applied.
+    """
+
+    STATUS_CHOICES = [
+        ("Received", "Received"),
+        ("Processed", "Processed"),
+        ("Failed", "Failed"),
+    ]
+
+    checkout_request_id = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="Received")
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="mpesa_callback_status_idx"),  # Worker polling
+        ]
+
+    def __str__(self):
+        return f"Callback {self.checkout_request_id} ({self.status})"
+
+
+class DailyStats(models.Model):
+    """
+    One row per day for the admin dashboard, materialized from Payment, Subscription, CustomUser and the attendance
+    rollup by api/utils/dashboard_stats.py (manage.py refresh_dashboard_stats).
+    - Revenue breakdowns are {payment method or plan name: amount as a string}, so amounts stay exact in JSON.
+    """
+
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payments = models.PositiveIntegerField(default=0)
+    revenue_by_method = models.JSONField(default=dict)
+    revenue_by_plan = models.JSONField(default=dict)
+    new_members = models.PositiveIntegerField(default=0)
+    active_members = models.PositiveIntegerField(default=0)  # Members with a subscription covering the day
+    check_ins = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.date}"
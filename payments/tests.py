@@ -1,3 +1,625 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from asgiref.sync import iscoroutinefunction
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.utils import exports, mpesa_dispatcher, renderers
+from api.utils.attendance_rollups import apply_attendance
+from api.utils.dashboard_stats import refresh_daily_stats
+from api.utils.exports import EXPORTS
+from api.utils.middlewares import RequestTimerMiddleware
+from api.utils.mpesa_callbacks import apply_stk_callback, run_stk_callback
+from api.utils.mpesa_client import MpesaClient
+from api.utils.mpesa_reconciliation import Reconciler, read_statement
+from api.utils.renewals import renew_subscription
+from api.utils.testing import QueryCountAssertionsMixin
+from api.views.payments_views import FetchPaymentRecords
+from payments.models import MpesaCallback, MpesaTransaction, Payment
+from subscriptions.models import Plan, Subscription
+from users.models import CustomUser
 
-# Create your tests here.
+
+class PaymentListQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.row_count = 0
+
+    def create_payments(self, count):
+        for _ in range(count):
+            self.row_count += 1
+            Payment.objects.create(
+                member=self.admin, amount=1000, payment_method="Cash", reference=f"CSH{self.row_count}",
+                plan=self.plan, recorded_by=self.admin,
+            )
+
+    def create_transactions(self, count):
+        for _ in range(count):
+            self.row_count += 1
+            MpesaTransaction.objects.create(
+                merchant_request_id=f"M{self.row_count}", checkout_request_id=f"C{self.row_count}",
+                reference=f"MPS{self.row_count}", amount=1000,
+            )
+
+    def test_payment_records_query_count_is_constant(self):
+        self.assertQueryCountConstant(self.client, "/api/payments/fetch-records/", self.create_payments)
+
+    def test_mpesa_transactions_query_count_is_constant(self):
+        self.assertQueryCountConstant(self.client, "/api/mpesa/transactions/", self.create_transactions)
+
+
+class KeysetPaginationTests(QueryCountAssertionsMixin, TestCase):
+    URL = "/api/payments/fetch-records/"
+
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        Payment.objects.bulk_create(
+            Payment(member=self.admin, amount=1000, payment_method="Cash", reference=f"CSH{i}", plan=plan, recorded_by=self.admin)
+            for i in range(7)
+        )
+        Payment.objects.update(created_at=timezone.now())  # Every row ties on the ordering field, only the id breaks it
+        self.newest_first = list(Payment.objects.order_by("-id").values_list("id", flat=True))
+
+    def test_next_links_walk_every_row_once_in_descending_order(self):
+        ids, url, pages = [], f"{self.URL}?page_size=3", 0
+        while url:
+            data = self.client.get(url).json()["data"]
+            ids += [payment["id"] for payment in data["results"]]
+            url, pages = data["next"], pages + 1
+
+        self.assertEqual(ids, self.newest_first)
+        self.assertEqual(pages, 3)
+
+    def test_rejects_tampered_cursor(self):
+        for cursor in ["not-a-cursor", "WzFd"]:  # Garbage, then a valid encoding of [1] with one key too few
+            response = self.client.get(f"{self.URL}?cursor={cursor}")
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_lists_whole_without_pagination_params(self):
+        data = self.client.get(self.URL).json()["data"]
+
+        self.assertEqual(len(data), 7)
+        self.assertEqual({payment["id"] for payment in data}, set(self.newest_first))
+
+
+class RequestProfilingTests(QueryCountAssertionsMixin, TestCase):
+    URL = "/api/payments/fetch-records/"
+
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+
+    def test_server_timing_header(self):
+        header = self.client.get(self.URL)["Server-Timing"]
+
+        metrics = [metric.split(";")[0] for metric in header.split(", ")]
+        self.assertEqual(metrics, ["db", "app", "render", "total"])
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_profile_in_envelope_only_when_enabled(self):
+        self.assertNotIn("profile", self.client.get(self.URL).json())
+
+        with override_settings(REQUEST_PROFILING={"ENVELOPE": True, "BUDGETS": {}}):
+            response = self.client.get(self.URL)
+
+        profile = response.json()["profile"]
+        self.assertEqual(set(profile), {"queries", "sql", "app"})
+        self.assertIn(f'desc="{profile["queries"]} queries"', response["Server-Timing"])
+
+    def test_login_is_measured_against_its_own_budget(self):
+        with self.assertNoLogs("gms.performance", level="WARNING"):
+            response = APIClient().post(
+                "/api/auth/login/", {"username_or_email": self.admin.username, "password": "tester-password"}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertRegex(response["Server-Timing"], r"app;dur=[\d.]+")  # Password hashing is view time, not rendering
+
+    def test_logs_routes_over_budget(self):
+        with override_settings(REQUEST_PROFILING={"BUDGETS": {"payment_records": {"queries": 0}, "default": {"queries": 100}}}):
+            with self.assertLogs("gms.performance", level="WARNING") as logs:
+                self.client.get(self.URL)
+            with self.assertNoLogs("gms.performance", level="WARNING"):
+                self.client.get("/api/mpesa/transactions/")
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("GET /api/payments/fetch-records/ (payment_records)", logs.output[0])
+
+
+class StreamingListTests(QueryCountAssertionsMixin, TestCase):
+    URL = "/api/payments/fetch-records/"
+
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        for i in range(5):
+            Payment.objects.create(
+                member=self.admin, amount=1000, payment_method="Cash" if i % 2 else "M-Pesa", reference=f"REF{i}",
+                plan=plan, recorded_by=self.admin,
+            )
+
+    def stream(self, query=""):
+        with mock.patch.object(FetchPaymentRecords, "stream_chunk_size", 2):  # Several keyset chunks
+            response = self.client.get(f"{self.URL}?stream=true{query}")
+            body = b"".join(response.streaming_content)
+        return json.loads(body)
+
+    def test_streams_the_list_envelope_in_order(self):
+        with self.assertLogs("gms.performance", level="INFO") as logs:
+            streamed = self.stream()
+
+        self.assertEqual(streamed["status"], "Success")
+        self.assertEqual(streamed["path"], self.URL)
+        self.assertEqual(streamed["data"], self.client.get(self.URL).json()["data"])
+        self.assertIn("5 rows, 3 queries", logs.output[-1])
+
+    def test_streams_filtered_rows(self):
+        data = self.stream("&payment_method=Cash")["data"]
+
+        self.assertEqual([payment["reference"] for payment in data], ["REF3", "REF1"])
+
+    def test_streams_empty_result_like_the_renderer(self):
+        self.assertEqual(self.stream("&reference=missing")["data"], {})
+
+
+@skipUnless(renderers.orjson, "orjson is not installed")
+class RendererParityTests(TestCase):
+    def render(self, engine, data):
+        with override_settings(JSON_RENDERER_ENGINE=engine):
+            return renderers.CustomJSONRenderer().encode(data)
+
+    def test_engines_render_decimals_identically(self):
+        data = {"amounts": [Decimal("1000.50"), Decimal("1E+16"), Decimal("1E-7"), Decimal("123456789012345678")], "count": 3}
+
+        self.assertEqual(self.render("orjson", data), self.render("json", data))
+        self.assertIn(b"1e+16", self.render("orjson", data))
+
+    def test_engines_reject_non_finite_decimals(self):
+        for value in ["NaN", "Infinity", "-Infinity"]:
+            for engine in ["json", "orjson"]:
+                with self.assertRaises(ValueError, msg=(engine, value)):
+                    self.render(engine, {"amount": Decimal(value)})
+
+
+class MpesaCallbackTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        payment = Payment.objects.create(
+            member=self.admin, amount=1000, payment_method="M-Pesa", reference="MPS1", plan=self.plan, recorded_by=self.admin,
+        )
+        MpesaTransaction.objects.create(
+            payment=payment, merchant_request_id="M1", checkout_request_id="ws_CO_1", reference="MPS1", amount=1000,
+        )
+
+    def post_callback(self, result_code=0):
+        payload = {
+            "Body": {
+                "stkCallback": {
+                    "MerchantRequestID": "M1",
+                    "CheckoutRequestID": "ws_CO_1",
+                    "ResultCode": result_code,
+                    "ResultDesc": "Done",
+                    "CallbackMetadata": {"Item": [{"Name": "MpesaReceiptNumber", "Value": "RCPT1"}]},
+                }
+            }
+        }
+        # Apply inline instead of on the worker pool
+        with mock.patch("api.utils.mpesa_callbacks.dispatch_stk_callback", side_effect=apply_stk_callback):
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post("/api/mpesa/callback/", payload, format="json")
+
+    def test_retried_callback_creates_one_subscription(self):
+        for _ in range(3):
+            response = self.post_callback()
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(MpesaCallback.objects.get().status, "Processed")
+        self.assertEqual(MpesaTransaction.objects.get().status, "Completed")
+        self.assertEqual(Payment.objects.get().status, "Completed")
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_callback_is_applied_once(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post("/api/mpesa/callback/", {"Body": {"stkCallback": {"CheckoutRequestID": "ws_CO_1", "ResultCode": 0}}}, format="json")
+        callback = MpesaCallback.objects.get()
+
+        self.assertEqual(apply_stk_callback(callback.id).status, "Processed")
+        self.assertIsNone(apply_stk_callback(callback.id))
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_failed_callback_deletes_pending_payment(self):
+        self.post_callback(result_code=1032)
+
+        self.assertEqual(MpesaTransaction.objects.get().status, "Failed")
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(Subscription.objects.count(), 0)
+
+    def test_callback_before_checkout_request_id_is_retried(self):
+        MpesaTransaction.objects.update(checkout_request_id=None)
+        with mock.patch("api.utils.mpesa_callbacks.schedule_callback_retry") as retry:
+            self.post_callback()
+        callback = MpesaCallback.objects.get()
+
+        self.assertEqual((callback.status, callback.attempts), ("Received", 1))
+        retry.assert_called_once_with(callback.id)
+
+        MpesaTransaction.objects.update(checkout_request_id="ws_CO_1")
+        self.assertEqual(apply_stk_callback(callback.id).status, "Processed")
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    @override_settings(MPESA_CALLBACK_MAX_ATTEMPTS=2)
+    def test_unknown_checkout_request_id_fails_after_max_attempts(self):
+        MpesaTransaction.objects.update(checkout_request_id=None)
+        with mock.patch("api.utils.mpesa_callbacks.schedule_callback_retry"):
+            self.post_callback()
+            callback = MpesaCallback.objects.get()
+            with self.assertLogs("gms.mpesa", "WARNING"):
+                self.assertEqual(apply_stk_callback(callback.id).status, "Failed")
+
+    def test_background_failure_is_logged(self):
+        with mock.patch("api.utils.mpesa_callbacks.apply_stk_callback", side_effect=RuntimeError("boom")):
+            with self.assertLogs("gms.mpesa", "ERROR") as logs:
+                run_stk_callback(1)
+
+        self.assertIn("M-Pesa callback 1 failed", logs.output[0])
+        self.assertIn("RuntimeError: boom", logs.output[0])
+
+    def test_callback_without_checkout_request_id_is_rejected(self):
+        response = self.client.post("/api/mpesa/callback/", {"Body": {}}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MpesaCallback.objects.exists())
+
+
+class MpesaReconciliationTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        for i in range(1, 4):
+            payment = Payment.objects.create(
+                member=self.admin, amount=1000, payment_method="M-Pesa", reference=f"MPS{i}", plan=self.plan, recorded_by=self.admin,
+            )
+            MpesaTransaction.objects.create(payment=payment, checkout_request_id=f"ws_CO_{i}", reference=f"MPS{i}", amount=1000)
+
+    def test_statement_settles_pending_payments(self):
+        statement = io.StringIO(
+            "Receipt No.,Completion Time,Details,Transaction Status,Paid In,A/C No.\n"
+            "RCPT1,2025-01-01 10:00:00,Pay Bill,Completed,\"1,000.00\",MPS1\n"
+            "RCPT2,2025-01-01 10:01:00,Pay Bill,Cancelled,,MPS2\n"
+            "RCPT9,2025-01-01 10:02:00,Pay Bill,Completed,500.00,UNKNOWN\n"
+        )
+
+        with self.assertNumQueries(19):  # Index read + one chunk of locked reads and set-based writes, whatever the row count
+            counts = Reconciler().run(read_statement(statement))
+
+        self.assertEqual((counts["completed"], counts["failed"], counts["unmatched"]), (1, 1, 1))
+        self.assertEqual(MpesaTransaction.objects.get(reference="MPS1").mpesa_receipt_number, "RCPT1")
+        self.assertEqual(Payment.objects.get(reference="MPS1").status, "Completed")
+        self.assertEqual(MpesaTransaction.objects.get(reference="MPS2").status, "Failed")
+        self.assertFalse(Payment.objects.filter(reference="MPS2").exists())
+        self.assertEqual(MpesaTransaction.objects.get(reference="MPS3").status, "Pending")
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_settled_transactions_are_not_settled_again(self):
+        statement = "Receipt No.,Transaction Status,Paid In,A/C No.\nRCPT1,Completed,1000,MPS1\n"
+        Reconciler().run(read_statement(io.StringIO(statement)))
+        counts = Reconciler().run(read_statement(io.StringIO(statement)))
+
+        self.assertEqual(counts["unmatched"], 1)
+        self.assertEqual(Subscription.objects.count(), 1)
+
+
+class AsyncMpesaViewTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, client = self.login_staff()
+        self.async_client.cookies = client.cookies
+
+    async def test_stk_query_is_profiled_without_a_sync_hop(self):
+        async def view(request):
+            return None
+
+        self.assertTrue(iscoroutinefunction(RequestTimerMiddleware(view)))
+
+        mpesa = mock.Mock(stk_query=mock.AsyncMock(return_value={"ResultCode": "0", "ResultDesc": "Processed"}))
+        with mock.patch("api.views.async_payments_views.get_async_mpesa_client", return_value=mpesa):
+            response = await self.async_client.get("/api/payments/async/stk-query/ws_CO_1/")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["data"]["ResultDesc"], "Processed")
+        self.assertIn("total;dur=", response["Server-Timing"])
+        mpesa.stk_query.assert_awaited_once_with("ws_CO_1")
+
+    async def test_stk_push_queries_are_profiled(self):
+        plan = await Plan.objects.acreate(name="monthly", price=1000, duration_days=30)
+        mpesa = mock.Mock(stk_push=mock.AsyncMock(return_value={"ResponseCode": "0", "MerchantRequestID": "M-1", "CheckoutRequestID": "ws_CO_1"}))
+        with mock.patch("api.views.async_payments_views.get_async_mpesa_client", return_value=mpesa):
+            response = await self.async_client.post(
+                "/api/payments/async/initiate-payment/",
+                {"member": self.admin.id, "plan": plan.id, "payment_method": "M-Pesa", "phone_number": "+254798114462", "description": "Monthly plan"},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        queries = int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+        self.assertGreater(queries, 0)  # ORM work done in sync_to_async threads is counted
+        self.assertTrue(await MpesaTransaction.objects.filter(checkout_request_id="ws_CO_1").aexists())
+
+
+class MpesaClientTests(TestCase):
+    def setUp(self):
+        self.mpesa = MpesaClient()
+        self.mpesa.session = mock.Mock()
+        self.mpesa.session.get.return_value = mock.Mock(status_code=200, json=lambda: {"access_token": "T1", "expires_in": "3599"})
+
+    def test_token_is_cached_until_the_expiry_margin(self):
+        with mock.patch("api.utils.mpesa_client.time.monotonic", return_value=1000):
+            self.assertEqual(self.mpesa.get_access_token(), "T1")
+        with mock.patch("api.utils.mpesa_client.time.monotonic", return_value=1000 + 3599 - MpesaClient.TOKEN_EXPIRY_MARGIN - 1):
+            self.mpesa.get_access_token()
+        self.assertEqual(self.mpesa.session.get.call_count, 1)
+
+        with mock.patch("api.utils.mpesa_client.time.monotonic", return_value=1000 + 3599 - MpesaClient.TOKEN_EXPIRY_MARGIN):
+            self.mpesa.get_access_token()
+        self.assertEqual(self.mpesa.session.get.call_count, 2)
+
+    def test_concurrent_callers_share_one_refresh(self):
+        release, response = threading.Event(), self.mpesa.session.get.return_value
+
+        def slow_fetch(*args, **kwargs):
+            release.wait(5)
+            return response
+
+        self.mpesa.session.get.side_effect = slow_fetch
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = [pool.submit(self.mpesa.get_access_token) for _ in range(8)]
+            time.sleep(0.05)  # Let every caller reach the lock
+            release.set()
+
+        self.assertEqual([token.result() for token in tokens], ["T1"] * 8)
+        self.assertEqual(self.mpesa.session.get.call_count, 1)
+
+    def test_unauthorized_push_clears_the_token(self):
+        self.mpesa.session.post.return_value = mock.Mock(status_code=401, text="Invalid Access Token")
+
+        self.assertIn("error", self.mpesa.stk_push("254798114462", 1000, "MPS1", "Monthly plan"))
+        self.mpesa.get_access_token()
+        self.assertEqual(self.mpesa.session.get.call_count, 2)
+
+    def test_only_idempotent_requests_are_retried_after_reaching_daraja(self):
+        session = MpesaClient().session
+        retry = session.get_adapter("https://sandbox.safaricom.co.ke").max_retries
+
+        self.assertIs(session.get_adapter("http://127.0.0.1:8900"), session.get_adapter("https://sandbox.safaricom.co.ke"))
+        self.assertTrue(retry.is_retry("GET", 503))
+        self.assertFalse(retry.is_retry("POST", 503))  # An STK push is never sent twice
+        self.assertEqual((retry.total, retry.connect), (3, 3))  # Connection errors are retried for every method
+
+
+class QueuedSTKPushTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.mpesa = mock.Mock()
+        self.mpesa.stk_push.return_value = {"ResponseCode": "0", "MerchantRequestID": "M-1", "CheckoutRequestID": "ws_CO_1"}
+
+    def pushing(self):
+        return mock.patch.object(mpesa_dispatcher, "get_mpesa_client", return_value=self.mpesa)
+
+    def queue_push(self):
+        # Push inline once committed instead of on the worker pool
+        with self.pushing(), mock.patch("api.views.payments_views.dispatch_stk_push", side_effect=mpesa_dispatcher.push_queued_transaction), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/payments/initiate-payment/?async=true",
+                {"member": self.admin.id, "plan": self.plan.id, "payment_method": "M-Pesa", "phone_number": "+254798114462", "description": "Monthly plan"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()["data"]["status"], "Queued")
+        return self.client.get(response.json()["data"]["status_url"]).json()["data"]
+
+    def test_queued_push_reaches_pending(self):
+        status = self.queue_push()
+
+        self.assertEqual(status["transaction_status"], "Pending")
+        self.assertEqual(status["transaction_details"]["checkout_request_id"], "ws_CO_1")
+        self.assertEqual(self.mpesa.stk_push.call_args.args[:2], ("254798114462", 1000))
+
+    def test_rejected_push_fails_the_payment(self):
+        self.mpesa.stk_push.return_value = {"error": "Invalid phone number"}
+        status = self.queue_push()
+
+        self.assertEqual((status["transaction_status"], status["payment_status"]), ("Failed", "Failed"))
+
+    def test_stale_claims_are_requeued(self):
+        stale = MpesaTransaction.objects.create(
+            reference="MPS-STALE", amount=1000, phone_number="+254798114462", status="Pushing",
+            claimed_at=timezone.now() - timedelta(minutes=10),
+        )
+        live = MpesaTransaction.objects.create(
+            reference="MPS-LIVE", amount=1000, phone_number="+254798114462", status="Pushing", claimed_at=timezone.now(),
+        )
+
+        self.assertEqual(mpesa_dispatcher.requeue_stale_pushes(timeout=300), 1)
+        with self.pushing(), mock.patch.object(mpesa_dispatcher, "get_rate_limiter", return_value=mpesa_dispatcher.RateLimiter(0)):
+            for transaction_id in (stale.id, live.id):  # What the drain command's workers do with each queued row
+                mpesa_dispatcher.push_queued_transaction(transaction_id)
+
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual((stale.status, stale.checkout_request_id), ("Pending", "ws_CO_1"))
+        self.assertEqual(live.status, "Pushing")
+        self.assertEqual(self.mpesa.stk_push.call_count, 1)
+
+
+class BatchSTKPushTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.mpesa = mock.Mock()
+        self.mpesa.stk_push.side_effect = lambda phone, amount, reference, description: {
+            "ResponseCode": "0", "MerchantRequestID": f"M-{reference}", "CheckoutRequestID": f"ws_CO_{reference}",
+        }
+
+    def create_members(self, count):
+        return [
+            CustomUser.objects.create_user(
+                username=f"member{i}", email=f"member{i}@example.com", phone_number=f"+2547000000{i:02d}", is_active=True,
+            )
+            for i in range(count)
+        ]
+
+    def post_batch(self, items):
+        # Push inline once committed instead of on the batch pool, without the rate limit
+        with mock.patch.object(mpesa_dispatcher, "get_mpesa_client", return_value=self.mpesa), \
+                mock.patch.object(mpesa_dispatcher, "get_rate_limiter", return_value=mpesa_dispatcher.RateLimiter(0)), \
+                mock.patch("api.views.payments_views.dispatch_batch_push", side_effect=lambda ids: [mpesa_dispatcher.push_queued_transaction(i) for i in ids]), \
+                self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/payments/initiate-batch-payment/", {"items": items}, format="json")
+
+    def test_batch_returns_a_result_per_item(self):
+        members = self.create_members(2)
+        response = self.post_batch([
+            {"member": members[0].id, "plan": self.plan.id},
+            {"member": members[1].id, "plan": self.plan.id, "phone_number": "+254711111111"},
+            {"member": 999999, "plan": self.plan.id},
+            {"member": members[0].id, "plan": self.plan.id},
+            {"plan": self.plan.id},
+        ])
+
+        self.assertEqual(response.status_code, 202)
+        results = response.json()["data"]["results"]
+        self.assertEqual([result["status"] for result in results], ["Queued", "Queued", "Invalid", "Invalid", "Invalid"])
+        status = self.client.get(results[0]["status_url"]).json()["data"]
+        self.assertEqual(status["transaction_status"], "Pending")
+        self.assertTrue(status["transaction_details"]["checkout_request_id"].startswith("ws_CO_MPS"))
+        self.assertEqual(self.mpesa.stk_push.call_args_list[1].args[0], "254711111111")
+        self.assertEqual(Payment.objects.filter(payment_method="M-Pesa").count(), 2)
+        self.assertEqual(MpesaTransaction.objects.filter(status="Pending", payment__isnull=False).count(), 2)
+
+    def test_batch_validation_query_count_is_constant(self):
+        members = self.create_members(20)
+        counts = []
+        for size in (1, 2, 20):  # The first request also loads the staff user into the auth cache
+            Payment.objects.all().delete()
+            MpesaTransaction.objects.all().delete()
+            with mock.patch("api.views.payments_views.dispatch_batch_push"):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.post(
+                        "/api/payments/initiate-batch-payment/",
+                        {"items": [{"member": member.id, "plan": self.plan.id} for member in members[:size]]},
+                        format="json",
+                    )
+            self.assertEqual(response.status_code, 202)
+            counts.append(len(queries))
+        self.assertEqual(counts[1], counts[2])
+
+
+    @override_settings(MPESA_BATCH_PUSH_WORKERS=2, MPESA_PUSH_WORKERS=2)
+    def test_batch_waiting_on_the_rate_limit_does_not_starve_the_main_pool(self):
+        limiter = mpesa_dispatcher.RateLimiter(20)  # One push every 50ms: 100 batch pushes take 5s
+        with mock.patch.dict(mpesa_dispatcher._executors, clear=True):
+            batch = mpesa_dispatcher.get_batch_executor()
+            try:
+                for _ in range(100):
+                    batch.submit(limiter.wait)
+                time.sleep(0.1)  # The batch workers are now sleeping in the limiter
+
+                started = time.monotonic()
+                mpesa_dispatcher.get_executor().submit(lambda: None).result(timeout=1)  # e.g. a callback
+                callback_wait = time.monotonic() - started
+                mpesa_dispatcher.get_executor().submit(limiter.wait).result(timeout=1)  # A single ?async=true push
+                push_wait = time.monotonic() - started
+            finally:
+                batch.shutdown(cancel_futures=True)
+                mpesa_dispatcher.get_executor().shutdown()
+
+        self.assertLess(callback_wait, 0.05)
+        self.assertLess(push_wait, 0.5)  # Behind the batch workers' own slots only, not the rest of the batch
+
+
+class DashboardTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.member = CustomUser.objects.create_user(username="member", email="member@example.com")
+        self.today = timezone.localdate()
+        for reference, method, status in [("CSH1", "Cash", "Completed"), ("MPS1", "M-Pesa", "Completed"), ("MPS2", "M-Pesa", "Pending")]:
+            Payment.objects.create(
+                member=self.member, amount=1000, payment_method=method, reference=reference, plan=self.plan,
+                recorded_by=self.admin, status=status,
+            )
+        renew_subscription(self.member.id, self.plan, "CSH1")
+        apply_attendance([(self.member.id, self.today)])
+
+    def test_dashboard_reads_materialized_stats(self):
+        refresh_daily_stats(self.today - timedelta(days=1), self.today)
+        refresh_daily_stats(self.today, self.today)  # Upserts in place
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/dashboard/")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()["data"]
+        self.assertEqual(len(data["days"]), 2)
+        self.assertEqual(data["totals"]["revenue"], 2000)
+        self.assertEqual(data["totals"]["revenue_by_method"], {"Cash": 1000, "M-Pesa": 1000})
+        self.assertEqual(data["totals"]["revenue_by_plan"], {"monthly": 2000})
+        self.assertEqual(data["totals"]["new_members"], 1)
+        self.assertEqual(data["totals"]["check_ins"], 1)
+        self.assertEqual(data["active_members"], 1)
+
+    def test_dashboard_is_admin_only(self):
+        _, trainer_client = self.login_staff(role="Trainer")
+
+        self.assertEqual(trainer_client.get("/api/dashboard/").status_code, 403)
+
+
+class ExportTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        for number in range(5):
+            Payment.objects.create(
+                member=self.admin, amount=1000 + number, payment_method="Cash", reference=f"CSH{number}",
+                plan=self.plan, recorded_by=self.admin, status="Completed",
+            )
+
+    def read_csv(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_csv_streams_every_row_in_keyset_chunks(self):
+        with mock.patch.object(EXPORTS["payments"], "chunk_size", 2):
+            response = self.client.get("/api/exports/payments/csv/")
+            with self.assertNumQueries(3):  # 2 + 2 + 1 rows, one keyset query per chunk
+                rows = self.read_csv(response)
+
+        self.assertEqual(rows[0], EXPORTS["payments"].headers)
+        self.assertEqual([row[6] for row in rows[1:]], [f"CSH{number}" for number in range(5)])
+        self.assertIn('filename="payments-', response["Content-Disposition"])
+
+    def test_date_range_and_unknown_exports(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+
+        self.assertEqual(len(self.read_csv(self.client.get("/api/exports/payments/csv/", {"start_date": tomorrow}))), 1)
+        self.assertEqual(self.client.get("/api/exports/refunds/csv/").status_code, 404)
+        self.assertEqual(self.client.get("/api/exports/payments/pdf/").status_code, 404)
+
+    def test_xlsx_needs_openpyxl(self):
+        response = self.client.get("/api/exports/payments/xlsx/")
+
+        self.assertEqual(response.status_code, 501 if exports.Workbook is None else 200)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Plan, Subscription
+from api.utils.exports import export_action
+from .models import ArchivedSubscription, Plan, Subscription
 
 
 @admin.register(Plan)
@@ -13,3 +14,16 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ("plan", "status", "start_date", "end_date")
     list_filter = ("status", "plan")
     search_fields = ("plan__name",)
+    actions = [export_action("subscriptions"), export_action("subscriptions", "xlsx")]
+
+
+@admin.register(ArchivedSubscription)
+class ArchivedSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("subscription_id", "member_id", "status", "end_date", "archived_at")
+    search_fields = ("subscription_id", "payment_reference")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,28 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from subscriptions.models import Subscription
+
+
+class Command(BaseCommand):
+    help = "Move soft-deleted subscriptions older than --older-than days to the archive table (or drop them with --purge)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=90, help="Only rows soft deleted more than this many days ago")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows moved per transaction")
+        parser.add_argument("--purge", action="store_true", help="Delete the rows instead of archiving them")
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping every --interval seconds")
+        parser.add_argument("--interval", type=float, default=86400.0, help="Seconds between sweeps with --loop")
+
+    def handle(self, *args, **options):
+        action = "Purged" if options["purge"] else "Archived"
+        while True:
+            started = time.perf_counter()
+            before = timezone.now() - timedelta(days=options["older_than"])
+            moved = Subscription.all_with_deleted.archive_deleted(before, batch_size=options["batch_size"], purge=options["purge"])
+            self.stdout.write(f"{action} {moved} deleted subscription(s) in {time.perf_counter() - started:.2f}s")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
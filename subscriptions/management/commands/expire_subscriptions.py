@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from subscriptions.models import Subscription
+
+
+class Command(BaseCommand):
+    help = "Mark Active subscriptions whose end_date has passed as Expired (run daily from cron, or with --loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping every --interval seconds")
+        parser.add_argument("--interval", type=float, default=3600.0, help="Seconds between sweeps with --loop")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Subscriptions expired per UPDATE")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            expired = Subscription.objects.expire_due(batch_size=options["batch_size"])
+            self.stdout.write(f"Expired {expired} subscription(s) in {time.perf_counter() - started:.2f}s")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,12 @@
+import time
+from django.core.management.base import BaseCommand
+from api.utils.renewals import refresh_member_coverage
+
+
+class Command(BaseCommand):
+    help = "Recompute every member's current_end_date from their active subscriptions (backfill, or repair after manual edits)."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = refresh_member_coverage()
+        self.stdout.write(f"Synced current_end_date for {updated} member(s) in {time.perf_counter() - started:.2f}s")
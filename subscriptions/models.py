@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 from users.models import CustomUser
 
 class Plan(models.Model):
@@ -17,6 +19,74 @@ class Plan(models.Model):
         return self.get_name_display()
 
 
+class SubscriptionQuerySet(models.QuerySet):
+    """
+    Date-aware status lookups. `status` is only moved to "Expired" by the sweeper (manage.py expire_subscriptions),
+    so use these instead of trusting `status` or comparing dates in Python.
+    """
+
+    def with_effective_status(self, today=None):
+        """Annotate `effective_status`: "Expired" for Active rows whose end_date has passed, otherwise `status`."""
+        today = today or timezone.localdate()
+        return self.annotate(
+            effective_status=Case(
+                When(status="Active", end_date__lt=today, then=Value("Expired")),
+                default=F("status"),
+                output_field=models.CharField(),
+            )
+        )
+
+    def effective_active(self, today=None):
+        """Subscriptions that are Active and not past their end_date (served by the (status, end_date) index)."""
+        return self.filter(status="Active", end_date__gte=today or timezone.localdate())
+
+    def expire_due(self, today=None, batch_size=5000):
+        """
+        Move Active subscriptions past their end_date to "Expired" with set-based UPDATEs.
+        - Works in batches of `batch_size` ids so each UPDATE holds its locks briefly. Returns the number expired.
+        """
+        today = today or timezone.localdate()
+        due = self.filter(status="Active", end_date__lt=today).order_by("end_date")
+        expired = 0
+        while ids := list(due.values_list("id", flat=True)[:batch_size]):
+            expired += self.filter(id__in=ids, status="Active").update(status="Expired", updated_at=timezone.now())
+        return expired
+
+    def archive_deleted(self, before, batch_size=5000, purge=False):
+        """
+        Move soft-deleted subscriptions last updated before `before` into ArchivedSubscription, `batch_size` rows per transaction.
+        - Each batch is one INSERT ... SELECT and one DELETE, so rows never pass through Python.
+        - With `purge=True` the rows are deleted without being archived. Returns the number of rows moved.
+        """
+        quote_name = connection.ops.quote_name
+        table = quote_name(Subscription._meta.db_table)
+        columns = ", ".join(quote_name(field.column) for field in Subscription._meta.concrete_fields)
+        due = self.model.all_with_deleted.filter(is_deleted=True, updated_at__lt=before).order_by("updated_at")
+        moved = 0
+        while True:
+            with transaction.atomic():
+                ids = list(due.select_for_update().values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    return moved
+                where = f"WHERE {quote_name('id')} IN ({', '.join(['%s'] * len(ids))})"
+                with connection.cursor() as cursor:
+                    if not purge:
+                        cursor.execute(
+                            f"INSERT INTO {quote_name(ArchivedSubscription._meta.db_table)} ({columns}, {quote_name('archived_at')}) "
+                            f"SELECT {columns}, %s FROM {table} {where}",
+                            [ArchivedSubscription._meta.get_field("archived_at").get_db_prep_save(timezone.now(), connection), *ids],
+                        )
+                    cursor.execute(f"DELETE FROM {table} {where}", ids)  # Raw, Subscription.delete() only soft deletes
+                moved += len(ids)
+
+
+class SubscriptionManager(models.Manager.from_queryset(SubscriptionQuerySet)):
+    """Default manager, hides soft-deleted subscriptions. Use `Subscription.all_with_deleted` to include them."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Subscription(models.Model): 
     STATUS_CHOICES = [
         ("Active", "Active"),
@@ -35,9 +105,40 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SubscriptionManager()
+    all_with_deleted = SubscriptionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="subscription_created_id_idx"),  # Keyset pagination
+            models.Index(fields=["status", "end_date"], name="subscription_status_end_idx"),  # Expiry sweeps and active lookups
+            models.Index(fields=["member", "is_deleted", "end_date"], name="subscription_member_live_idx"),  # A member's live coverage
+            models.Index(fields=["is_deleted", "updated_at"], name="subscription_deleted_idx"),  # Archive sweeps
+        ]
+
     def delete(self, *args, **kwargs):
         self.is_deleted = True
         self.save()
 
     def __str__(self):
         return f"{self.plan.name} ({self.status})"
+
+
+class ArchivedSubscription(models.Model):
+    """Soft-deleted subscriptions moved out of the hot table by `manage.py archive_subscriptions`. Same columns, plus archived_at."""
+
+    subscription_id = models.CharField(max_length=20, null=True)
+    plan_id = models.BigIntegerField()  # Same type as the BigAutoField keys they copy
+    member_id = models.BigIntegerField(db_index=True)
+    amount_paid = models.DecimalField(decimal_places=2, max_digits=10)
+    payment_reference = models.CharField(max_length=16, null=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=Subscription.STATUS_CHOICES)
+    is_deleted = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.subscription_id} (archived {self.archived_at:%Y-%m-%d})"
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from subscriptions.models import Subscription
+from api.utils.renewals import extend_member_coverage, refresh_member_coverage
+
+
+# Keeps the member's current_end_date and the door access-check cache in step with subscriptions saved outside
+# renew_subscriptions (the admin, scripts); renewals bulk_create their rows and update both themselves.
+# Runs after commit so a rolled back subscription never grants access.
+@receiver(post_save, sender=Subscription)
+def update_member_coverage(sender, instance, created, **kwargs):
+    if created and instance.status == "Active" and not instance.is_deleted:
+        transaction.on_commit(lambda: extend_member_coverage(instance.member_id, instance.end_date))
+    else:
+        transaction.on_commit(lambda: refresh_member_coverage(instance.member_id))  # Edited, cancelled or soft deleted
+
+
+@receiver(post_delete, sender=Subscription)
+def drop_member_coverage(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_member_coverage(instance.member_id))
@@ -1,3 +1,196 @@
+from datetime import date, timedelta
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from api.utils.renewals import renew_subscription, renew_subscriptions
+from api.utils.testing import QueryCountAssertionsMixin
+from subscriptions.models import ArchivedSubscription, Plan, Subscription
+from users.models import CustomUser
 
-# Create your tests here.
+
+class SubscriptionListQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff(is_staff=True)
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+
+    def create_subscriptions(self, count):
+        for _ in range(count):
+            Subscription.objects.create(
+                plan=self.plan, member=self.admin, amount_paid=1000,
+                start_date=date.today(), end_date=date.today() + timedelta(days=30),
+            )
+
+    def test_subscription_list_query_count_is_constant(self):
+        self.assertQueryCountConstant(self.client, "/api/subscriptions/", self.create_subscriptions)
+
+    def test_plan_list_query_count_is_constant(self):
+        names = iter(["daily", "custom"])
+
+        def create_plans(count):
+            for _ in range(count):
+                Plan.objects.create(name=next(names), price=100, duration_days=1)
+
+        self.assertQueryCountConstant(self.client, "/api/subscriptions/plans/", create_plans, sizes=(1, 2))
+
+
+class SubscriptionExpiryTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff(is_staff=True)
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.today = date(2025, 3, 15)
+        for days in (-10, -1, 0, 5):  # end_date relative to today
+            Subscription.objects.create(
+                plan=self.plan, member=self.admin, amount_paid=1000,
+                start_date=self.today - timedelta(days=30), end_date=self.today + timedelta(days=days),
+            )
+
+    def test_effective_status_annotation(self):
+        statuses = Subscription.objects.with_effective_status(self.today).order_by("end_date").values_list("effective_status", flat=True)
+
+        self.assertEqual(list(statuses), ["Expired", "Expired", "Active", "Active"])
+        self.assertEqual(Subscription.objects.effective_active(self.today).count(), 2)
+
+    def test_expire_due_updates_in_batches(self):
+        with self.assertNumQueries(5):  # An id lookup and one UPDATE per batch, then an empty lookup ends the sweep
+            self.assertEqual(Subscription.objects.expire_due(self.today, batch_size=1), 2)
+
+        self.assertEqual(Subscription.objects.filter(status="Expired").count(), 2)
+        self.assertEqual(Subscription.objects.expire_due(self.today), 0)
+
+    def test_subscription_list_reports_effective_status(self):
+        response = self.client.get("/api/subscriptions/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("effective_status", response.json()["data"][0])
+
+
+class AccessCheckTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin, self.client = self.login_staff()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.member = CustomUser.objects.create_user(username="member", email="member@example.com", is_active=True)
+        self.url = f"/api/access/check/{self.member.id}/"
+
+    def check_access(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_cash_payment_grants_access_without_database_hits(self):
+        self.assertFalse(self.check_access()["covered"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/payments/initiate-payment/",
+                {"member": self.member.id, "plan": self.plan.id, "payment_method": "Cash", "phone_number": "", "description": ""},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        with self.assertNumQueries(0):
+            data = self.check_access()
+        self.assertTrue(data["covered"])
+        self.assertEqual(data["covered_until"], str(date.today() + timedelta(days=30)))
+
+    def test_cancelled_subscription_revokes_access(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription = Subscription.objects.create(
+                plan=self.plan, member=self.member, amount_paid=1000,
+                start_date=date.today(), end_date=date.today() + timedelta(days=30),
+            )
+        self.assertTrue(self.check_access()["covered"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.status = "Cancelled"
+            subscription.save()
+        self.assertFalse(self.check_access()["covered"])
+
+    def test_expired_coverage_is_not_covered(self):
+        Subscription.objects.create(
+            plan=self.plan, member=self.member, amount_paid=1000,
+            start_date=date.today() - timedelta(days=31), end_date=date.today() - timedelta(days=1),
+        )
+        self.assertFalse(self.check_access()["covered"])
+
+
+class RenewalTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.member = CustomUser.objects.create_user(username="member", email="member@example.com", is_active=True)
+        self.today = date(2025, 3, 15)
+
+    def test_renewals_stack_on_current_coverage(self):
+        with self.assertNumQueries(5):  # Savepoint, one locked member read, INSERT, member UPDATE, release
+            first = renew_subscription(self.member.id, self.plan, "REF1", today=self.today)
+        second = renew_subscription(self.member.id, self.plan, "REF2", today=self.today + timedelta(days=10))
+
+        self.assertEqual((first.start_date, first.end_date), (self.today, self.today + timedelta(days=30)))
+        self.assertEqual(second.start_date, first.end_date + timedelta(days=1))
+        self.assertEqual(second.end_date, second.start_date + timedelta(days=30))
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.current_end_date, second.end_date)
+        self.assertEqual(Subscription.objects.filter(member=self.member).count(), 2)
+
+    def test_lapsed_member_renews_from_today(self):
+        renew_subscription(self.member.id, self.plan, "REF1", today=self.today)
+        later = self.today + timedelta(days=60)
+
+        renewal = renew_subscription(self.member.id, self.plan, "REF2", today=later)
+
+        self.assertEqual(renewal.start_date, later)
+
+    def test_batch_renewals_stack_per_member(self):
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", is_active=True)
+
+        first, second, third = renew_subscriptions(
+            [(self.member.id, self.plan, "REF1"), (other.id, self.plan, "REF2"), (self.member.id, self.plan, "REF3")], today=self.today
+        )
+
+        self.assertEqual(second.start_date, self.today)
+        self.assertEqual(third.start_date, first.end_date + timedelta(days=1))
+        self.assertEqual(
+            dict(CustomUser.objects.filter(id__in=[self.member.id, other.id]).values_list("id", "current_end_date")),
+            {self.member.id: third.end_date, other.id: second.end_date},
+        )
+
+    def test_cancelling_recomputes_current_end_date(self):
+        first = renew_subscription(self.member.id, self.plan, "REF1", today=self.today)
+        second = renew_subscription(self.member.id, self.plan, "REF2", today=self.today)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = "Cancelled"
+            second.save()
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.current_end_date, first.end_date)
+
+
+class SoftDeleteTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff(is_staff=True)
+        self.plan = Plan.objects.create(name="monthly", price=1000, duration_days=30)
+        self.live, self.deleted = [
+            Subscription.objects.create(
+                plan=self.plan, member=self.admin, amount_paid=1000,
+                start_date=date.today(), end_date=date.today() + timedelta(days=30),
+            )
+            for _ in range(2)
+        ]
+        self.deleted.delete()
+
+    def test_default_manager_hides_soft_deleted_rows(self):
+        self.assertEqual(list(Subscription.objects.values_list("id", flat=True)), [self.live.id])
+        self.assertEqual(Subscription.all_with_deleted.count(), 2)
+        self.assertEqual(len(self.client.get("/api/subscriptions/").json()["data"]), 1)
+
+    def test_archive_moves_old_deleted_rows(self):
+        self.assertEqual(Subscription.all_with_deleted.archive_deleted(timezone.now() - timedelta(days=1)), 0)  # Too recent
+
+        with self.assertNumQueries(8):  # Savepoint, locked id read, INSERT ... SELECT, DELETE, release; then an empty batch
+            self.assertEqual(Subscription.all_with_deleted.archive_deleted(timezone.now() + timedelta(days=1)), 1)
+
+        self.assertEqual(Subscription.all_with_deleted.count(), 1)
+        archived = ArchivedSubscription.objects.get()
+        self.assertEqual((archived.id, archived.member_id, archived.plan_id), (self.deleted.id, self.admin.id, self.plan.id))
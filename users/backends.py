@@ -0,0 +1,36 @@
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+from users.models import CustomUser
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Authenticate with either a username or an email address.
+    - Resolves the user with a single query over the unique `email` and `username` indexes.
+    - Verifies the password against the fetched row, no second lookup.
+    """
+
+    def get_by_username_or_email(self, username_or_email):
+        """Fetch the user matching the identifier, preferring an email match over a username match."""
+        if not username_or_email:
+            return None
+
+        matches = list(
+            CustomUser.objects.filter(Q(email=username_or_email) | Q(username=username_or_email))[:2]
+        )
+        for user in matches:
+            if user.email == username_or_email:
+                return user
+        return matches[0] if matches else None
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(CustomUser.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        # No dummy hash for unknown users: the login endpoint already reports "User not found."
+        user = self.get_by_username_or_email(username)
+        if user and user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
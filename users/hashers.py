@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TieredPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose work factor comes from settings.PASSWORD_HASH_ITERATIONS.
+    - Keeps the `pbkdf2_sha256` algorithm name so existing hashes still verify.
+    - Hashes made with another iteration count are upgraded on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_HASH_ITERATIONS", None) or PBKDF2PasswordHasher.iterations
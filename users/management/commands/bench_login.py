@@ -0,0 +1,52 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework import serializers
+from api.serializers.users_serializers import LoginSerializer
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Benchmark login throughput through LoginSerializer. Runs inside a transaction that is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=20, help="Logins per scenario")
+        parser.add_argument("--iterations", type=int, help="PBKDF2 iterations to benchmark (defaults to the configured tier)")
+
+    def handle(self, *args, **options):
+        logins = options["logins"]
+        overrides = {}
+        if options["iterations"]:
+            overrides["PASSWORD_HASH_ITERATIONS"] = options["iterations"]
+
+        with override_settings(**overrides), transaction.atomic():
+            password = "bench-login-password"
+            CustomUser.objects.create_user(
+                username="bench_login_user", email="bench_login@example.com", password=password, is_active=True
+            )
+
+            scenarios = [
+                ("email", "bench_login@example.com", password),
+                ("username", "bench_login_user", password),
+                ("wrong password", "bench_login_user", "not-the-password"),
+                ("unknown user", "nobody@example.com", password),
+            ]
+
+            self.stdout.write(f"{'scenario':<16}{'logins/s':>10}{'avg ms':>10}{'queries':>10}")
+            for name, identifier, raw_password in scenarios:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for _ in range(logins):
+                        serializer = LoginSerializer(data={"username_or_email": identifier, "password": raw_password})
+                        try:
+                            serializer.is_valid(raise_exception=True)
+                        except serializers.ValidationError:
+                            pass
+                    elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"{name:<16}{logins / elapsed:>10.1f}{elapsed / logins * 1000:>10.2f}{len(queries) / logins:>10.1f}"
+                )
+
+            transaction.set_rollback(True)
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from phonenumber_field.modelfields import PhoneNumberField
 
@@ -39,6 +40,9 @@ class CustomUser(AbstractUser):
     phone_number = PhoneNumberField(region= "KE", blank=True, null=True) # Default to region Kenya
     emergency_contact = PhoneNumberField(region= "KE", blank=True, null=True)
     self_registered = models.BooleanField(default=True)
+    current_end_date = models.DateField(null=True, blank=True)  # Latest active subscription end_date, kept by api/utils/renewals.py
+    updated_at = models.DateTimeField(auto_now=True)  # Set explicitly by queryset .update() calls too, kiosk roster sync reads it
+    claims_valid_after = models.DateTimeField(null=True, blank=True)  # Token role claims issued before this are not trusted
     added_by = models.ForeignKey(
         "self",
         on_delete=models.SET_NULL,
@@ -57,5 +61,44 @@ class CustomUser(AbstractUser):
 
     objects = CustomUserManager()  # Use the custom manager
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="user_updated_id_idx"),  # Kiosk roster delta (since-token keyset)
+        ]
+
+    # Fields the kiosk roster sync sends (plus role, which decides who is in it); see api/utils/kiosk_sync.py
+    ROSTER_SYNC_FIELDS = {"username", "first_name", "last_name", "is_active", "current_end_date", "role"}
+
+    # Fields copied into token claims (password revokes tokens anyway); see api/utils/tokens.py
+    CLAIM_FIELDS = {"role", "is_active", "password"}
+
+    def save(self, *args, **kwargs):
+        """
+        - auto_now skips `updated_at` on save(update_fields=...), add it whenever a synced field is among them.
+        - Full saves and saves of claim fields stamp `claims_valid_after`, revoking the claims in tokens issued until now.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.CLAIM_FIELDS.intersection(update_fields):
+            self.claims_valid_after = timezone.now()
+        if update_fields is not None:
+            extra = set()
+            if self.ROSTER_SYNC_FIELDS.intersection(update_fields):
+                extra.add("updated_at")
+            if self.CLAIM_FIELDS.intersection(update_fields):
+                extra.add("claims_valid_after")
+            if extra:
+                kwargs["update_fields"] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.username} - {self.role}"
+
+
+class UserTombstone(models.Model):
+    """Deleted members, so the kiosk roster sync can tell kiosks to drop them (see api/utils/kiosk_sync.py)."""
+
+    user_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"User {self.user_id} (deleted {self.deleted_at:%Y-%m-%d})"
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.models import CustomUser, UserTombstone
+from api.utils.user_cache import forget_claims_marker, invalidate_cached_user, remember_claims_marker
+
+
+# Any save (UserViewSet.update, approve, admin save_model, ...) or delete drops the cached auth snapshot.
+# Saves publish the user's claims_valid_after (stamped by CustomUser.save) so claims issued before it stop being
+# trusted, deletes drop the marker so tokens of the removed user go back to the database lookup, which fails.
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+    remember_claims_marker(instance, overwrite=True)
+
+
+@receiver(post_delete, sender=CustomUser)
+def drop_user_snapshot(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+    forget_claims_marker(instance.pk)
+    if instance.role == "Member":
+        UserTombstone.objects.create(user_id=instance.pk)  # Kiosk rosters drop the member on their next sync
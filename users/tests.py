@@ -1,3 +1,185 @@
-from django.test import TestCase
+import io
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from api.utils.authentication import CookieJWTAuthentication
+from api.utils.permissions import IsStaff
+from api.utils.testing import QueryCountAssertionsMixin
+from api.utils.tokens import RoleRefreshToken, RoleTokenUser
+from api.utils.user_cache import cache_user, get_cached_user
+from users.models import CustomUser
 
-# Create your tests here.
+
+class UserListQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin, self.client = self.login_staff()
+        self.user_count = 0
+
+    def create_users(self, count):
+        """Each user is added and approved by a different staff member so nested serializers can't share lookups."""
+        for _ in range(count):
+            self.user_count += 1
+            staff = CustomUser.objects.create_user(
+                username=f"trainer{self.user_count}", email=f"trainer{self.user_count}@example.com", role="Trainer"
+            )
+            CustomUser.objects.create_user(
+                username=f"member{self.user_count}", email=f"member{self.user_count}@example.com",
+                added_by=staff, approved_by=staff,
+            )
+
+    def test_user_list_query_count_is_constant(self):
+        self.assertQueryCountConstant(self.client, "/api/users/", self.create_users)
+
+    def test_paginated_user_list_query_count_is_constant(self):
+        self.assertQueryCountConstant(self.client, "/api/users/?page_size=100", self.create_users)
+
+
+class TokenClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.trainer = CustomUser.objects.create_user(
+            username="trainer", email="trainer@example.com", role="Trainer", is_active=True
+        )
+
+    def request(self, token):
+        request = RequestFactory().get("/api/users/")
+        request.COOKIES["Authentication"] = str(token.access_token)
+        return Request(request, authenticators=[CookieJWTAuthentication()])
+
+    def test_role_checks_use_claims_without_queries(self):
+        request = self.request(RoleRefreshToken.for_user(self.trainer))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(IsStaff().has_permission(request, None))
+        self.assertIsInstance(request.token_user, RoleTokenUser)
+
+    def test_saving_the_user_revokes_issued_claims(self):
+        token = RoleRefreshToken.for_user(self.trainer)
+        self.trainer.role = "Member"
+        self.trainer.save()
+
+        request = self.request(token)
+        with self.assertNumQueries(1):  # The stale "Trainer" claim is ignored, the role is read from the database
+            self.assertFalse(IsStaff().has_permission(request, None))
+        self.assertFalse(hasattr(request, "token_user"))
+
+    def test_revoked_claims_stay_revoked_after_eviction(self):
+        token = RoleRefreshToken.for_user(self.trainer)
+        self.trainer.role = "Member"
+        self.trainer.save()
+        cache.clear()  # Evicts the revocation marker along with everything else
+
+        client = APIClient()
+        client.cookies["Authentication"] = str(token.access_token)
+        self.assertEqual(client.get("/api/users/").status_code, 403)
+
+    def test_missing_marker_falls_back_to_the_database_once(self):
+        token = RoleRefreshToken.for_user(self.trainer)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(IsStaff().has_permission(self.request(token), None))
+        with self.assertNumQueries(0):  # The database lookup restored the marker
+            self.assertTrue(IsStaff().has_permission(self.request(token), None))
+
+    def test_tokens_without_claims_fall_back_to_the_database(self):
+        request = self.request(RefreshToken.for_user(self.trainer))
+
+        with self.assertNumQueries(1):
+            self.assertTrue(IsStaff().has_permission(request, None))
+        self.assertFalse(hasattr(request, "token_user"))
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="member", email="member@example.com", is_active=True)
+
+    def cache_snapshot(self):
+        version, _ = get_cached_user(self.user.pk)
+        cache_user(self.user, version)
+        self.assertIsNotNone(get_cached_user(self.user.pk)[1])
+
+    def test_saving_invalidates_the_snapshot(self):
+        self.cache_snapshot()
+        version, _ = get_cached_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(get_cached_user(self.user.pk)[1])
+        cache_user(self.user, version)  # A snapshot loaded before the save must not be served afterwards
+        self.assertIsNone(get_cached_user(self.user.pk)[1])
+
+    def test_evicted_version_never_serves_an_older_snapshot(self):
+        self.cache_snapshot()
+        cache.delete(f"auth:user-version:{self.user.pk}")  # Evicted, while the snapshot it pointed to survives
+
+        self.assertIsNone(get_cached_user(self.user.pk)[1])
+
+    def test_deleting_invalidates_the_snapshot(self):
+        self.cache_snapshot()
+        user_id = self.user.pk
+        self.user.delete()
+
+        self.assertIsNone(get_cached_user(user_id)[1])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginBackendTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="member", email="member@example.com", password="member-password", is_active=True
+        )
+
+    def test_email_or_username_in_a_single_query(self):
+        for identifier in ["member@example.com", "member"]:
+            with self.assertNumQueries(1):
+                self.assertEqual(authenticate(username=identifier, password="member-password"), self.user)
+
+        self.assertIsNone(authenticate(username="member", password="wrong-password"))
+        self.assertIsNone(authenticate(username="nobody", password="member-password"))
+
+    def test_email_match_wins_over_username(self):
+        other = CustomUser.objects.create_user(
+            username="member@example.com", email="other@example.com", password="other-password", is_active=True
+        )
+
+        self.assertEqual(authenticate(username="member@example.com", password="member-password"), self.user)
+        self.assertIsNone(authenticate(username="member@example.com", password="other-password"))
+        self.assertEqual(authenticate(username="other@example.com", password="other-password"), other)
+
+    def test_inactive_accounts_are_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(authenticate(username="member", password="member-password"))
+
+    def test_iterations_follow_the_configured_tier(self):
+        self.assertTrue(make_password("secret").startswith("pbkdf2_sha256$1000$"))
+        with override_settings(PASSWORD_HASH_ITERATIONS=None):
+            default = make_password("secret")
+        self.assertFalse(default.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(default.startswith("pbkdf2_sha256$"))
+
+    def test_login_upgrades_hashes_from_another_tier(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(authenticate(username="member", password="member-password"), self.user)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+        self.assertEqual(authenticate(username="member", password="member-password"), self.user)  # Old tier verifies too
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+    def test_bench_login_reports_each_scenario(self):
+        out = io.StringIO()
+        call_command("bench_login", "--logins", "1", "--iterations", "1000", stdout=out)
+
+        for scenario in ["email", "username", "wrong password", "unknown user"]:
+            self.assertIn(scenario, out.getvalue())
+        self.assertFalse(CustomUser.objects.filter(username="bench_login_user").exists())  # Rolled back